@@ -1,10 +1,16 @@
 # app/api/v1/admin_router.py
+import base64
+import csv
+import io
+import json
+from datetime import datetime
 from typing import List, Optional
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 
 from app.schemas.admin import AdminTurn
 from app.services.admin_summary import admin_summary
-from app.services.storage import fetch_turns, SessionLocal
+from app.services.storage import fetch_turns, iter_turn_batches, EXPORT_COLUMNS, SessionLocal
 from app.services.security import require_admin
 from app.db.schema import Turn
 from fastapi import Query
@@ -26,8 +32,32 @@ def _map_turn(t: Turn) -> AdminTurn:
         created_at=t.created_at,
     )
 
+# ---- keyset cursors ----------------------------------------------------------
+# Opaque to clients: base64url JSON of the last id returned, the sort order and
+# the filters of the query it pages through.
+def _encode_cursor(last_id: int, order: str, session_id: Optional[int] = None,
+                   since_minutes: Optional[int] = None) -> str:
+    data = {"id": int(last_id), "o": order, "s": session_id, "m": since_minutes}
+    raw = json.dumps(data, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def _decode_cursor(cursor: str, order: str, session_id: Optional[int] = None,
+                   since_minutes: Optional[int] = None) -> int:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+        last_id = int(data["id"])
+    except Exception:
+        raise HTTPException(status_code=400, detail="invalid cursor")
+    if data.get("o") != order:
+        raise HTTPException(status_code=400, detail="cursor was issued for a different order")
+    if data.get("s") != session_id or data.get("m") != since_minutes:
+        raise HTTPException(status_code=400, detail="cursor was issued for different filters")
+    return last_id
+
 @router.get("/turns", response_model=List[AdminTurn])
 def get_turns(
+    response: Response,
     session_id: Optional[int] = Query(
         None,
         description="Filter by session ID",
@@ -49,9 +79,13 @@ def get_turns(
     offset: int = Query(
         0,
         ge=0,
-        description="Number of results to skip (for paging)",
+        description="Number of results to skip (legacy paging; prefer cursor)",
         examples={"example": {"value": 0}},
     ),
+    cursor: Optional[str] = Query(
+        None,
+        description="Opaque cursor from the previous page's X-Next-Cursor header",
+    ),
     order: str = Query(
         "desc",
         pattern="^(?i)(asc|desc)$",
@@ -60,15 +94,65 @@ def get_turns(
     ),
     _=Depends(require_admin),
 ):
+    order = order.lower()
+    after_id = _decode_cursor(cursor, order, session_id, since_minutes) if cursor else None
     rows = fetch_turns(
         session_id=session_id,
         limit=limit,
-        offset=offset,
+        offset=0 if cursor else offset,
         since_minutes=since_minutes,
         order=order,
+        after_id=after_id,
     )
+    # a full page may have more behind it; the body stays a plain list
+    if len(rows) == limit:
+        response.headers["X-Next-Cursor"] = _encode_cursor(rows[-1].id, order, session_id, since_minutes)
     return [_map_turn(r) for r in rows]
 
+def _json_default(v):
+    if isinstance(v, datetime):
+        return v.isoformat()
+    return str(v)
+
+def _export_ndjson(batches):
+    for batch in batches:
+        yield "".join(json.dumps(dict(r), default=_json_default) + "\n" for r in batch)
+
+def _export_csv(batches):
+    buf = io.StringIO()
+    w = csv.writer(buf)
+    w.writerow(EXPORT_COLUMNS)
+    for batch in batches:
+        for r in batch:
+            w.writerow([
+                json.dumps(r[c]) if isinstance(r[c], (dict, list)) else
+                (r[c].isoformat() if isinstance(r[c], datetime) else r[c])
+                for c in EXPORT_COLUMNS
+            ])
+        yield buf.getvalue()
+        buf.seek(0); buf.truncate(0)
+
+@router.get("/turns/export")
+def export_turns(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$", description="ndjson or csv"),
+    session_id: Optional[int] = Query(None, description="Filter by session ID"),
+    since_minutes: Optional[int] = Query(None, ge=1, description="Only turns from the last N minutes"),
+    order: str = Query("asc", pattern="^(?i)(asc|desc)$", description="Sort order by id"),
+    batch_size: int = Query(1000, ge=100, le=10000, description="Rows fetched per round-trip"),
+    _=Depends(require_admin),
+):
+    """Stream every matching turn from a server-side cursor (one batch in memory at a time)."""
+    batches = iter_turn_batches(session_id=session_id, since_minutes=since_minutes, order=order.lower(), batch_size=batch_size)
+    if format == "csv":
+        return StreamingResponse(
+            _export_csv(batches), media_type="text/csv",
+            headers={"Content-Disposition": 'attachment; filename="turns.csv"'},
+        )
+    return StreamingResponse(
+        _export_ndjson(batches), media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="turns.ndjson"'},
+    )
+
 @router.get(
     "/summary",
     responses={
@@ -130,7 +214,7 @@ def get_summary(
     return admin_summary(since_minutes=since_minutes)
 
 @router.get("/turns_raw")
-def turns_raw(limit: int = 10, _=Depends(require_admin)):
+def turns_raw(limit: int = Query(10, ge=1, le=200), _=Depends(require_admin)):
     with SessionLocal() as db:
         rows = db.execute(text("""
             SELECT id, session_id, user_text, reply_text, emotion, performance, mcp, reward, created_at
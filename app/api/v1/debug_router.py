@@ -12,4 +12,44 @@ def debug_db():
         # Use actual table names
         n_sessions = db.execute(text("SELECT COUNT(*) FROM sessions")).scalar()
         n_turns    = db.execute(text("SELECT COUNT(*) FROM turns")).scalar()
-        return {"info": info, "counts": {"sessions": n_sessions, "turns": n_turns}}
+        from app.services.storage import session_user_cache, dialogue_cache, live_metrics
+        return {
+            "info": info,
+            "counts": {"sessions": n_sessions, "turns": n_turns},
+            "session_user_cache": session_user_cache.stats(),
+            "dialogue_cache": dialogue_cache.cache.stats(),
+            "live_metrics": live_metrics.aggregator.stats(),
+        }
+
+@router.get("/tutor")
+def debug_tutor():
+    # JSON envelope outcomes: strict parse, repaired, salvaged, or second-call fallback
+    # prompt_cache: provider-reported cached prompt tokens (prefix-stable prompts)
+    from app.services import tutor, prompt
+    return {"envelope": tutor.envelope_stats(), "prompt_cache": prompt.cache_stats()}
+
+@router.get("/emotion")
+def debug_emotion():
+    # Confidence-gated cascade: how many turns the keyword classifier had to escalate to the LLM
+    from app.services import emotion_cascade
+    return emotion_cascade.stats()
+
+@router.get("/turn_queue")
+def debug_turn_queue():
+    # Write-behind turn queue (TURN_WRITE_MODE=behind|ack): depth, batch sizes, flush latency
+    from app.services import turn_queue
+    return turn_queue.stats()
+
+@router.get("/pool")
+def debug_pool():
+    # DB connection pools: active/idle/overflow connections, checkout wait histogram, timeouts.
+    # High checkout waits with idle LLM time mean the pool (not the model) is the bottleneck.
+    from app.services import db_pool, storage, storage_async
+    return {
+        "config": db_pool.config(),
+        "sync": db_pool.pool_stats(storage.engine.pool, "sync"),
+        "read": db_pool.pool_stats(storage.read_engine.pool, "read") if storage.read_engine is not storage.engine else None,
+        "async": storage_async.pool_stats(),
+        # analytics reads: replica vs primary fallback (lag over DATABASE_READ_MAX_LAG_SECONDS)
+        "read_routing": storage.read_routing_stats(),
+    }
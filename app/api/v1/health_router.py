@@ -5,6 +5,8 @@ from fastapi import APIRouter, status
 from fastapi.responses import JSONResponse
 
 from app.services import storage  # expects storage.db_health() -> (ok: bool, err: Optional[str])
+from app.services import llm
+from app.services import speculation
 import shutil
 from app.services.storage import db_health
 
@@ -31,16 +33,22 @@ def health_full():
     stream_cfg = {
         "max_seconds": float(os.getenv("STREAM_MAX_SECONDS", "25")),
         "stale_partial_seconds": float(os.getenv("STREAM_STALE_PARTIAL_SECONDS", "10")),
+        "speculation": speculation.stats(),
     }
 
+    # LLM circuit breaker: "open" means turns get the canned reply immediately
+    llm_state = llm.health_snapshot()
+
     payload = {
         "status": "ok" if overall_ok else "degraded",
         "components": {
             "openai_key": "present" if key_ok else "missing",
             "database": "up" if db_ok else "down",
             "ffmpeg": "present" if ffmpeg_ok else "missing",
+            "llm": llm_state["breaker"]["state"],
         },
         "stream": stream_cfg,
+        "llm": llm_state,
         "errors": {},
     }
 
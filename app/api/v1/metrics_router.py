@@ -1,6 +1,7 @@
 # app/api/v1/metrics_router.py
 from typing import Optional, Union
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, HTTPException, Query
+from app.services import live_metrics
 from app.services.metrics import compute_metrics, compute_series
 
 router = APIRouter(prefix="/api/v1/metrics", tags=["metrics"])
@@ -100,4 +101,26 @@ def get_series(
         sid = session_id
     return compute_series(session_id=sid, since_minutes=since_minutes, bucket=bucket)
 
-
+@router.get(
+    "/live",
+    responses={200: {"description": "Metrics snapshot from the in-memory aggregator (same shape as /api/v1/metrics)"}},
+)
+def get_live_metrics(
+    session_id: Optional[str] = Query(
+        None, description="Filter metrics by session ID (numeric)", examples={"example": {"value": "3"}}
+    ),
+    since_minutes: Optional[int] = Query(
+        None, description="Window in minutes, one of LIVE_METRICS_WINDOWS (default the longest)",
+        examples={"example": {"value": 15}},
+    ),
+):
+    # Served from memory (app/services/live_metrics.py): no database query
+    if not live_metrics.aggregator.enabled:
+        raise HTTPException(status_code=400, detail="Live metrics are disabled (LIVE_METRICS_WINDOWS)")
+    sid: Optional[int] = None
+    if isinstance(session_id, str) and session_id.strip().isdigit():
+        sid = int(session_id.strip())
+    try:
+        return live_metrics.aggregator.snapshot(session_id=sid, since_minutes=since_minutes)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
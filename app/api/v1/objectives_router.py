@@ -12,13 +12,6 @@ def list_objectives(unit: Optional[str] = Query(None), q: Optional[str] = Query(
     rows = objsvc.list_objectives(unit=unit, q=q)
     return {"count": len(rows), "items": rows}
 
-@router.get("/{code}")
-def get_objective(code: str):
-    o = objsvc.find_by_code(code)
-    if not o:
-        return {"found": False}
-    return {"found": True, "item": o}
-
 
 @router.get("/progress")
 def objective_progress(
@@ -29,11 +22,11 @@ def objective_progress(
     rows = []
     if user_id is not None and (session_id is None):
         # Aggregate across all sessions for this user
-        sess_ids = storage.sessions_for_user(int(user_id))
+        sess_ids = storage.sessions_for_user(int(user_id), replica=True)
         for sid in sess_ids:
-            rows.extend(storage.fetch_turns(session_id=str(sid), since_minutes=since_minutes, limit=200, offset=0, order="desc"))
+            rows.extend(storage.fetch_turns(session_id=str(sid), since_minutes=since_minutes, limit=200, offset=0, order="desc", replica=True))
     elif session_id is not None:
-        rows = storage.fetch_turns(session_id=str(session_id), since_minutes=since_minutes, limit=200, offset=0, order="desc")
+        rows = storage.fetch_turns(session_id=str(session_id), since_minutes=since_minutes, limit=200, offset=0, order="desc", replica=True)
     else:
         return {"items": [], "error": "Provide session_id or user_id"}
     # group by objective_code captured in performance JSON
@@ -96,3 +89,10 @@ def objective_progress(
     if user_id is not None:
         out["user_id"] = user_id
     return out
+
+@router.get("/{code}")
+def get_objective(code: str):
+    o = objsvc.find_by_code(code)
+    if not o:
+        return {"found": False}
+    return {"found": True, "item": o}
@@ -1,10 +1,16 @@
 # app/api/v1/turn_logger_router.py
+import json
+import os
+from datetime import datetime, timedelta, timezone
 from typing import Optional, Union
-from fastapi import APIRouter, HTTPException, Query
-from pydantic import BaseModel, field_validator
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel, ValidationError, field_validator
 from sqlalchemy.orm import Session as SASession
+from app.services import storage, turn_archive, turn_rollups
 from app.services.storage import SessionLocal
-from app.db.schema import Session as DBSession, Turn
+from app.db.schema import Session as DBSession, Turn, turn_projections
+from app.services.tokens import message_tokens
 
 router = APIRouter(prefix="/api/v1", tags=["turns"])
 
@@ -50,12 +56,138 @@ def log_turn(body: TurnLogBody, reward: float = Query(0.0)):
                 performance=body.performance,
                 mcp=body.mcp,
                 reward=reward,
+                **turn_projections(body.emotion, body.performance, body.mcp),
+                user_tokens=message_tokens(body.user_text.strip()) if body.user_text.strip() else 0,
+                reply_tokens=message_tokens(reply),
             )
             db.add(turn)
+            db.flush()
+            turn_rollups.add(db.connection(), [turn.id])
             db.commit()
             db.refresh(turn)
+            storage._turns_written([storage._written_row(turn)])
             return {"ok": True, "turn_id": turn.id}
         except:
             db.rollback()
             raise
     return TurnLogResponse(ok=True, turn_id=turn.id)
+
+
+# ---- bulk ingestion ------------------------------------------------------------
+# Max turns per bulk request (env: TURN_BULK_MAX)
+BULK_MAX = int(os.getenv("TURN_BULK_MAX", "50000"))
+
+# Clock skew tolerated on an imported created_at
+_FUTURE_SKEW = timedelta(minutes=5)
+
+class BulkTurnBody(TurnLogBody):
+    reward: float = 0.0
+    # when the turn happened (historical imports); default now
+    created_at: Optional[datetime] = None
+
+    # Stored like the server default: naive UTC
+    @field_validator("created_at")
+    @classmethod
+    def _utc_created_at(cls, v):
+        if v is None:
+            return None
+        if v.tzinfo is not None:
+            v = v.astimezone(timezone.utc).replace(tzinfo=None)
+        if v > datetime.now(timezone.utc).replace(tzinfo=None) + _FUTURE_SKEW:
+            raise ValueError("created_at must not be in the future")
+        return v
+
+class BulkTurnResponse(BaseModel):
+    ok: bool
+    count: int
+    turn_ids: list[int]
+
+def _parse_bulk(raw: bytes, content_type: str) -> list:
+    """JSON array, or NDJSON (one object per line; blank lines ignored)."""
+    body = raw.decode("utf-8-sig").strip()
+    if not body:
+        return []
+    if "ndjson" not in content_type and "jsonl" not in content_type and body.startswith("["):
+        try:
+            items = json.loads(body)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"invalid JSON array: {e}")
+        if not isinstance(items, list):
+            raise HTTPException(status_code=400, detail="expected a JSON array of turns")
+        return items
+    items = []
+    for lineno, line in enumerate(body.splitlines(), start=1):
+        if not line.strip():
+            continue
+        try:
+            items.append(json.loads(line))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"invalid JSON on line {lineno}: {e}")
+    return items
+
+def _ingest_bulk(raw: bytes, content_type: str) -> BulkTurnResponse:
+    items = _parse_bulk(raw, content_type)
+    if len(items) > BULK_MAX:
+        raise HTTPException(status_code=413, detail=f"at most {BULK_MAX} turns per request")
+
+    bodies: list[BulkTurnBody] = []
+    errors = []
+    for i, item in enumerate(items):
+        try:
+            bodies.append(BulkTurnBody.model_validate(item))
+        except ValidationError as e:
+            errors.append({"index": i, "errors": e.errors(include_url=False, include_context=False)})
+            if len(errors) >= 50:
+                break
+    if errors:
+        raise HTTPException(status_code=422, detail=errors)
+    if not bodies:
+        return BulkTurnResponse(ok=True, count=0, turn_ids=[])
+
+    # months before the floor are already archived to Parquet and dropped
+    floor = turn_archive.live_floor()
+    archived = [i for i, b in enumerate(bodies) if floor and b.created_at and b.created_at < floor]
+    if archived:
+        msg = f"created_at is in an archived month (before {floor:%Y-%m})"
+        raise HTTPException(status_code=422, detail=[
+            {"index": i, "errors": [{"type": "value_error", "loc": ["created_at"], "msg": msg}]} for i in archived[:50]
+        ])
+
+    wanted = {b.session_id for b in bodies}
+    missing = sorted(wanted - storage.existing_session_ids(wanted))
+    if missing:
+        raise HTTPException(status_code=400, detail=f"Sessions do not exist: {missing[:20]}")
+
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    rows = []
+    for b in bodies:
+        reply = (b.reply_text or "").strip() or "[no_reply]"
+        rows.append({
+            "session_id": b.session_id,
+            "user_text": b.user_text,
+            "reply_text": reply,
+            "emotion": b.emotion,
+            "performance": b.performance,
+            "mcp": b.mcp,
+            "reward": b.reward,
+            **turn_projections(b.emotion, b.performance, b.mcp),
+            "user_tokens": message_tokens(b.user_text.strip()) if b.user_text.strip() else 0,
+            "reply_tokens": message_tokens(reply),
+            "created_at": b.created_at or now,
+        })
+    ids = storage.bulk_insert_turns(rows)
+    return BulkTurnResponse(ok=True, count=len(ids), turn_ids=ids)
+
+@router.post("/turn/log/bulk", summary="Persist many turns in one transaction", response_model=BulkTurnResponse)
+async def log_turns_bulk(request: Request):
+    """
+    Body: JSON array of turn objects, or NDJSON (Content-Type: application/x-ndjson).
+    Each turn has the /turn/log fields plus an optional "reward" (default 0.0)
+    and "created_at" (ISO 8601; without an offset it is UTC; default now).
+    All rows are validated first; any error rejects the whole request (422 with
+    per-item errors, including a created_at in an already archived month; 400
+    for unknown sessions). Returns ids in input order.
+    """
+    raw = await request.body()
+    # parsing, validation, token counts and the insert run off the event loop
+    return await run_in_threadpool(_ingest_bulk, raw, request.headers.get("content-type", ""))
@@ -0,0 +1,366 @@
+# app/db/migrations.py
+# Versioned schema migrations, applied at startup (init_db) or from the CLI:
+#   python -m app.db.migrations            # apply pending migrations
+#   python -m app.db.migrations status     # list applied / pending versions
+#   python -m app.db.migrations backfill   # (re)fill typed turn columns from JSON
+#   python -m app.db.migrations manual     # also apply manual steps (e.g. partitioning)
+#   python -m app.db.migrations utc --from-timezone ZONE --through-id N
+#                                          # turns written in server-local time -> UTC
+#
+# create_all() only creates missing tables; anything that changes an existing
+# table (new columns, indexes, type changes) goes here as a new numbered step.
+# Steps must be idempotent (IF NOT EXISTS / inspector checks) because a fresh
+# database already gets the current schema from create_all().
+import json
+import threading
+from dataclasses import dataclass
+from typing import Callable
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+
+# Postgres advisory lock key so several app workers starting at once migrate serially
+_LOCK_KEY = 7_401_221
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    apply: Callable[[Connection], None]
+    # False: run on an autocommit connection (e.g. CREATE INDEX CONCURRENTLY)
+    transactional: bool = True
+    # long table rewrites: upgrade() skips them unless asked (the `manual` CLI
+    # command), or while cheap(conn) says they are quick (e.g. empty table)
+    manual: bool = False
+    cheap: Callable[[Connection], bool] | None = None
+
+
+def _has_column(conn: Connection, table: str, column: str) -> bool:
+    return any(c["name"] == column for c in inspect(conn).get_columns(table))
+
+def _add_column(conn: Connection, table: str, column: str, ddl_type: str) -> None:
+    if not _has_column(conn, table, column):
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl_type}"))
+
+def _drop_invalid_index(conn: Connection, name: str) -> None:
+    # a failed CREATE INDEX CONCURRENTLY leaves an INVALID index behind, which
+    # IF NOT EXISTS would then accept as done: drop it so the retry rebuilds it
+    invalid = conn.execute(text(
+        "SELECT NOT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid"
+        " WHERE c.relname = :name AND c.relkind = 'i' AND pg_table_is_visible(c.oid)"
+    ), {"name": name}).scalar()
+    if invalid:
+        print(f"[migrations] dropping invalid index {name} left by an interrupted build")
+        conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+
+def _create_index(conn: Connection, name: str, table: str, columns: str, unique: bool = False) -> None:
+    # CONCURRENTLY keeps turns writable while a large table is indexed (Postgres only).
+    # Not for turns after migration 6: a partitioned parent can't be indexed concurrently.
+    concurrently = ""
+    if conn.dialect.name == "postgresql":
+        _drop_invalid_index(conn, name)
+        concurrently = "CONCURRENTLY "
+    kind = "UNIQUE INDEX" if unique else "INDEX"
+    conn.execute(text(f"CREATE {kind} {concurrently}IF NOT EXISTS {name} ON {table} ({columns})"))
+
+
+# ---- steps -------------------------------------------------------------------
+def _m1_token_and_summary_columns(conn: Connection) -> None:
+    _add_column(conn, "turns", "user_tokens", "INTEGER")
+    _add_column(conn, "turns", "reply_tokens", "INTEGER")
+    _add_column(conn, "sessions", "summary", "TEXT")
+    _add_column(conn, "sessions", "summary_through_turn_id", "BIGINT")
+
+def _m2_hot_path_indexes(conn: Connection) -> None:
+    # dialogue_messages / fetch_turns: WHERE session_id = ? ORDER BY id DESC
+    _create_index(conn, "ix_turns_session_id_id", "turns", "session_id, id")
+    # metrics windows: WHERE created_at >= ?
+    _create_index(conn, "ix_turns_created_at", "turns", "created_at")
+    # sessions of a user (users router, admin summary)
+    _create_index(conn, "ix_session_users_user_id", "session_users", "user_id")
+
+_PROJECTION_COLUMNS = {
+    "emotion_label": "VARCHAR(16)",
+    "tone": "VARCHAR(16)",
+    "pacing": "VARCHAR(16)",
+    "difficulty": "VARCHAR(16)",
+    "next_step": "VARCHAR(16)",
+    "correct": "BOOLEAN",
+    "objective_code": "VARCHAR(32)",
+}
+
+def _m3_projection_columns(conn: Connection) -> None:
+    for col, ddl in _PROJECTION_COLUMNS.items():
+        _add_column(conn, "turns", col, ddl)
+
+def _m4_backfill_projections(conn: Connection) -> None:
+    # the row rewrite is not done here, so startup isn't blocked on a large
+    # table: init_db starts backfill_in_background() when this step applies
+    # (or run `python -m app.db.migrations backfill`); reads tolerate NULLs
+    pass
+
+def _m5_projection_indexes(conn: Connection) -> None:
+    _create_index(conn, "ix_turns_emotion_label_created_at", "turns", "emotion_label, created_at")
+    _create_index(conn, "ix_turns_objective_code", "turns", "objective_code")
+
+def _turns_empty(conn: Connection) -> bool:
+    return conn.execute(text("SELECT 1 FROM turns LIMIT 1")).first() is None
+
+def _m6_partition_turns_by_month(conn: Connection) -> None:
+    from app.db import partitions
+    partitions.partition_turns(conn)
+
+def _m7_session_client_key(conn: Connection) -> None:
+    _add_column(conn, "sessions", "client_key", "VARCHAR(128)")
+
+def _m8_session_client_key_index(conn: Connection) -> None:
+    # ON CONFLICT (client_key) target for the session upsert
+    _create_index(conn, "ux_sessions_client_key", "sessions", "client_key", unique=True)
+
+def _m9_turn_rollups_table(conn: Connection) -> None:
+    # per-minute metrics rollups; inserts keep them current from here on
+    from app.db.schema import TurnRollup
+    TurnRollup.__table__.create(conn, checkfirst=True)
+
+def _m10_turn_payloads_jsonb(conn: Connection) -> None:
+    # rewrites turns under an ACCESS EXCLUSIVE lock; reads and the backfill
+    # work on JSON as well, so this can wait for an off-peak `manual` run
+    if conn.dialect.name == "postgresql":
+        types = {c["name"]: type(c["type"]).__name__ for c in inspect(conn).get_columns("turns")}
+        for col in ("emotion", "performance", "mcp"):
+            if types.get(col) != "JSONB":
+                conn.execute(text(f"ALTER TABLE turns ALTER COLUMN {col} TYPE JSONB USING {col}::jsonb"))
+
+def _m11_rebuild_turn_rollups(conn: Connection) -> None:
+    # fill the rollups from the turns stored before migration 9
+    from app.services import turn_rollups
+    turn_rollups.rebuild(conn)
+
+
+MIGRATIONS: list[Migration] = [
+    Migration(1, "token_and_summary_columns", _m1_token_and_summary_columns),
+    Migration(2, "turns_hot_path_indexes", _m2_hot_path_indexes, transactional=False),
+    Migration(3, "turn_projection_columns", _m3_projection_columns),
+    Migration(4, "backfill_turn_projections", _m4_backfill_projections, transactional=False),
+    Migration(5, "turn_projection_indexes", _m5_projection_indexes, transactional=False),
+    # copies every row with turns locked: only on a fresh database at startup
+    Migration(6, "partition_turns_by_month", _m6_partition_turns_by_month, manual=True, cheap=_turns_empty),
+    Migration(7, "session_client_key", _m7_session_client_key),
+    Migration(8, "session_client_key_index", _m8_session_client_key_index, transactional=False),
+    Migration(9, "turn_rollups_table", _m9_turn_rollups_table),
+    # JSON -> JSONB table rewrite: only on a fresh database at startup
+    Migration(10, "turn_payloads_jsonb", _m10_turn_payloads_jsonb, manual=True, cheap=_turns_empty),
+    # aggregates all of turns under a SHARE lock (inserts wait): same rule
+    Migration(11, "rebuild_turn_rollups", _m11_rebuild_turn_rollups, manual=True, cheap=_turns_empty),
+]
+# applying this version means existing turns still need backfill_projections()
+BACKFILL_VERSION = 4
+
+
+# ---- backfill ----------------------------------------------------------------
+_PG_BACKFILL = text("""
+UPDATE turns SET
+  emotion_label  = LEFT(emotion->>'label', 16),
+  tone           = LEFT(mcp->>'tone', 16),
+  pacing         = LEFT(mcp->>'pacing', 16),
+  difficulty     = LEFT(mcp->>'difficulty', 16),
+  next_step      = LEFT(mcp->>'next_step', 16),
+  correct        = CASE WHEN jsonb_typeof(performance::jsonb->'correct') = 'boolean'
+                        THEN (performance->>'correct')::boolean END,
+  objective_code = LEFT(NULLIF(TRIM(COALESCE(performance->>'objective_code', performance->>'objective')), ''), 32)
+WHERE id > :lo AND id <= :hi AND emotion_label IS NULL
+RETURNING session_id
+""")
+
+def _as_dict(v) -> dict:
+    if isinstance(v, dict):
+        return v
+    try:
+        return json.loads(v) if v else {}
+    except (TypeError, ValueError):
+        return {}
+
+def backfill_projections(engine: Engine, batch_size: int = 5000) -> int:
+    """
+    Fill the typed turn columns for rows written before they existed, in id
+    batches committed one at a time (resumable, keeps locks short), then
+    rebuild the metrics rollups of the sessions touched (they count labels).
+    Returns the number of rows updated.
+    """
+    from app.db.schema import turn_projections
+
+    with engine.connect() as c:
+        max_id = c.execute(text("SELECT MAX(id) FROM turns")).scalar() or 0
+    updated = 0
+    sessions: set[int] = set()
+    lo = 0
+    while lo < max_id:
+        hi = lo + batch_size
+        with engine.begin() as c:
+            if engine.dialect.name == "postgresql":
+                touched = c.execute(_PG_BACKFILL, {"lo": lo, "hi": hi}).scalars().all()
+                updated += len(touched)
+                sessions.update(int(s) for s in touched)
+            else:
+                rows = c.execute(
+                    text("SELECT id, session_id, emotion, performance, mcp FROM turns"
+                         " WHERE id > :lo AND id <= :hi AND emotion_label IS NULL"),
+                    {"lo": lo, "hi": hi},
+                ).all()
+                params = [
+                    {"id": r.id, **turn_projections(_as_dict(r.emotion), _as_dict(r.performance), _as_dict(r.mcp))}
+                    for r in rows
+                ]
+                if params:
+                    c.execute(text(
+                        "UPDATE turns SET emotion_label = :emotion_label, tone = :tone, pacing = :pacing,"
+                        " difficulty = :difficulty, next_step = :next_step, correct = :correct,"
+                        " objective_code = :objective_code WHERE id = :id"
+                    ), params)
+                    updated += len(params)
+                    sessions.update(int(r.session_id) for r in rows)
+        lo = hi
+    if sessions and inspect(engine).has_table("turn_rollups"):
+        from app.services import turn_rollups
+        for sid in sorted(sessions):
+            with engine.begin() as c:
+                turn_rollups.rebuild(c, sid)
+    return updated
+
+def backfill_in_background(engine: Engine) -> threading.Thread:
+    """Run backfill_projections on a daemon thread (startup after migration 4)."""
+    def _run():
+        try:
+            print(f"[migrations] backfilled {backfill_projections(engine)} turns")
+        except Exception as e:
+            print(f"[migrations] backfill failed (re-run `python -m app.db.migrations backfill`): {e}")
+    t = threading.Thread(target=_run, name="projection-backfill", daemon=True)
+    t.start()
+    return t
+
+def convert_turns_to_utc(engine: Engine, from_zone: str, through_id: int) -> int:
+    """
+    Postgres sessions now run in UTC (db_pool), so now() fills created_at with
+    UTC. Turns up to through_id were written by a server whose TimeZone was
+    from_zone; shift them to UTC and rebuild the metrics rollups, in one
+    transaction (not safe to repeat once committed). Returns rows updated.
+    """
+    if engine.dialect.name != "postgresql":
+        return 0  # SQLite's CURRENT_TIMESTAMP is already UTC
+    with engine.begin() as c:
+        n = c.execute(
+            text("UPDATE turns SET created_at = (created_at AT TIME ZONE :zone) AT TIME ZONE 'UTC'"
+                 " WHERE id <= :through_id AND created_at IS NOT NULL"),
+            {"zone": from_zone, "through_id": through_id},
+        ).rowcount
+        if n and inspect(c).has_table("turn_rollups"):
+            from app.services import turn_rollups
+            turn_rollups.rebuild(c)
+    return n
+
+
+# ---- runner ------------------------------------------------------------------
+def _ensure_version_table(engine: Engine) -> None:
+    with engine.begin() as c:
+        c.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_migrations ("
+            " version INTEGER PRIMARY KEY,"
+            " name VARCHAR NOT NULL,"
+            " applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP)"
+        ))
+
+def applied_versions(engine: Engine) -> set[int]:
+    _ensure_version_table(engine)
+    with engine.connect() as c:
+        return {int(v) for v in c.execute(text("SELECT version FROM schema_migrations")).scalars()}
+
+def pending(engine: Engine) -> list[Migration]:
+    done = applied_versions(engine)
+    return [m for m in MIGRATIONS if m.version not in done]
+
+def _record(engine: Engine, m: Migration) -> None:
+    with engine.begin() as c:
+        c.execute(
+            text("INSERT INTO schema_migrations (version, name) VALUES (:v, :n)"),
+            {"v": m.version, "n": m.name},
+        )
+
+def _run_one(engine: Engine, m: Migration) -> None:
+    if m.transactional:
+        with engine.begin() as c:
+            m.apply(c)
+            c.execute(
+                text("INSERT INTO schema_migrations (version, name) VALUES (:v, :n)"),
+                {"v": m.version, "n": m.name},
+            )
+        return
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as c:
+        m.apply(c)
+    _record(engine, m)
+
+def _deferred(engine: Engine, m: Migration, manual: bool) -> bool:
+    if not m.manual or manual:
+        return False
+    if m.cheap is not None:
+        with engine.connect() as c:
+            if m.cheap(c):
+                return False
+    print(f"[migrations] skipping {m.version:04d} {m.name}: run `python -m app.db.migrations manual` off-peak")
+    return True
+
+def upgrade(engine: Engine, manual: bool = False) -> list[int]:
+    """Apply pending migrations in version order; returns the versions applied.
+    Manual steps are left pending unless `manual` (or they are cheap now)."""
+    _ensure_version_table(engine)
+    is_pg = engine.dialect.name == "postgresql"
+    lock = engine.connect() if is_pg else None
+    try:
+        if lock is not None:
+            lock.execute(text("SELECT pg_advisory_lock(:k)"), {"k": _LOCK_KEY})
+        applied = []
+        for m in pending(engine):  # re-read under the lock: another worker may have finished
+            if _deferred(engine, m, manual):
+                continue
+            print(f"[migrations] applying {m.version:04d} {m.name}")
+            _run_one(engine, m)
+            applied.append(m.version)
+        return applied
+    finally:
+        if lock is not None:
+            lock.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": _LOCK_KEY})
+            lock.close()
+
+def status(engine: Engine) -> list[dict]:
+    done = applied_versions(engine)
+    return [{"version": m.version, "name": m.name, "applied": m.version in done, "manual": m.manual}
+            for m in MIGRATIONS]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="EQiLevel schema migrations")
+    parser.add_argument("command", nargs="?", default="upgrade", choices=["upgrade", "status", "backfill", "manual", "utc"])
+    parser.add_argument("--from-timezone", help="utc: the server TimeZone old turns were written in")
+    parser.add_argument("--through-id", type=int, help="utc: last turn id written before the upgrade")
+    args = parser.parse_args()
+    if args.command == "utc" and (not args.from_timezone or args.through_id is None):
+        parser.error("utc needs --from-timezone and --through-id")
+
+    from app.db.schema import Base
+    from app.services.storage import engine
+
+    if args.command == "backfill":
+        print(f"[migrations] backfilled {backfill_projections(engine)} turns")
+    elif args.command == "utc":
+        n = convert_turns_to_utc(engine, args.from_timezone, args.through_id)
+        print(f"[migrations] converted {n} turns from {args.from_timezone} to UTC")
+    elif args.command == "status":
+        for row in status(engine):
+            state = "applied" if row["applied"] else ("pending (manual)" if row["manual"] else "pending")
+            print(f"{row['version']:04d} {row['name']:<32} {state}")
+    else:
+        Base.metadata.create_all(bind=engine)
+        done = upgrade(engine, manual=args.command == "manual")
+        print(f"[migrations] {len(done)} applied" if done else "[migrations] up to date")
@@ -0,0 +1,143 @@
+# app/db/partitions.py
+# Monthly range partitions of `turns` on created_at (Postgres only).
+#
+# Migration 6 turns the table into a partitioned parent with one child per
+# month (turns_pYYYYMM) plus turns_default for anything outside them. It is a
+# manual step on existing databases (`python -m app.db.migrations manual`).
+# ensure_partitions() keeps PARTITION_MONTHS_AHEAD months created in advance
+# (run at startup and by the retention job in app/services/turn_archive.py,
+# which detaches old months and archives them to Parquet); rows that landed
+# in turns_default meanwhile are moved into their month when it is created.
+import os
+import re
+from datetime import datetime
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+PARTITION_MONTHS_AHEAD = int(os.getenv("TURN_PARTITION_MONTHS_AHEAD", "2"))
+
+_NAME_RE = re.compile(r"^turns_p(\d{4})(\d{2})$")
+
+
+def month_floor(d: datetime) -> datetime:
+    return datetime(d.year, d.month, 1)
+
+def add_months(d: datetime, n: int) -> datetime:
+    y, m = divmod(d.month - 1 + n, 12)
+    return datetime(d.year + y, m + 1, 1)
+
+def partition_name(month: datetime) -> str:
+    return f"turns_p{month:%Y%m}"
+
+def partition_month(name: str) -> datetime | None:
+    m = _NAME_RE.match(name)
+    return datetime(int(m.group(1)), int(m.group(2)), 1) if m else None
+
+def is_partitioned(conn: Connection) -> bool:
+    if conn.dialect.name != "postgresql":
+        return False
+    return bool(conn.execute(
+        text("SELECT c.relkind = 'p' FROM pg_class c WHERE c.oid = to_regclass('turns')")
+    ).scalar())
+
+def attached(conn: Connection) -> list[str]:
+    """Monthly partitions currently attached to turns."""
+    names = conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid"
+        " WHERE i.inhparent = 'turns'::regclass"
+    )).scalars()
+    return sorted(n for n in names if partition_month(n))
+
+def monthly_tables(conn: Connection) -> list[tuple[str, datetime, bool]]:
+    """(name, month, attached) for every turns_pYYYYMM table, attached or not
+    (a retention run interrupted after DETACH leaves a detached one behind)."""
+    live = set(attached(conn))
+    names = conn.execute(text(
+        "SELECT relname FROM pg_class WHERE relkind = 'r' AND relname ~ '^turns_p[0-9]{6}$'"
+    )).scalars()
+    return sorted((n, partition_month(n), n in live) for n in set(names) | live)
+
+def oldest_default(conn: Connection) -> datetime | None:
+    """created_at of the oldest row in turns_default (None when empty or missing)."""
+    if conn.execute(text("SELECT to_regclass('turns_default')")).scalar() is None:
+        return None
+    return conn.execute(text("SELECT MIN(created_at) FROM turns_default")).scalar()
+
+def ensure_partitions(conn: Connection, start: datetime | None = None, months_ahead: int | None = None) -> list[str]:
+    """Create missing monthly partitions from `start` (default: this month)
+    through months_ahead months from now. Returns the names created."""
+    if not is_partitioned(conn):
+        return []
+    ahead = PARTITION_MONTHS_AHEAD if months_ahead is None else months_ahead
+    now = month_floor(datetime.utcnow())
+    month = month_floor(start) if start else now
+    created = []
+    while month <= add_months(now, ahead):
+        name = partition_name(month)
+        if conn.execute(text("SELECT to_regclass(:n)"), {"n": name}).scalar() is None:
+            _create_month(conn, name, month)
+            created.append(name)
+        month = add_months(month, 1)
+    conn.execute(text("CREATE TABLE IF NOT EXISTS turns_default PARTITION OF turns DEFAULT"))
+    return created
+
+def _create_month(conn: Connection, name: str, month: datetime) -> None:
+    lo, hi = f"{month:%Y-%m-%d}", f"{add_months(month, 1):%Y-%m-%d}"
+    bounds = f"FOR VALUES FROM ('{lo}') TO ('{hi}')"
+    stray = False
+    if conn.execute(text("SELECT to_regclass('turns_default')")).scalar() is not None:
+        stray = conn.execute(text(
+            "SELECT EXISTS (SELECT 1 FROM turns_default"
+            " WHERE created_at >= CAST(:lo AS timestamp) AND created_at < CAST(:hi AS timestamp))"
+        ), {"lo": lo, "hi": hi}).scalar()
+    if not stray:
+        conn.execute(text(f"CREATE TABLE {name} PARTITION OF turns {bounds}"))
+        return
+    # turns of this month were written to turns_default (the process outran
+    # PARTITION_MONTHS_AHEAD): CREATE ... PARTITION OF would fail on them, so
+    # move them into a new table and attach it
+    conn.execute(text(f"CREATE TABLE {name} (LIKE turns INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    moved = conn.execute(text(
+        f"WITH moved AS (DELETE FROM turns_default"
+        f" WHERE created_at >= CAST(:lo AS timestamp) AND created_at < CAST(:hi AS timestamp) RETURNING *)"
+        f" INSERT INTO {name} SELECT * FROM moved"
+    ), {"lo": lo, "hi": hi}).rowcount
+    conn.execute(text(f"ALTER TABLE turns ATTACH PARTITION {name} {bounds}"))
+    print(f"[partitions] {name}: moved {moved} turns out of turns_default")
+
+# (name, columns) of the turns indexes; partitioned parents can't build them
+# CONCURRENTLY, so migration 6 recreates them directly
+TURN_INDEXES = (
+    ("ix_turns_session_id_id", "session_id, id"),
+    ("ix_turns_created_at", "created_at"),
+    ("ix_turns_emotion_label_created_at", "emotion_label, created_at"),
+    ("ix_turns_objective_code", "objective_code"),
+)
+
+def partition_turns(conn: Connection) -> None:
+    """Rebuild turns as a monthly-partitioned table, keeping ids, the id
+    sequence and all rows. Runs in the caller's transaction; the table is
+    locked for the copy, so run it off-peak on large databases."""
+    if conn.dialect.name != "postgresql" or is_partitioned(conn):
+        return
+    conn.execute(text("ALTER TABLE turns RENAME TO turns_unpartitioned"))
+    seq = conn.execute(text("SELECT pg_get_serial_sequence('turns_unpartitioned', 'id')")).scalar()
+    conn.execute(text(
+        "CREATE TABLE turns (LIKE turns_unpartitioned INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+        " PARTITION BY RANGE (created_at)"
+    ))
+    if seq:
+        # keep the sequence when the old table is dropped
+        conn.execute(text(f"ALTER SEQUENCE {seq} OWNED BY turns.id"))
+    oldest = conn.execute(text("SELECT MIN(created_at) FROM turns_unpartitioned")).scalar()
+    ensure_partitions(conn, start=oldest)
+    conn.execute(text("INSERT INTO turns SELECT * FROM turns_unpartitioned"))
+    conn.execute(text("DROP TABLE turns_unpartitioned"))
+    # the partition key has to be part of the primary key
+    conn.execute(text("ALTER TABLE turns ADD PRIMARY KEY (id, created_at)"))
+    conn.execute(text(
+        "ALTER TABLE turns ADD FOREIGN KEY (session_id) REFERENCES sessions(id) ON DELETE CASCADE"
+    ))
+    for name, cols in TURN_INDEXES:
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON turns ({cols})"))
@@ -1,7 +1,13 @@
 # app/db/schema.py
 import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import DeclarativeBase, relationship
 
+# JSONB on Postgres (binary, indexable), plain JSON elsewhere
+JSONType = sa.JSON().with_variant(JSONB(), "postgresql")
+# BIGSERIAL on Postgres; SQLite only auto-assigns ids for "INTEGER PRIMARY KEY" (64-bit there anyway)
+BigID = sa.BigInteger().with_variant(sa.Integer(), "sqlite")
+
 class Base(DeclarativeBase): pass
 
 class Setting(Base):
@@ -11,40 +17,131 @@ class Setting(Base):
 
 class User(Base):
     __tablename__ = "users"
-    id = sa.Column(sa.BigInteger, primary_key=True, autoincrement=True)
+    id = sa.Column(BigID, primary_key=True, autoincrement=True)
     name = sa.Column(sa.String, nullable=False, unique=True)
-    created_at = sa.Column(sa.TIMESTAMP, server_default=sa.text("now()"), nullable=False)
+    created_at = sa.Column(sa.TIMESTAMP, server_default=sa.func.now(), nullable=False)
 
     # relationships
     sessions = relationship("SessionUser", back_populates="user", cascade="all, delete-orphan")
 
 class Session(Base):
     __tablename__ = "sessions"
-    id = sa.Column(sa.BigInteger, primary_key=True, autoincrement=True)
-    created_at = sa.Column(sa.TIMESTAMP, server_default=sa.text("now()"), nullable=False)
+    id = sa.Column(BigID, primary_key=True, autoincrement=True)
+    created_at = sa.Column(sa.TIMESTAMP, server_default=sa.func.now(), nullable=False)
+    # rolling summary of older turns (maintained in the background)
+    summary = sa.Column(sa.Text, nullable=True)
+    summary_through_turn_id = sa.Column(sa.BigInteger, nullable=True)
+    # non-numeric session key sent by a client (resolved by upsert, see storage.resolve_session_id)
+    client_key = sa.Column(sa.String(128), nullable=True)
     turns = relationship("Turn", back_populates="session", cascade="all, delete-orphan")
 
+    # keep in sync with app/db/migrations.py
+    __table_args__ = (
+        sa.Index("ux_sessions_client_key", "client_key", unique=True),
+    )
+
 class SessionUser(Base):
     __tablename__ = "session_users"
     session_id = sa.Column(sa.BigInteger, sa.ForeignKey("sessions.id", ondelete="CASCADE"), primary_key=True)
     user_id = sa.Column(sa.BigInteger, sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
-    created_at = sa.Column(sa.TIMESTAMP, server_default=sa.text("now()"), nullable=False)
+    created_at = sa.Column(sa.TIMESTAMP, server_default=sa.func.now(), nullable=False)
 
     session = relationship("Session")
     user = relationship("User", back_populates="sessions")
 
+    __table_args__ = (sa.Index("ix_session_users_user_id", "user_id"),)
+
 class Turn(Base):
     __tablename__ = "turns"
-    id = sa.Column(sa.BigInteger, primary_key=True, autoincrement=True)
+    id = sa.Column(BigID, primary_key=True, autoincrement=True)
 
     session_id = sa.Column(sa.BigInteger, sa.ForeignKey("sessions.id", ondelete="CASCADE"), nullable=False)
 
     user_text   = sa.Column(sa.String, nullable=False)
     reply_text  = sa.Column(sa.String, nullable=False)
-    emotion     = sa.Column(sa.JSON,   nullable=False)
-    performance = sa.Column(sa.JSON,   nullable=False)
-    mcp         = sa.Column(sa.JSON,   nullable=False)
+    emotion     = sa.Column(JSONType, nullable=False)
+    performance = sa.Column(JSONType, nullable=False)
+    mcp         = sa.Column(JSONType, nullable=False)
     reward      = sa.Column(sa.Float,  nullable=False)
-    created_at  = sa.Column(sa.TIMESTAMP, server_default=sa.text("now()"), nullable=False)
+    # typed copies of the JSON fields analytics filter on (see turn_projections)
+    emotion_label  = sa.Column(sa.String(16), nullable=True)
+    tone           = sa.Column(sa.String(16), nullable=True)
+    pacing         = sa.Column(sa.String(16), nullable=True)
+    difficulty     = sa.Column(sa.String(16), nullable=True)
+    next_step      = sa.Column(sa.String(16), nullable=True)
+    correct        = sa.Column(sa.Boolean,    nullable=True)
+    objective_code = sa.Column(sa.String(32), nullable=True)
+    # token counts computed once at write time (history budgeting)
+    user_tokens  = sa.Column(sa.Integer, nullable=True)
+    reply_tokens = sa.Column(sa.Integer, nullable=True)
+    created_at  = sa.Column(sa.TIMESTAMP, server_default=sa.func.now(), nullable=False)
 
     session = relationship("Session", back_populates="turns")
+
+    # keep in sync with app/db/migrations.py (existing databases get them there)
+    __table_args__ = (
+        sa.Index("ix_turns_session_id_id", "session_id", "id"),
+        sa.Index("ix_turns_created_at", "created_at"),
+        sa.Index("ix_turns_emotion_label_created_at", "emotion_label", "created_at"),
+        sa.Index("ix_turns_objective_code", "objective_code"),
+    )
+
+class TurnRollup(Base):
+    """Per-session, per-minute aggregates of turns, updated in the same
+    transaction as every turns insert (app/services/turn_rollups.py)."""
+    __tablename__ = "turn_rollups"
+    session_id = sa.Column(sa.BigInteger, sa.ForeignKey("sessions.id", ondelete="CASCADE"), primary_key=True)
+    # minutes since 1970-01-01 UTC of the turns' created_at
+    minute     = sa.Column(sa.BigInteger, primary_key=True)
+
+    turns      = sa.Column(sa.Integer, nullable=False)
+    reward_sum = sa.Column(sa.Float,   nullable=False)
+    # frustrated turns that slowed pacing or lowered difficulty
+    adapted_frustrated = sa.Column(sa.Integer, nullable=False)
+    # turns whose tone matches their emotion (turn_rollups.TONE_ALIGNMENT)
+    tone_aligned       = sa.Column(sa.Integer, nullable=False)
+    # counts per emotion_label / tone / pacing / difficulty / next_step value
+    emotion_frustrated = sa.Column(sa.Integer, nullable=False)
+    emotion_engaged    = sa.Column(sa.Integer, nullable=False)
+    emotion_calm       = sa.Column(sa.Integer, nullable=False)
+    emotion_bored      = sa.Column(sa.Integer, nullable=False)
+    tone_warm          = sa.Column(sa.Integer, nullable=False)
+    tone_encouraging   = sa.Column(sa.Integer, nullable=False)
+    tone_neutral       = sa.Column(sa.Integer, nullable=False)
+    tone_concise       = sa.Column(sa.Integer, nullable=False)
+    pacing_slow        = sa.Column(sa.Integer, nullable=False)
+    pacing_medium      = sa.Column(sa.Integer, nullable=False)
+    pacing_fast        = sa.Column(sa.Integer, nullable=False)
+    difficulty_down    = sa.Column(sa.Integer, nullable=False)
+    difficulty_hold    = sa.Column(sa.Integer, nullable=False)
+    difficulty_up      = sa.Column(sa.Integer, nullable=False)
+    next_step_example  = sa.Column(sa.Integer, nullable=False)
+    next_step_prompt   = sa.Column(sa.Integer, nullable=False)
+    next_step_explain  = sa.Column(sa.Integer, nullable=False)
+    next_step_quiz     = sa.Column(sa.Integer, nullable=False)
+    next_step_review   = sa.Column(sa.Integer, nullable=False)
+
+    # windows across all sessions: WHERE minute >= ?
+    __table_args__ = (sa.Index("ix_turn_rollups_minute", "minute"),)
+
+
+def _str_or_none(v, max_len: int):
+    if v is None:
+        return None
+    s = str(v).strip()
+    return s[:max_len] or None
+
+def turn_projections(emotion: dict | None, performance: dict | None, mcp: dict | None) -> dict:
+    """Typed column values for a turn, derived from its JSON payloads.
+    Every write path sets these alongside the JSON so analytics never parse JSON."""
+    emotion, performance, mcp = emotion or {}, performance or {}, mcp or {}
+    correct = performance.get("correct")
+    return {
+        "emotion_label": _str_or_none(emotion.get("label"), 16),
+        "tone": _str_or_none(mcp.get("tone"), 16),
+        "pacing": _str_or_none(mcp.get("pacing"), 16),
+        "difficulty": _str_or_none(mcp.get("difficulty"), 16),
+        "next_step": _str_or_none(mcp.get("next_step"), 16),
+        "correct": correct if isinstance(correct, bool) else None,
+        "objective_code": _str_or_none(performance.get("objective_code") or performance.get("objective"), 32),
+    }
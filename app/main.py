@@ -23,8 +23,14 @@ from app.db.schema import Turn
 from app.models import TurnRequest, TurnContext, TutorReply, MCP
 from app.services import emotion, mcp, policy, tutor, reward, storage
 from app.services.metrics import compute_metrics
-from app.services.storage import SessionLocal, db_health, init_db, dialogue_messages, get_user_for_session
+from app.services.storage import SessionLocal, db_health, init_db, dialogue_messages
 from app.services import objectives as objsvc
+from app.services import summary as summary_svc
+from app.services import speculation
+from app.services import emotion_cascade
+from app.services import storage_async
+from app.services import turn_queue
+from app.services import live_metrics
 
 from fastapi import FastAPI, UploadFile, Depends, status, File, Form, Request, WebSocket, WebSocketDisconnect, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
@@ -57,7 +63,19 @@ async def lifespan(app: FastAPI):
         )
     except Exception as e:
         print(f"[startup] Emotion model device check failed: {e}")
+    print(f"[startup] DB access on the request path: {storage_async.mode()}")
+    print(f"[startup] Turn writes: {turn_queue.MODE}")
+    if live_metrics.aggregator.enabled:
+        try:
+            n = await asyncio.to_thread(live_metrics.rebuild_from_db)
+            print(f"[startup] Live metrics: {n} turns from the last {max(live_metrics.WINDOWS)} min")
+        except Exception as e:
+            print(f"[startup] Live metrics rebuild failed: {e}")
     yield
+    # flush queued turns before the process exits
+    if not await asyncio.to_thread(turn_queue.drain):
+        print(f"[shutdown] turn queue not drained: {turn_queue.stats()['queue_depth']} turns left")
+    await storage_async.dispose()
 
 app = FastAPI(title="EQiLevel API", lifespan=lifespan)
 
@@ -277,28 +295,28 @@ async def session_turn(request: Request, file: UploadFile = File(None), session_
         raise HTTPException(status_code=400, detail="objective_code is required")
     # Verify session has a user
     try:
-        bound = get_user_for_session(int(session_id))
+        bound = await storage_async.get_user_for_session(int(session_id))
     except Exception:
         bound = None
     if bound is None:
         raise HTTPException(status_code=400, detail="username is required: start session with user_name before sending turns")
 
-    # 1) analyze
-    em = emotion.classify(text_input)
+    # 1) analyze (joint mode: keywords now, the reply call's emotion label replaces them)
+    em = emotion.classify(text_input) if tutor.JOINT_EMOTION else await asyncio.to_thread(emotion_cascade.classify, text_input)
     perf = emotion.estimate_perf(text_input)
-    # 2) build MCP
-    r = reward.compute(em, perf)
-    mcp_state = mcp.build(em, perf, text_input)
-    # 3) preliminary policy update (pre-reply)
-    mcp_pre = policy.update(mcp_state, r)
+    # 2) build MCP + 3) preliminary policy update (pre-reply)
+    r, mcp_state, mcp_pre = _plan_mcp(em, perf, text_input)
     # 4) tutor reply
     try:
         hist = []
+        summ = None
         try:
             if session_id is not None:
                 _env_lim = int(os.getenv("CHAT_HISTORY_TURNS", "8"))
-                _lim = max(1, min(20, int(hist_lim if hist_lim is not None else (chat_history_turns if chat_history_turns is not None else _env_lim))))
-                hist = dialogue_messages(int(session_id), limit=_lim)
+                _lim = max(1, min(50, int(hist_lim if hist_lim is not None else (chat_history_turns if chat_history_turns is not None else _env_lim))))
+                # rolling summary covers turns up to summ_through; raw history starts after it
+                summ, summ_through = await storage_async.get_session_summary(int(session_id))
+                hist = await storage_async.dialogue_messages(int(session_id), limit=_lim, token_budget=tutor.HISTORY_TOKEN_BUDGET, after_id=summ_through)
         except Exception as _:
             pass
         # Optional curriculum objective per-turn (JSON body only)
@@ -316,7 +334,14 @@ async def session_turn(request: Request, file: UploadFile = File(None), session_
                     objectives = [o]
         except Exception:
             pass
-        text = tutor.generate(text_input, mcp_pre, history=hist, objectives=objectives)
+        if tutor.JOINT_EMOTION:
+            text, em_llm = await asyncio.to_thread(tutor.generate_joint, text_input, mcp_pre, history=hist, objectives=objectives, summary=summ)
+            if em_llm is not None:
+                em = em_llm
+                r, mcp_state, mcp_pre = _plan_mcp(em, perf, text_input)
+        else:
+            # LLM call in a worker thread so other turns keep flowing on this loop
+            text = await asyncio.to_thread(tutor.generate, text_input, mcp_pre, history=hist, objectives=objectives, summary=summ)
         if not text or not str(text).strip():
             text = "[Tutor] Let’s try a simpler example together."
     except Exception as gen_err:
@@ -339,7 +364,9 @@ async def session_turn(request: Request, file: UploadFile = File(None), session_
                 oc_for_log = objective_code
         except Exception:
             oc_for_log = None
-        storage.log_turn_full(req_obj, em, perf, mcp_updated, text, reward=float(r2), objective_code=oc_for_log)
+        await storage_async.log_turn_full(req_obj, em, perf, mcp_updated, text, reward=float(r2), objective_code=oc_for_log)
+        # fold older turns into the session summary in the background
+        summary_svc.schedule_update(session_id)
     except Exception as log_err:
         print(f"[storage] Logging failed: {log_err}")
     return TutorReply(text=text, mcp=mcp_updated, reward=float(r2), transcript=text_input)
@@ -396,6 +423,8 @@ def transcribe(file: UploadFile = File(...)):
 # Whisper model cache for streaming partials
 _ws_whisper_model = None
 _fw_model = None  # optional faster-whisper
+# Minimum spacing between partial transcriptions while audio streams in
+PARTIAL_INTERVAL_SECONDS = float(os.getenv("STREAM_PARTIAL_INTERVAL_SECONDS", "1.2"))
 
 def _sanitize_partial_text(text: str) -> str:
     """
@@ -461,6 +490,52 @@ def _quick_transcribe_text(audio_path: str, language: str = "en") -> str:
         return ""
 
 
+def _plan_mcp(em, perf, text: str):
+    """Reward, MCP state and pre-reply policy nudge for the given signals."""
+    r = reward.compute(em, perf)
+    mcp_state = mcp.build(em, perf, text)
+    return r, mcp_state, policy.update(mcp_state, r)
+
+
+def _plan_voice_turn(transcript: str, session_id, hist_lim, cancel=None) -> dict:
+    """
+    Analyze a voice transcript and generate the tutor reply (no persistence).
+    Runs in a worker thread; used both for the final transcript and for
+    speculative replies started from a stable partial (`cancel` is then the
+    speculation's flag, checked before each LLM call).
+    """
+    speculation.check(cancel)
+    em = emotion.classify(transcript) if tutor.JOINT_EMOTION else emotion_cascade.classify(transcript)
+    perf = emotion.estimate_perf(transcript)
+    r, mcp_state, mcp_pre = _plan_mcp(em, perf, transcript)
+    try:
+        hist = []
+        summ = None
+        try:
+            if session_id is not None:
+                _lim = hist_lim if hist_lim is not None else int(os.getenv("CHAT_HISTORY_TURNS", "8"))
+                summ, summ_through = storage.get_session_summary(int(session_id))
+                hist = dialogue_messages(int(session_id), limit=_lim, token_budget=tutor.HISTORY_TOKEN_BUDGET, after_id=summ_through)
+        except Exception:
+            pass
+        speculation.check(cancel)
+        if tutor.JOINT_EMOTION:
+            text, em_llm = tutor.generate_joint(transcript, mcp_pre, history=hist, summary=summ)
+            if em_llm is not None:
+                em = em_llm
+                r, mcp_state, mcp_pre = _plan_mcp(em, perf, transcript)
+        else:
+            text = tutor.generate(transcript, mcp_pre, history=hist, summary=summ)
+        if not text or not str(text).strip():
+            text = "[Tutor] Let’s try a simpler example together."
+    except speculation.Cancelled:
+        raise
+    except Exception as gen_err:
+        print(f"[ws/session] Tutor error: {gen_err}")
+        text = "[Tutor] Quick hint: try a smaller step — we’ll fix generation next."
+    return {"transcript": transcript, "em": em, "perf": perf, "r": r, "mcp_state": mcp_state, "mcp_pre": mcp_pre, "text": text}
+
+
 @app.websocket("/ws/voice")
 async def ws_voice(websocket: WebSocket):
     """
@@ -475,6 +550,7 @@ async def ws_voice(websocket: WebSocket):
     session_id = None
     hist_lim = None
     ws_objective = None
+    spec: speculation.Speculation | None = None
     try:
         # Parse query params: ?session_id=123
         try:
@@ -487,7 +563,7 @@ async def ws_voice(websocket: WebSocket):
             if query and ("hist" in query or "chat_history_turns" in query):
                 h = query.get("hist") or query.get("chat_history_turns")
                 if isinstance(h, str) and h.strip().isdigit():
-                    hist_lim = max(1, min(20, int(h.strip())))
+                    hist_lim = max(1, min(50, int(h.strip())))
             # Optional objective code
             if query and "objective_code" in query:
                 ws_objective = query.get("objective_code")
@@ -508,7 +584,7 @@ async def ws_voice(websocket: WebSocket):
             except Exception: pass
             return
         try:
-            if get_user_for_session(int(session_id)) is None:
+            if await storage_async.get_user_for_session(int(session_id)) is None:
                 await websocket.send_json({"type": "error", "message": "username is required: start session with user_name before streaming"})
                 try: await websocket.close()
                 except Exception: pass
@@ -527,6 +603,28 @@ async def ws_voice(websocket: WebSocket):
         started_at = 0.0  # set on first bytes
         last_partial_sent: str = ""
         last_partial_at = 0.0
+        loop = asyncio.get_running_loop()
+
+        # Speculative reply (STREAM_SPECULATE=1): once the partial transcript has
+        # been unchanged for STREAM_SPECULATE_STABLE_SECONDS, start generating
+        stable_text = ""
+        stable_since = 0.0
+
+        def _maybe_speculate(text: str) -> None:
+            nonlocal spec, stable_text, stable_since
+            now = time.time()
+            if text != stable_text:
+                stable_text, stable_since = text, now
+                return
+            if not speculation.ENABLED or not text or (now - stable_since) < speculation.STABLE_SECONDS:
+                return
+            if spec is not None and spec.text == text:
+                return
+            if spec is not None and not spec.future.done():
+                spec.cancel()
+                speculation.record("discarded")
+            spec = speculation.Speculation(text, lambda cancel: _plan_voice_turn(text, session_id, hist_lim, cancel))
+            speculation.record("started")
 
         # Fail-safe timeouts configurable via env
         MAX_STREAM_SECONDS = float(os.getenv("STREAM_MAX_SECONDS", "25"))
@@ -558,13 +656,13 @@ async def ws_voice(websocket: WebSocket):
                     started_at = last_bytes_at
                 # Throttled partial transcription every ~1.2s
                 now = time.time()
-                if (now - last_partial_ts) >= 1.2 and (partial_task is None or partial_task.done()):
-                    loop = asyncio.get_running_loop()
+                if (now - last_partial_ts) >= PARTIAL_INTERVAL_SECONDS and (partial_task is None or partial_task.done()):
                     async def _do_partial():
                         nonlocal last_partial_sent, last_partial_at
                         try:
                             text = await loop.run_in_executor(None, lambda: _quick_transcribe_text(tmp_path, "en"))
                             text = _sanitize_partial_text(text)
+                            _maybe_speculate(text)
                             if _should_emit_partial(text, last_partial_sent):
                                 last_partial_sent = text
                                 last_partial_at = time.time()
@@ -608,33 +706,32 @@ async def ws_voice(websocket: WebSocket):
                     except Exception as e:
                         await websocket.send_json({"type": "error", "message": f"transcribe failed: {e}"})
 
-                    # Build reply using same pipeline with reward shaping
-                    em = emotion.classify(transcript)
-                    perf = emotion.estimate_perf(transcript)
-                    r = reward.compute(em, perf)
-                    mcp_state = mcp.build(em, perf, transcript)
-                    mcp_pre = policy.update(mcp_state, r)
-                    try:
-                        hist = []
-                        try:
-                            if session_id is not None:
-                                _lim = hist_lim if hist_lim is not None else int(os.getenv("CHAT_HISTORY_TURNS", "8"))
-                                hist = dialogue_messages(int(session_id), limit=_lim)
-                        except Exception:
-                            pass
-                        text = tutor.generate(transcript, mcp_pre, history=hist)
-                        if not text or not str(text).strip():
-                            text = "[Tutor] Let’s try a simpler example together."
-                    except Exception as gen_err:
-                        print(f"[ws/session] Tutor error: {gen_err}")
-                        text = "[Tutor] Quick hint: try a smaller step — we’ll fix generation next."
+                    # Build reply using same pipeline with reward shaping; reuse the
+                    # speculative reply when the final transcript matches its partial
+                    plan = None
+                    if spec is not None:
+                        if speculation.matches(spec.text, transcript):
+                            try:
+                                plan = await spec.future
+                                speculation.record("hits")
+                            except Exception:
+                                plan = None
+                        else:
+                            spec.cancel()
+                            speculation.record("misses")
+                        spec = None
+                    if plan is None:
+                        plan = await loop.run_in_executor(None, lambda: _plan_voice_turn(transcript, session_id, hist_lim))
+                    em, perf, r = plan["em"], plan["perf"], plan["r"]
+                    mcp_state, mcp_pre, text = plan["mcp_state"], plan["mcp_pre"], plan["text"]
 
                     # Persist full turn (best-effort)
                     try:
                         r2 = reward.shape_with_reply(r, mcp_pre, text)
                         mcp_updated = policy.update(mcp_state, r2)
                         req_obj = TurnRequest(user_text=transcript, session_id=session_id)
-                        storage.log_turn_full(req_obj, em, perf, mcp_updated, text, reward=float(r2), objective_code=ws_objective)
+                        await storage_async.log_turn_full(req_obj, em, perf, mcp_updated, text, reward=float(r2), objective_code=ws_objective)
+                        summary_svc.schedule_update(session_id)
                     except Exception as log_err:
                         print(f"[ws/storage] Logging failed: {log_err}")
 
@@ -654,6 +751,10 @@ async def ws_voice(websocket: WebSocket):
     except WebSocketDisconnect:
         pass
     finally:
+        # client gone (or error) while a speculation runs: stop it before its LLM call
+        if spec is not None and not spec.future.done():
+            spec.cancel()
+            speculation.record("discarded")
         try:
             if tmp_path and os.path.exists(tmp_path):
                 os.remove(tmp_path)
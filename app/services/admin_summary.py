@@ -5,7 +5,7 @@ from typing import Optional, Dict, Any, List
 
 from sqlalchemy import select, func, and_, tuple_
 from app.db.schema import Turn
-from app.services.storage import SessionLocal
+from app.services.storage import read_session
 
 def admin_summary(since_minutes: Optional[int] = None) -> Dict[str, Any]:
     """
@@ -20,7 +20,7 @@ def admin_summary(since_minutes: Optional[int] = None) -> Dict[str, Any]:
     if since_minutes and since_minutes > 0:
         cutoff_dt = datetime.now(timezone.utc) - timedelta(minutes=since_minutes)
 
-    with SessionLocal() as db:
+    with read_session() as db:
         # 1) Total turns per session
         totals = dict(
             db.execute(
@@ -44,13 +44,17 @@ def admin_summary(since_minutes: Optional[int] = None) -> Dict[str, Any]:
         )
         last_rows = {}
         if last_ids:
+            # typed projection columns only; the JSON payloads are not loaded
             rows = db.execute(
-                select(Turn).where(
+                select(
+                    Turn.session_id, Turn.created_at, Turn.reward,
+                    Turn.emotion_label, Turn.difficulty, Turn.tone,
+                ).where(
                     tuple_(Turn.session_id, Turn.id).in_(
                         [(sid, lid) for sid, lid in last_ids.items()]
                     )
                 )
-            ).scalars().all()
+            ).all()
             for r in rows:
                 last_rows[r.session_id] = r
 
@@ -81,10 +85,10 @@ def admin_summary(since_minutes: Optional[int] = None) -> Dict[str, Any]:
                 "session_id": sid,
                 "turns_total": int(total),
                 "last_turn_utc": (last.created_at.astimezone(timezone.utc).isoformat().replace("+00:00", "Z") if getattr(last, 'created_at', None) and getattr(last.created_at, 'tzinfo', None) is not None else (last.created_at.isoformat() + "Z") if last and last.created_at else None),
-                "last_emotion": (last.emotion or {}).get("label") if last and last.emotion else None,
+                "last_emotion": last.emotion_label if last else None,
                 "last_reward": float(last.reward) if (last and last.reward is not None) else None,
-                "last_difficulty": (last.mcp or {}).get("difficulty") if last and last.mcp else None,
-                "last_tone": (last.mcp or {}).get("tone") if last and last.mcp else None,
+                "last_difficulty": last.difficulty if last else None,
+                "last_tone": last.tone if last else None,
                 "turns_in_window": int(window_counts.get(sid, 0)) if cutoff_dt else None,
                 "avg_reward_window": (round(float(window_avgs.get(sid, 0.0)), 4) if cutoff_dt else None),
             })
@@ -0,0 +1,214 @@
+# app/services/db_pool.py
+# Connection pool settings for the sync and read-replica (storage.py) and async
+# (storage_async.py) engines, plus checkout instrumentation so pool waits show up separately from
+# LLM latency (GET /api/v1/debug/pool).
+#
+# Env:
+#   DB_POOL_SIZE             persistent connections per worker process (default 10)
+#   DB_POOL_MAX_OVERFLOW     extra connections opened under bursts (default 20)
+#   DB_POOL_TIMEOUT          seconds a checkout waits for a free connection (default 10)
+#   DB_POOL_RECYCLE          reconnect connections older than this many seconds (default 1800, -1 off)
+#   DB_POOL_PRE_PING         test each connection on checkout, one extra round-trip (default 1)
+#   DB_STATEMENT_TIMEOUT_MS  server-side statement timeout on Postgres (default 0 = none)
+#
+# Postgres sessions always run with TimeZone=UTC: created_at is a naive TIMESTAMP filled by now(),
+# and rollup minutes, metrics cutoffs and bulk imports all read it as UTC. Turns written before
+# this by a server in another zone hold local time; see `python -m app.db.migrations utc`.
+#
+# Embedded mode (DATABASE_URL=sqlite:///...): every connection gets WAL and the
+# pragmas below (configure()), so the API, the turn writer thread and readers
+# share one file without an external server.
+#   SQLITE_SYNCHRONOUS       NORMAL (default; durable across app crashes, WAL) or FULL
+#   SQLITE_BUSY_TIMEOUT_MS   wait for the write lock instead of failing (default 5000)
+#   SQLITE_CACHE_MB          page cache per connection (default 64)
+#   SQLITE_MMAP_MB           memory-mapped I/O size (default 256, 0 off)
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+def _flag(name: str, default: str) -> bool:
+    return os.getenv(name, default).strip().lower() not in ("0", "false", "no", "off")
+
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+MAX_OVERFLOW = int(os.getenv("DB_POOL_MAX_OVERFLOW", "20"))
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+PRE_PING = _flag("DB_POOL_PRE_PING", "1")
+STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))
+
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL").strip().upper()
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_CACHE_MB = int(os.getenv("SQLITE_CACHE_MB", "64"))
+SQLITE_MMAP_MB = int(os.getenv("SQLITE_MMAP_MB", "256"))
+
+# Upper bounds (ms) of the checkout wait histogram buckets; the last bucket is open-ended
+WAIT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+
+class _WaitStats:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.checkouts = 0
+            self.timeouts = 0
+            self.buckets = [0] * (len(WAIT_BUCKETS_MS) + 1)
+            self.recent: deque = deque(maxlen=1000)
+            self.max_ms = 0.0
+
+    def record(self, ms: float, timed_out: bool = False) -> None:
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.buckets[bisect_left(WAIT_BUCKETS_MS, ms)] += 1
+            self.recent.append(ms)
+            self.max_ms = max(self.max_ms, ms)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            recent = sorted(self.recent)
+            buckets = list(self.buckets)
+            out = {"checkouts": self.checkouts, "timeouts": self.timeouts, "max_ms": round(self.max_ms, 2)}
+        labels = [f"<={b}ms" for b in WAIT_BUCKETS_MS] + [f">{WAIT_BUCKETS_MS[-1]}ms"]
+        out["wait_histogram"] = dict(zip(labels, buckets))
+        out["wait_ms"] = {
+            "p50": round(recent[len(recent) // 2], 2) if recent else None,
+            "p95": round(recent[min(len(recent) - 1, int(len(recent) * 0.95))], 2) if recent else None,
+        }
+        return out
+
+_waits = {"sync": _WaitStats(), "async": _WaitStats(), "read": _WaitStats()}
+
+
+class _TimedCheckout:
+    """Times how long a checkout waits for a pooled (or newly opened overflow) connection."""
+    _label = "sync"
+
+    def _do_get(self):
+        t0 = time.perf_counter()
+        try:
+            rec = super()._do_get()
+        except exc.TimeoutError:
+            _waits[self._label].record((time.perf_counter() - t0) * 1000, timed_out=True)
+            raise
+        _waits[self._label].record((time.perf_counter() - t0) * 1000)
+        return rec
+
+class InstrumentedQueuePool(_TimedCheckout, QueuePool):
+    _label = "sync"
+
+class InstrumentedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    _label = "async"
+
+class InstrumentedReadQueuePool(_TimedCheckout, QueuePool):
+    _label = "read"
+
+_POOL_CLASSES = {"sync": InstrumentedQueuePool, "async": InstrumentedAsyncQueuePool, "read": InstrumentedReadQueuePool}
+
+
+def _session_args(driver: str) -> dict:
+    settings = {"timezone": "UTC"}
+    if STATEMENT_TIMEOUT_MS > 0:
+        settings["statement_timeout"] = str(STATEMENT_TIMEOUT_MS)
+    if driver == "asyncpg":
+        return {"server_settings": settings}
+    if driver in ("psycopg2", "psycopg"):
+        return {"options": " ".join(f"-c {k}={v}" for k, v in settings.items())}
+    return {}
+
+def connect_args(url: str) -> dict:
+    """Driver connect_args pinning the Postgres session settings (TimeZone, statement timeout)."""
+    u = make_url(url)
+    if u.get_backend_name() != "postgresql":
+        return {}
+    return _session_args(u.get_driver_name())
+
+def engine_kwargs(url: str, pool: str = "sync") -> dict:
+    """create_engine / create_async_engine keyword arguments for this URL.
+    pool: "sync" (primary), "read" (replica) or "async"; keys the wait stats."""
+    u = make_url(url)
+    kw: dict = {"pool_pre_ping": PRE_PING}
+    if _is_memory_sqlite(u):
+        # in-memory sqlite lives in a single connection; keep SQLAlchemy's default pool
+        return kw
+    kw.update(
+        poolclass=_POOL_CLASSES[pool],
+        pool_size=POOL_SIZE,
+        max_overflow=MAX_OVERFLOW,
+        pool_timeout=POOL_TIMEOUT,
+        pool_recycle=POOL_RECYCLE,
+    )
+    args = connect_args(url)
+    if args:
+        kw["connect_args"] = args
+    return kw
+
+def _is_memory_sqlite(u) -> bool:
+    return u.get_backend_name() == "sqlite" and u.database in (None, "", ":memory:")
+
+def sqlite_pragmas(memory: bool = False) -> list[str]:
+    out = [
+        f"PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT_MS}",
+        "PRAGMA foreign_keys = ON",
+        f"PRAGMA cache_size = -{SQLITE_CACHE_MB * 1024}",
+        "PRAGMA temp_store = MEMORY",
+    ]
+    if not memory:
+        # WAL: readers don't block the writer; NORMAL skips the fsync per commit
+        out += ["PRAGMA journal_mode = WAL", f"PRAGMA synchronous = {SQLITE_SYNCHRONOUS}",
+                f"PRAGMA mmap_size = {SQLITE_MMAP_MB * 1024 * 1024}"]
+    return out
+
+def configure(engine: Engine) -> Engine:
+    """Per-connection setup the URL can't express (SQLite pragmas). Pass
+    async_engine.sync_engine for async engines."""
+    u = engine.url
+    if u.get_backend_name() != "sqlite":
+        return engine
+    if not _is_memory_sqlite(u):
+        # the embedded database may be the first thing written under data/
+        os.makedirs(os.path.dirname(os.path.abspath(u.database)), exist_ok=True)
+    pragmas = sqlite_pragmas(_is_memory_sqlite(u))
+
+    @event.listens_for(engine, "connect")
+    def _sqlite_connect(dbapi_conn, _record):
+        cur = dbapi_conn.cursor()
+        for p in pragmas:
+            cur.execute(p)
+        cur.close()
+
+    return engine
+
+def pool_stats(pool, label: str) -> dict:
+    """Live pool occupancy plus the checkout wait histogram for one engine."""
+    out = {"pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        out.update({
+            "size": pool.size(),
+            "active": pool.checkedout(),
+            "idle": pool.checkedin(),
+            "overflow": max(0, pool.overflow()),
+            "max_overflow": pool._max_overflow,
+        })
+    out.update(_waits[label].snapshot())
+    return out
+
+def config() -> dict:
+    return {
+        "pool_size": POOL_SIZE,
+        "max_overflow": MAX_OVERFLOW,
+        "pool_timeout_s": POOL_TIMEOUT,
+        "pool_recycle_s": POOL_RECYCLE,
+        "pre_ping": PRE_PING,
+        "statement_timeout_ms": STATEMENT_TIMEOUT_MS,
+    }
@@ -0,0 +1,180 @@
+# app/services/dialogue_cache.py
+# Per-session ring buffer of recent turns so dialogue_messages (history for
+# every /session and /ws/voice turn) is a memory read instead of a query.
+#
+# - written through by storage._turns_written after every turns insert
+# - filled from the DB (last DIALOGUE_CACHE_TURNS turns) on a miss
+# - sessions evicted LRU once DIALOGUE_CACHE_MAX_MB is exceeded, and after
+#   DIALOGUE_CACHE_IDLE_SECONDS without a read or write
+#
+# The buffer only sees turns written by this process, so it is off by default:
+# enable it (DIALOGUE_CACHE_TURNS=50) only with a single worker or sticky
+# routing of each session to one worker.
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+# Turns kept per session (dialogue_messages asks for at most 50); 0 disables
+TURNS_PER_SESSION = int(os.getenv("DIALOGUE_CACHE_TURNS", "0"))
+MAX_BYTES = int(float(os.getenv("DIALOGUE_CACHE_MAX_MB", "64")) * 1024 * 1024)
+IDLE_SECONDS = float(os.getenv("DIALOGUE_CACHE_IDLE_SECONDS", "1800"))
+
+# rough per-turn cost beyond the text itself (tuple, ints, deque slot)
+_TURN_OVERHEAD = 160
+
+
+def _turn_bytes(user_text: str | None, reply_text: str | None) -> int:
+    return _TURN_OVERHEAD + len(user_text or "") + len(reply_text or "")
+
+
+class _Entry:
+    __slots__ = ("turns", "floor", "nbytes", "touched")
+
+    def __init__(self, capacity: int) -> None:
+        # (id, user_text, reply_text, user_tokens, reply_tokens), oldest first
+        self.turns: deque = deque(maxlen=capacity)
+        # every turn of the session with id > floor is in `turns`
+        self.floor = 0
+        self.nbytes = 0
+        self.touched = time.monotonic()
+
+
+def _answer(turns, floor: int, limit: int, after_id: int | None) -> list[tuple] | None:
+    """Newest-first (user_text, reply_text, user_tokens, reply_tokens) rows, as
+    the dialogue query returns them, or None if the buffer can't tell."""
+    out = []
+    for tid, ut, rt, ut_n, rt_n in reversed(turns):
+        if after_id and tid <= after_id:
+            return out
+        out.append((ut, rt, ut_n, rt_n))
+        if len(out) >= limit:
+            return out
+    # ran out of buffered turns: complete only if nothing older was dropped
+    return out if (after_id or 0) >= floor else None
+
+
+class DialogueCache:
+    def __init__(self, turns_per_session: int, max_bytes: int, idle_seconds: float) -> None:
+        self.turns_per_session = turns_per_session
+        self.max_bytes = max_bytes
+        self.idle_seconds = idle_seconds
+        self._sessions: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        # bumped by writes to sessions that aren't cached; a fill that started
+        # before such a write may have missed it, so it isn't installed
+        self._epoch = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.turns_per_session > 0
+
+    def _drop(self, sid: int) -> None:
+        e = self._sessions.pop(sid, None)
+        if e is not None:
+            self._bytes -= e.nbytes
+
+    def _evict(self, now: float) -> None:
+        # oldest-touched first: idle sessions, then LRU until under the cap
+        while self._sessions:
+            sid, e = next(iter(self._sessions.items()))
+            if self._bytes <= self.max_bytes and now - e.touched <= self.idle_seconds:
+                break
+            self._drop(sid)
+            self.evictions += 1
+
+    def epoch(self) -> int:
+        with self._lock:
+            return self._epoch
+
+    def get(self, sid: int, limit: int, after_id: int | None) -> list[tuple] | None:
+        now = time.monotonic()
+        with self._lock:
+            e = self._sessions.get(sid)
+            if e is not None and now - e.touched > self.idle_seconds:
+                self._drop(sid)
+                e = None
+            rows = _answer(e.turns, e.floor, limit, after_id) if e is not None else None
+            if rows is None:
+                self.misses += 1
+                return None
+            e.touched = now
+            self._sessions.move_to_end(sid)
+            self.hits += 1
+            return rows
+
+    def load(self, sid: int, rows_desc: list[tuple], epoch: int, limit: int, after_id: int | None) -> list[tuple] | None:
+        """Install a DB fill (last turns_per_session turns as (id, user_text,
+        reply_text, user_tokens, reply_tokens), newest first) and answer from it."""
+        e = _Entry(self.turns_per_session)
+        for row in reversed(rows_desc):
+            e.turns.append(tuple(row))
+            e.nbytes += _turn_bytes(row[1], row[2])
+        if len(rows_desc) >= self.turns_per_session and rows_desc:
+            e.floor = int(rows_desc[-1][0]) - 1
+        answer = _answer(e.turns, e.floor, limit, after_id)
+        now = time.monotonic()
+        with self._lock:
+            if epoch == self._epoch and sid not in self._sessions:
+                self._sessions[sid] = e
+                self._bytes += e.nbytes
+                self._evict(now)
+        return answer
+
+    def append(self, sid: int, turn_id: int, user_text, reply_text, user_tokens, reply_tokens) -> None:
+        """Write-through of a committed turn (ids must arrive in increasing order per session)."""
+        now = time.monotonic()
+        with self._lock:
+            e = self._sessions.get(sid)
+            if e is None:
+                self._epoch += 1
+                return
+            if e.turns and turn_id <= e.turns[-1][0]:
+                # out-of-order write (e.g. concurrent writers): refill on next read
+                self._drop(sid)
+                return
+            if len(e.turns) == e.turns.maxlen:
+                old = e.turns[0]
+                e.floor = int(old[0])
+                e.nbytes -= _turn_bytes(old[1], old[2])
+                self._bytes -= _turn_bytes(old[1], old[2])
+            e.turns.append((int(turn_id), user_text, reply_text, user_tokens, reply_tokens))
+            n = _turn_bytes(user_text, reply_text)
+            e.nbytes += n
+            self._bytes += n
+            e.touched = now
+            self._sessions.move_to_end(sid)
+            self._evict(now)
+
+    def invalidate(self, sid: int) -> None:
+        with self._lock:
+            self._drop(sid)
+            self._epoch += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._sessions.clear()
+            self._bytes = 0
+            self._epoch += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "turns_per_session": self.turns_per_session,
+                "sessions": len(self._sessions),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "idle_seconds": self.idle_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
+
+
+cache = DialogueCache(TURNS_PER_SESSION, MAX_BYTES, IDLE_SECONDS)
@@ -36,6 +36,28 @@ def classify(text: str) -> EmotionSignals:
     # neutral fallback
     return EmotionSignals(label="calm", sentiment=0.0)
 
+def classify_scored(text: str) -> tuple[EmotionSignals, float]:
+    """
+    Same decision as classify(), plus a confidence in [0, 1] for cascading:
+    several agreeing cues score high, conflicting cues or the neutral
+    fallback (no cue at all) score low.
+    """
+    t = _normalize(text)
+    neg = sum(1 for w in NEG_WORDS if w in t)
+    pos = sum(1 for w in POS_WORDS if w in t)
+    em = classify(text)
+    if neg and pos:
+        return em, 0.45
+    hits = neg or pos
+    if hits:
+        return em, min(0.95, 0.7 + 0.1 * (hits - 1))
+    # no cue: 'calm' is a safe call for short replies ("ok", "yes, 12"),
+    # a guess for longer utterances the keyword lists may be missing
+    n_words = len(t.split())
+    if n_words <= 3:
+        return em, 0.65
+    return em, 0.4 if n_words <= 12 else 0.3
+
 def estimate_perf(text: str) -> PerformanceSignals:
     # very rough heuristic: “I got it / I solved it” -> correct
     t1 = _normalize(text)
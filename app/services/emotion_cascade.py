@@ -0,0 +1,113 @@
+# app/services/emotion_cascade.py
+# Confidence-gated emotion cascade: the local keyword classifier answers first,
+# only low-confidence transcripts are escalated to an LLM.
+import os
+import threading
+import time
+from typing import Callable, Optional
+
+from app.models import EmotionSignals
+from app.services import emotion, llm
+from app.services.json_repair import parse_envelope
+
+THRESHOLD = float(os.getenv("EMOTION_CASCADE_THRESHOLD", "0.6"))
+# Use the cascade (with LLM escalation) in the live /session and /ws/voice pipeline
+LIVE_ENABLED = os.getenv("EMOTION_CASCADE", "0").strip().lower() in ("1", "true", "yes", "on")
+LLM_MODEL = os.getenv("EMOTION_LLM_MODEL", "gpt-4o-mini")
+LLM_DEADLINE_SECONDS = float(os.getenv("EMOTION_LLM_DEADLINE_SECONDS", "4"))
+
+# Free-form LLM emotions folded onto the tutor's four labels
+_LABEL_MAP = {
+    "frustrated": "frustrated", "confused": "frustrated", "anxious": "frustrated", "angry": "frustrated",
+    "annoyed": "frustrated", "sad": "frustrated", "stressed": "frustrated", "overwhelmed": "frustrated",
+    "discouraged": "frustrated", "nervous": "frustrated",
+    "engaged": "engaged", "happy": "engaged", "excited": "engaged", "curious": "engaged",
+    "confident": "engaged", "interested": "engaged", "proud": "engaged", "enthusiastic": "engaged",
+    "bored": "bored", "uninterested": "bored", "tired": "bored", "disengaged": "bored", "apathetic": "bored",
+    "calm": "calm", "neutral": "calm", "focused": "calm", "content": "calm", "relaxed": "calm",
+}
+# Default sentiment per label (also used by tutor's joint emotion mode)
+SENTIMENT = {"frustrated": -0.4, "engaged": 0.5, "bored": -0.1, "calm": 0.0}
+
+_stats = {"total": 0, "escalated": 0, "llm_failures": 0}
+_lock = threading.Lock()
+# own breaker: escalation timeouts must not open the tutor's circuit
+_breaker = llm.CircuitBreaker()
+
+def to_label(raw: Optional[str]) -> str:
+    """Map a free-form emotion word onto frustrated/engaged/bored/calm."""
+    return _LABEL_MAP.get((raw or "").strip().lower(), "calm")
+
+def _llm_emotion(text: str) -> dict:
+    prompt = (
+        "Classify the learner's emotional tone in this tutoring message. Respond with raw JSON only: "
+        '{ "emotion": "<frustrated|engaged|bored|calm or a more specific word>", "confidence": 0.00 }\n\n'
+        f'Message: "{text}"'
+    )
+    resp = llm.complete(
+        deadline=time.monotonic() + LLM_DEADLINE_SECONDS,
+        hedge=False,
+        circuit=_breaker,
+        model=LLM_MODEL,
+        messages=[{"role": "user", "content": prompt}],
+        temperature=0.0,
+        max_tokens=40,
+        response_format={"type": "json_object"},
+    )
+    j, _ = parse_envelope(resp.choices[0].message.content or "")
+    return j or {}
+
+def run(text: str, escalate: Callable[[str], dict], threshold: Optional[float] = None) -> dict:
+    """
+    Cascade core. Returns {label, sentiment, confidence, source, raw?} where
+    source is "local" or "llm". `escalate(text)` must return a dict with an
+    "emotion" word and optional "confidence"; on failure the local answer stands.
+    """
+    threshold = THRESHOLD if threshold is None else threshold
+    em, conf = emotion.classify_scored(text)
+    with _lock:
+        _stats["total"] += 1
+    out = {"label": em.label, "sentiment": em.sentiment, "confidence": conf, "source": "local"}
+    if conf >= threshold:
+        return out
+    with _lock:
+        _stats["escalated"] += 1
+    try:
+        j = escalate(text) or {}
+        label = to_label(j.get("emotion"))
+        try:
+            llm_conf = float(j.get("confidence", 0.0) or 0.0)
+        except (TypeError, ValueError):
+            llm_conf = 0.0
+        return {
+            "label": label,
+            "sentiment": SENTIMENT[label],
+            "confidence": llm_conf,
+            "source": "llm",
+            "raw": j,
+        }
+    except Exception as e:
+        with _lock:
+            _stats["llm_failures"] += 1
+        print(f"[emotion_cascade] escalation failed: {e}")
+        return out
+
+def analyze(text: str, threshold: Optional[float] = None) -> dict:
+    """Cascade with the built-in LLM escalation (gpt-4o-mini JSON)."""
+    return run(text, _llm_emotion, threshold)
+
+def classify(text: str) -> EmotionSignals:
+    """Live-pipeline entry: cascade when EMOTION_CASCADE=1, else keywords only."""
+    if not LIVE_ENABLED or not (text or "").strip():
+        return emotion.classify(text)
+    res = analyze(text)
+    return EmotionSignals(label=res["label"], sentiment=res["sentiment"])
+
+def stats() -> dict:
+    with _lock:
+        out = dict(_stats)
+    out["threshold"] = THRESHOLD
+    out["live_enabled"] = LIVE_ENABLED
+    out["escalation_rate"] = round(out["escalated"] / out["total"], 4) if out["total"] else 0.0
+    out["breaker"] = _breaker.snapshot()
+    return out
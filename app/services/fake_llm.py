@@ -0,0 +1,214 @@
+# app/services/fake_llm.py
+# Offline stand-in for the OpenAI chat-completions API (load tests, no network)
+#
+# Two ways to use it:
+#   1) In-process:  LLM_BACKEND=fake  -> app.services.llm.get_client() routes the
+#      OpenAI SDK through FakeLLMTransport (no sockets at all).
+#   2) Standalone:  python -m app.services.fake_llm --port 8011
+#      then OPENAI_BASE_URL=http://127.0.0.1:8011/v1 (any OPENAI_API_KEY).
+#
+# Knobs (env):
+#   FAKE_LLM_LATENCY     fixed:MS | uniform:MIN:MAX | lognormal:MEDIAN_MS:SIGMA  (default fixed:0)
+#   FAKE_LLM_ERROR_RATE  0..1 fraction of requests answered with HTTP 500 (default 0)
+#   FAKE_LLM_CHUNK_MS    delay between streamed chunks (default 15)
+#   FAKE_LLM_SEED        seed for reproducible latency/error/content draws
+import json as _json
+import math
+import os
+import random
+import threading
+import time
+import uuid
+from typing import Iterator, Optional
+
+import httpx
+
+from app.services.tokens import count_tokens
+
+_SUPPORT = [
+    "Nice effort so far.",
+    "Let's slow down and take it one step at a time.",
+    "Good thinking - you're close.",
+    "Here's a quick example: 3 + 4 means start at 3 and count up 4.",
+]
+_QUESTION = [
+    "What do you get when you add 3 and 4?",
+    "Can you try the next step on your own?",
+    "Which part feels tricky right now?",
+    "How would you check your answer?",
+]
+_STEPS = ["explain", "example", "prompt", "quiz", "review"]
+_EMOTIONS = [("engaged", 0.5), ("calm", 0.0), ("frustrated", -0.4), ("bored", -0.1)]
+
+
+class FakeLLMConfig:
+    def __init__(
+        self,
+        latency: Optional[str] = None,
+        error_rate: Optional[float] = None,
+        chunk_ms: Optional[float] = None,
+        seed: Optional[int] = None,
+    ):
+        self.latency = latency if latency is not None else os.getenv("FAKE_LLM_LATENCY", "fixed:0")
+        self.error_rate = float(error_rate if error_rate is not None else os.getenv("FAKE_LLM_ERROR_RATE", "0"))
+        self.chunk_ms = float(chunk_ms if chunk_ms is not None else os.getenv("FAKE_LLM_CHUNK_MS", "15"))
+        if seed is None and os.getenv("FAKE_LLM_SEED"):
+            seed = int(os.getenv("FAKE_LLM_SEED"))
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample_latency_s(self) -> float:
+        kind, _, rest = self.latency.partition(":")
+        args = [float(x) for x in rest.split(":") if x] if rest else []
+        with self._lock:
+            if kind == "uniform" and len(args) == 2:
+                ms = self._rng.uniform(args[0], args[1])
+            elif kind == "lognormal" and args:
+                sigma = args[1] if len(args) > 1 else 0.5
+                ms = args[0] * math.exp(self._rng.gauss(0.0, sigma))
+            else:
+                ms = args[0] if args else 0.0
+        return max(0.0, ms) / 1000.0
+
+    def should_fail(self) -> bool:
+        if self.error_rate <= 0:
+            return False
+        with self._lock:
+            return self._rng.random() < self.error_rate
+
+    def choice(self, seq):
+        with self._lock:
+            return self._rng.choice(seq)
+
+
+def _wants_emotion(messages: list[dict]) -> bool:
+    last = next((m for m in reversed(messages) if m.get("role") == "user"), {})
+    return '"emotion"' in str(last.get("content", ""))
+
+def _wants_joint(messages: list[dict]) -> bool:
+    # tutor joint mode: system prompt asks for emotion + sentiment alongside the reply
+    return any(m.get("role") == "system" and "sentiment (number" in str(m.get("content", "")) for m in messages)
+
+def _wants_json(body: dict) -> bool:
+    rf = body.get("response_format") or {}
+    return rf.get("type") in ("json_object", "json_schema")
+
+def fake_content(body: dict, cfg: FakeLLMConfig) -> str:
+    """Schema-valid content for the kind of request this looks like."""
+    messages = body.get("messages") or []
+    if _wants_emotion(messages):
+        label, _ = cfg.choice(_EMOTIONS)
+        return _json.dumps({"emotion": label, "confidence": 0.8, "explanation": "fake analysis"})
+    if _wants_json(body):
+        env = {"support": cfg.choice(_SUPPORT), "question": cfg.choice(_QUESTION), "next_step": cfg.choice(_STEPS)}
+        if _wants_joint(messages):
+            env["emotion"], env["sentiment"] = cfg.choice(_EMOTIONS)
+        return _json.dumps(env)
+    return f"{cfg.choice(_SUPPORT)} {cfg.choice(_QUESTION)}"
+
+def _usage(body: dict, content: str) -> dict:
+    prompt = sum(count_tokens(str(m.get("content", ""))) + 4 for m in body.get("messages") or [])
+    completion = count_tokens(content)
+    return {
+        "prompt_tokens": prompt,
+        "completion_tokens": completion,
+        "total_tokens": prompt + completion,
+        "prompt_tokens_details": {"cached_tokens": 0},
+    }
+
+def completion_payload(body: dict, content: str) -> dict:
+    return {
+        "id": f"chatcmpl-fake-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "fake"),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop",
+        }],
+        "usage": _usage(body, content),
+    }
+
+def stream_events(body: dict, content: str, cfg: FakeLLMConfig) -> Iterator[bytes]:
+    """Server-sent events in the chat.completion.chunk format."""
+    cid = f"chatcmpl-fake-{uuid.uuid4().hex[:12]}"
+    base = {"id": cid, "object": "chat.completion.chunk", "created": int(time.time()), "model": body.get("model", "fake")}
+    pieces = [content[i:i + 16] for i in range(0, len(content), 16)] or [""]
+    first = {**base, "choices": [{"index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None}]}
+    yield f"data: {_json.dumps(first)}\n\n".encode()
+    for p in pieces:
+        if cfg.chunk_ms > 0:
+            time.sleep(cfg.chunk_ms / 1000.0)
+        chunk = {**base, "choices": [{"index": 0, "delta": {"content": p}, "finish_reason": None}]}
+        yield f"data: {_json.dumps(chunk)}\n\n".encode()
+    last = {**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+    yield f"data: {_json.dumps(last)}\n\n".encode()
+    yield b"data: [DONE]\n\n"
+
+def _error_payload() -> dict:
+    return {"error": {"message": "fake upstream error", "type": "server_error", "code": None}}
+
+
+class FakeLLMTransport(httpx.BaseTransport):
+    """httpx transport answering /chat/completions without any network I/O."""
+
+    def __init__(self, config: Optional[FakeLLMConfig] = None):
+        self.config = config or FakeLLMConfig()
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        if not request.url.path.endswith("/chat/completions"):
+            return httpx.Response(404, json={"error": {"message": "not found"}})
+        body = _json.loads(request.read() or b"{}")
+        time.sleep(self.config.sample_latency_s())
+        if self.config.should_fail():
+            return httpx.Response(500, json=_error_payload())
+        content = fake_content(body, self.config)
+        if body.get("stream"):
+            return httpx.Response(
+                200,
+                headers={"content-type": "text/event-stream"},
+                stream=_IterStream(stream_events(body, content, self.config)),
+            )
+        return httpx.Response(200, json=completion_payload(body, content))
+
+
+class _IterStream(httpx.SyncByteStream):
+    def __init__(self, it: Iterator[bytes]):
+        self._it = it
+
+    def __iter__(self):
+        yield from self._it
+
+
+def create_app(config: Optional[FakeLLMConfig] = None):
+    """Standalone FastAPI app exposing POST /v1/chat/completions."""
+    from fastapi import FastAPI
+    from fastapi.responses import JSONResponse, StreamingResponse
+
+    cfg = config or FakeLLMConfig()
+    app = FastAPI(title="EQiLevel fake LLM")
+
+    @app.post("/v1/chat/completions")
+    def chat_completions(body: dict):
+        time.sleep(cfg.sample_latency_s())
+        if cfg.should_fail():
+            return JSONResponse(_error_payload(), status_code=500)
+        content = fake_content(body, cfg)
+        if body.get("stream"):
+            return StreamingResponse(stream_events(body, content, cfg), media_type="text/event-stream")
+        return completion_payload(body, content)
+
+    return app
+
+
+if __name__ == "__main__":
+    import argparse
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Fake OpenAI chat-completions server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8011)
+    args = parser.parse_args()
+    print(f"[fake_llm] serving on http://{args.host}:{args.port}/v1 (set OPENAI_BASE_URL to this)")
+    uvicorn.run(create_app(), host=args.host, port=args.port)
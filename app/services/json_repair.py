@@ -0,0 +1,139 @@
+# app/services/json_repair.py
+# Tolerant parsing of near-JSON LLM output (fences, trailing commas, truncation)
+import json as _json
+import re
+from typing import Optional, Tuple
+
+_FENCE_RE = re.compile(r"^\s*```[\w-]*\s*|\s*```\s*$")
+
+def _strip_fences(raw: str) -> str:
+    return _FENCE_RE.sub("", raw.strip()).strip()
+
+def _drop_trailing_commas(s: str) -> str:
+    """Remove commas directly before } or ], outside string literals only."""
+    out: list[str] = []
+    in_str = False
+    esc = False
+    pending = None  # index in out of a comma that may turn out to be trailing
+    for ch in s:
+        if in_str:
+            if esc:
+                esc = False
+            elif ch == "\\":
+                esc = True
+            elif ch == '"':
+                in_str = False
+        elif ch == '"':
+            in_str = True
+        elif ch in "}]" and pending is not None:
+            out[pending] = ""
+        if not in_str and ch == ",":
+            pending = len(out)
+        elif not ch.isspace():
+            pending = None
+        out.append(ch)
+    return "".join(out)
+
+def _close_truncated(s: str) -> str:
+    """Close an unterminated string and any open objects/arrays, as happens
+    when the model stops at max_tokens mid-envelope."""
+    stack: list[str] = []
+    in_str = False
+    esc = False
+    for ch in s:
+        if in_str:
+            if esc:
+                esc = False
+            elif ch == "\\":
+                esc = True
+            elif ch == '"':
+                in_str = False
+            continue
+        if ch == '"':
+            in_str = True
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+        elif ch in "}]" and stack:
+            stack.pop()
+    out = s
+    if in_str:
+        if esc:
+            out = out[:-1]
+        out += '"'
+    out = out.rstrip()
+    # dangling key or separator: {"a": "x", "b   /  {"a":
+    out = re.sub(r',\s*"[^"]*"\s*:?\s*$', "", out)
+    out = re.sub(r'[:,]\s*$', "", out)
+    return out + "".join(reversed(stack))
+
+def repair_json(raw: str) -> Optional[dict]:
+    """Best-effort parse of a JSON object from near-JSON text; None if hopeless."""
+    if not raw:
+        return None
+    s = _strip_fences(raw)
+    start = s.find("{")
+    if start == -1:
+        return None
+    s = s[start:]
+    end = s.rfind("}")
+    candidates = []
+    if end != -1:
+        candidates.append(s[: end + 1])
+    candidates.append(s)
+    for c in candidates:
+        for attempt in (c, _drop_trailing_commas(c)):
+            try:
+                j = _json.loads(attempt)
+                if isinstance(j, dict):
+                    return j
+            except ValueError:
+                pass
+    try:
+        j = _json.loads(_drop_trailing_commas(_close_truncated(s)))
+        return j if isinstance(j, dict) else None
+    except ValueError:
+        return None
+
+def _field(raw: str, key: str) -> Optional[str]:
+    # "key": "value...   (closing quote optional when truncated)
+    m = re.search(r'"%s"\s*:\s*"((?:[^"\\]|\\.)*)' % re.escape(key), raw, re.S)
+    if not m:
+        return None
+    val = m.group(1)
+    try:
+        return _json.loads('"' + val.rstrip("\\") + '"')
+    except ValueError:
+        return val
+
+def salvage_fields(raw: str, keys: tuple[str, ...] = ("support", "question", "next_step")) -> dict:
+    """Pull individual string fields out of output that doesn't parse at all."""
+    out = {}
+    for k in keys:
+        v = _field(raw or "", k)
+        if v is not None and v.strip():
+            out[k] = v
+    return out
+
+def parse_envelope(raw: str) -> Tuple[Optional[dict], str]:
+    """
+    Parse the tutor JSON envelope.
+    Returns (obj, status) with status one of:
+      ok        strict json.loads succeeded
+      repaired  parsed after fences/trailing commas/truncation fixes
+      salvaged  fields extracted by pattern from partial output
+      failed    nothing usable (obj is None)
+    """
+    raw = raw or ""
+    try:
+        j = _json.loads(raw)
+        if isinstance(j, dict):
+            return j, "ok"
+    except ValueError:
+        pass
+    j = repair_json(raw)
+    if j is not None:
+        return j, "repaired"
+    fields = salvage_fields(raw)
+    if fields:
+        return fields, "salvaged"
+    return None, "failed"
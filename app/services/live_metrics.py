@@ -0,0 +1,241 @@
+# app/services/live_metrics.py
+# In-process streaming metrics: the compute_metrics snapshot over sliding
+# windows, for all turns and per session, kept in memory so live classroom
+# monitoring (GET /api/v1/metrics/live) never queries the database.
+#
+# - fed by storage._turns_written after every committed turns insert
+# - per scope, turn counts (turn_rollups.COLUMNS) go into buckets of
+#   LIVE_METRICS_BUCKET_SECONDS; each window in LIVE_METRICS_WINDOWS keeps a
+#   running total, adding new turns and subtracting buckets as they expire,
+#   so a snapshot costs the same however many turns the window holds
+# - a last-10 reward ring per scope
+# - rebuilt on startup from the turns of the longest window
+#
+# Windows slide in bucket steps (they reach back up to one bucket further than
+# the nominal length; window_start_utc is exact). Like the dialogue cache, only
+# this process's writes are seen: with several workers, route the dashboard to
+# one of them or run a single worker.
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta, timezone
+
+from app.services.turn_rollups import COLUMNS, row_counts, snapshot
+
+
+def _windows(raw: str) -> tuple[int, ...]:
+    return tuple(sorted({int(m) for m in raw.replace(" ", "").split(",") if m and int(m) > 0}))
+
+# Window lengths in minutes; empty or 0 disables the aggregator
+WINDOWS = _windows(os.getenv("LIVE_METRICS_WINDOWS", "5,15,60"))
+BUCKET_SECONDS = max(1, int(os.getenv("LIVE_METRICS_BUCKET_SECONDS", "15")))
+# Per-session scopes kept (least recently written dropped first)
+MAX_SESSIONS = int(os.getenv("LIVE_METRICS_MAX_SESSIONS", "10000"))
+
+_N = len(COLUMNS)
+_REWARD = COLUMNS.index("reward_sum")
+
+
+def _epoch(dt: datetime) -> float:
+    # created_at is naive UTC
+    return (dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)).timestamp()
+
+
+class _Window:
+    __slots__ = ("span", "buckets", "totals")
+
+    def __init__(self, span: int) -> None:
+        self.span = span  # buckets before the current one still inside the window
+        # (bucket, counts) oldest first; the counts lists are shared by the scope's windows
+        self.buckets: deque = deque()
+        self.totals = [0] * _N
+
+    def expire(self, now_bucket: int) -> None:
+        while self.buckets and self.buckets[0][0] < now_bucket - self.span:
+            _, counts = self.buckets.popleft()
+            for i, v in enumerate(counts):
+                self.totals[i] -= v
+        if not self.buckets:
+            self.totals = [0] * _N  # no float residue in reward_sum
+
+
+class _Scope:
+    __slots__ = ("windows", "newest", "recent")
+
+    def __init__(self, spans: list[int]) -> None:
+        self.windows = [_Window(s) for s in spans]
+        self.newest: tuple[int, list] | None = None
+        # (bucket, reward) of the last 10 turns
+        self.recent: deque = deque(maxlen=10)
+
+    def add(self, bucket: int, counts: list) -> None:
+        if self.newest is None or bucket > self.newest[0]:
+            self.newest = (bucket, [0] * _N)
+            for w in self.windows:
+                w.expire(bucket)
+                w.buckets.append(self.newest)
+        # a turn stamped before the newest bucket (clock skew) joins the newest one
+        current = self.newest[1]
+        for i, v in enumerate(counts):
+            current[i] += v
+        for w in self.windows:
+            totals = w.totals
+            for i, v in enumerate(counts):
+                totals[i] += v
+        self.recent.append((self.newest[0], counts[_REWARD]))
+
+
+class _State:
+    def __init__(self, spans: list[int]) -> None:
+        self.spans = spans
+        self.all = _Scope(spans)
+        self.sessions: "OrderedDict[int, _Scope]" = OrderedDict()
+
+
+class LiveMetrics:
+    def __init__(self, windows: tuple[int, ...], bucket_seconds: int, max_sessions: int) -> None:
+        self.windows = windows
+        self.bucket_seconds = bucket_seconds
+        self.max_sessions = max_sessions
+        self._spans = [m * 60 // bucket_seconds for m in windows]
+        self._lock = threading.Lock()
+        self._state = _State(self._spans)
+        # rows recorded while rebuild() loads, applied to the rebuilt state
+        self._pending: list | None = None
+        self.turns_recorded = 0
+        self.rebuilt: dict | None = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.windows)
+
+    def _bucket(self, ts: float) -> int:
+        return int(ts // self.bucket_seconds)
+
+    def _add(self, state: _State, row: dict, ts: float) -> None:
+        bucket, counts = self._bucket(ts), row_counts(row)
+        state.all.add(bucket, counts)
+        sid = int(row["session_id"])
+        scope = state.sessions.get(sid)
+        if scope is None:
+            scope = state.sessions[sid] = _Scope(state.spans)
+        else:
+            state.sessions.move_to_end(sid)
+        scope.add(bucket, counts)
+        # drop sessions with nothing left in the longest window, then LRU over the cap
+        horizon = state.all.newest[0] - max(state.spans)
+        while state.sessions:
+            old_sid, old = next(iter(state.sessions.items()))
+            if len(state.sessions) <= self.max_sessions and old.newest[0] >= horizon:
+                break
+            del state.sessions[old_sid]
+
+    def record(self, rows: list[dict], now: float | None = None) -> None:
+        """Count committed turns (rows of turns column values; created_at if known, else now)."""
+        if not self.enabled:
+            return
+        now = time.time() if now is None else now
+        # imported history older than every window is not live
+        horizon = now - max(self.windows) * 60 - self.bucket_seconds
+        with self._lock:
+            for r in rows:
+                ts = _epoch(r["created_at"]) if isinstance(r.get("created_at"), datetime) else now
+                if ts < horizon:
+                    continue
+                if self._pending is not None:
+                    self._pending.append((r, ts))
+                else:
+                    self._add(self._state, r, ts)
+                self.turns_recorded += 1
+
+    def rebuild(self, load) -> int:
+        """Replace the state with turns from load(since) (dicts with id and
+        created_at, in id order) covering the longest window."""
+        if not self.enabled:
+            return 0
+        t0 = time.perf_counter()
+        since = datetime.now(timezone.utc) - timedelta(minutes=max(self.windows), seconds=self.bucket_seconds)
+        with self._lock:
+            self._pending = []
+        state, loaded, ok = _State(self._spans), set(), False
+        try:
+            for r in load(since):
+                self._add(state, r, _epoch(r["created_at"]))
+                loaded.add(int(r["id"]))
+            ok = True
+        finally:
+            with self._lock:
+                pending, self._pending = self._pending, None
+                if ok:
+                    self._state = state
+                    self.rebuilt = {
+                        "at": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
+                        "turns": len(loaded),
+                        "seconds": round(time.perf_counter() - t0, 3),
+                    }
+                # turns committed during the load, unless the load already saw them
+                for r, ts in pending:
+                    if r.get("id") is None or int(r["id"]) not in loaded:
+                        self._add(self._state, r, ts)
+        return len(loaded)
+
+    def snapshot(self, session_id: int | None = None, since_minutes: int | None = None,
+                 now: float | None = None) -> dict:
+        """compute_metrics-shaped snapshot of one window (default the longest)."""
+        window = max(self.windows) if since_minutes is None else since_minutes
+        if window not in self.windows:
+            raise ValueError(f"since_minutes must be one of {list(self.windows)}")
+        idx = self.windows.index(window)
+        now_bucket = self._bucket(time.time() if now is None else now)
+        start = now_bucket - self._spans[idx]
+        with self._lock:
+            scope = self._state.all if session_id is None else self._state.sessions.get(int(session_id))
+            if scope is None:
+                totals, rewards = [0] * _N, []
+            else:
+                w = scope.windows[idx]
+                w.expire(now_bucket)
+                totals = list(w.totals)
+                rewards = [r for b, r in scope.recent if b >= start]
+        filters = {}
+        if session_id is not None:
+            filters["session_id"] = session_id
+        filters["since_minutes"] = window
+        ws = datetime.fromtimestamp(start * self.bucket_seconds, timezone.utc)
+        filters["window_start_utc"] = ws.isoformat().replace("+00:00", "Z")
+        return snapshot(dict(zip(COLUMNS, totals)), sum(rewards) / len(rewards) if rewards else 0.0, filters)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "windows_minutes": list(self.windows),
+                "bucket_seconds": self.bucket_seconds,
+                "sessions": len(self._state.sessions),
+                "max_sessions": self.max_sessions,
+                "turns_recorded": self.turns_recorded,
+                "rebuilt": self.rebuilt,
+            }
+
+
+aggregator = LiveMetrics(WINDOWS, BUCKET_SECONDS, MAX_SESSIONS)
+
+
+def _load_from_db(since: datetime):
+    from sqlalchemy import select
+
+    from app.db.schema import Turn
+    from app.services.storage import engine
+
+    cols = (Turn.id, Turn.session_id, Turn.reward, Turn.emotion_label, Turn.tone, Turn.pacing,
+            Turn.difficulty, Turn.next_step, Turn.created_at)
+    # id order, like the write hook (and the last-10 ring of compute_metrics)
+    stmt = select(*cols).where(Turn.created_at >= since).order_by(Turn.id)
+    with engine.connect() as c:
+        for row in c.execute(stmt).mappings():
+            yield dict(row)
+
+def rebuild_from_db(live: LiveMetrics | None = None) -> int:
+    """Startup: refill the aggregator from the turns of the longest window."""
+    return (live or aggregator).rebuild(_load_from_db)
@@ -0,0 +1,234 @@
+# app/services/llm.py
+# Shared chat-completions client (real OpenAI or the offline fake)
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from openai import APIStatusError, OpenAI
+
+_client: OpenAI | None = None
+
+def backend() -> str:
+    """'openai' (default) or 'fake' (env: LLM_BACKEND)."""
+    return (os.getenv("LLM_BACKEND") or "openai").strip().lower()
+
+def make_fake_client(config=None) -> OpenAI:
+    """OpenAI SDK client whose HTTP layer is the in-process fake server."""
+    import httpx
+    from app.services.fake_llm import FakeLLMTransport
+    return OpenAI(
+        api_key=os.getenv("OPENAI_API_KEY") or "fake-key",
+        base_url="http://fake-llm.local/v1",
+        http_client=httpx.Client(transport=FakeLLMTransport(config)),
+    )
+
+def get_client() -> OpenAI:
+    """
+    Process-wide client, created once so HTTP connections are reused.
+    LLM_BACKEND=fake routes requests to app.services.fake_llm (no network);
+    OPENAI_BASE_URL can also point the real SDK at a standalone fake server.
+    """
+    global _client
+    if _client is None:
+        _client = make_fake_client() if backend() == "fake" else OpenAI()  # reads OPENAI_API_KEY
+    return _client
+
+# ---- deadlines, hedging, circuit breaker -------------------------------------
+DEADLINE_SECONDS = float(os.getenv("TUTOR_DEADLINE_SECONDS", "12"))
+HEDGE_ENABLED = os.getenv("LLM_HEDGE", "0").strip().lower() in ("1", "true", "yes", "on")
+HEDGE_MIN_MS = float(os.getenv("LLM_HEDGE_MIN_MS", "400"))
+BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+BREAKER_COOLDOWN_SECONDS = float(os.getenv("LLM_BREAKER_COOLDOWN_SECONDS", "30"))
+
+class LLMUnavailable(RuntimeError):
+    """Raised without calling the provider while the circuit breaker is open."""
+
+class LLMTimeout(TimeoutError):
+    """Raised when no completion arrived before the per-turn deadline."""
+
+class CircuitBreaker:
+    """
+    closed    -> calls flow; `failures` consecutive errors/timeouts open it
+    open      -> calls are refused until `cooldown_s` has passed
+    half_open -> one probe call is let through; success closes, failure re-opens
+    """
+
+    def __init__(self, failures: int = BREAKER_FAILURES, cooldown_s: float = BREAKER_COOLDOWN_SECONDS):
+        self.failure_threshold = max(1, failures)
+        self.cooldown_s = cooldown_s
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.trips = 0
+        self.rejected = 0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "open" and (time.monotonic() - self.opened_at) >= self.cooldown_s:
+                self.state = "half_open"
+            if self.state == "closed":
+                return True
+            if self.state == "half_open" and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = "closed"
+            self.consecutive_failures = 0
+            self._probe_in_flight = False
+
+    def release(self) -> None:
+        """The call ended without telling us anything about provider health."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.consecutive_failures += 1
+            self._probe_in_flight = False
+            if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+                if self.state != "open":
+                    self.trips += 1
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            retry_in = 0.0
+            if self.state == "open":
+                retry_in = max(0.0, self.cooldown_s - (time.monotonic() - self.opened_at))
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "trips": self.trips,
+                "rejected": self.rejected,
+                "retry_in_seconds": round(retry_in, 1),
+            }
+
+class _LatencyWindow:
+    """Recent successful call latencies (seconds) for the hedge delay."""
+
+    def __init__(self, size: int = 200):
+        self._samples: deque[float] = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def p95(self) -> float | None:
+        with self._lock:
+            if len(self._samples) < 20:
+                return None
+            s = sorted(self._samples)
+        return s[min(len(s) - 1, int(0.95 * len(s)))]
+
+breaker = CircuitBreaker()
+_latency = _LatencyWindow()
+_stats = {"calls": 0, "hedged": 0, "hedge_wins": 0, "timeouts": 0, "errors": 0}
+_stats_lock = threading.Lock()
+_pool = ThreadPoolExecutor(max_workers=int(os.getenv("LLM_MAX_CONCURRENCY", "16")), thread_name_prefix="llm")
+
+def hedge_delay_s() -> float:
+    """Delay before sending the hedged duplicate: observed p95, floored."""
+    p95 = _latency.p95()
+    floor = HEDGE_MIN_MS / 1000.0
+    return max(floor, p95) if p95 is not None else floor
+
+def _breaker_failure(err: Exception) -> bool:
+    """Timeouts, connection errors, 429 and 5xx count against the breaker; client
+    errors (bad request, auth, context length) are about one prompt, not the provider."""
+    if isinstance(err, APIStatusError):
+        return err.status_code in (408, 429) or err.status_code >= 500
+    return True
+
+def _count(key: str) -> None:
+    # bumped from request threads and the hedging pool
+    with _stats_lock:
+        _stats[key] += 1
+
+def complete(deadline: float | None = None, hedge: bool | None = None, client=None,
+             circuit: CircuitBreaker | None = None, **create_kwargs):
+    """
+    chat.completions.create with a hard deadline (time.monotonic() value),
+    an optional hedged second request after the p95 latency, and a circuit
+    breaker: the shared tutor `breaker` unless a background caller passes its
+    own `circuit`, so its timeouts don't send live turns to the canned reply.
+    Client errors (4xx other than 408/429) are re-raised without counting
+    against the breaker. Raises LLMUnavailable, LLMTimeout or the provider error.
+    """
+    circuit = circuit or breaker
+    if not circuit.allow():
+        raise LLMUnavailable("LLM circuit open; skipping provider call")
+    client = client or get_client()
+    hedge = HEDGE_ENABLED if hedge is None else hedge
+    if deadline is None:
+        deadline = time.monotonic() + DEADLINE_SECONDS
+    _count("calls")
+
+    def _call():
+        remaining = max(0.1, deadline - time.monotonic())
+        t0 = time.monotonic()
+        resp = client.with_options(timeout=remaining, max_retries=0).chat.completions.create(**create_kwargs)
+        return resp, time.monotonic() - t0
+
+    primary = _pool.submit(_call)
+    pending = {primary}
+    if hedge:
+        delay = min(hedge_delay_s(), max(0.0, deadline - time.monotonic()))
+        done, _ = wait(pending, timeout=delay)
+        if not done and time.monotonic() < deadline:
+            _count("hedged")
+            pending.add(_pool.submit(_call))
+
+    last_err: Exception | None = None
+    while pending:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+        for fut in done:
+            try:
+                resp, took = fut.result()
+            except Exception as e:
+                if not _breaker_failure(e):
+                    circuit.release()
+                    _count("errors")
+                    raise
+                last_err = e
+                continue
+            if fut is not primary:
+                _count("hedge_wins")
+            _latency.add(took)
+            circuit.record_success()
+            return resp
+        if not done:
+            break
+
+    circuit.record_failure()
+    if last_err is not None and not pending:
+        _count("errors")
+        raise last_err
+    _count("timeouts")
+    raise LLMTimeout("no completion before the turn deadline")
+
+def health_snapshot() -> dict:
+    """Breaker state, hedge counters and latency for /api/v1/health/full."""
+    p95 = _latency.p95()
+    with _stats_lock:
+        stats = dict(_stats)
+    return {
+        "backend": backend(),
+        "breaker": breaker.snapshot(),
+        "deadline_seconds": DEADLINE_SECONDS,
+        "hedge": {"enabled": HEDGE_ENABLED, "delay_ms": round(hedge_delay_s() * 1000)},
+        "latency_p95_ms": round(p95 * 1000) if p95 is not None else None,
+        **stats,
+    }
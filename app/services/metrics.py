@@ -1,48 +1,38 @@
 # app/services/metrics.py
 from __future__ import annotations
-from app.db.schema import Turn
-from app.services.storage import SessionLocal
+from app.db.schema import Turn, TurnRollup
+from app.services.storage import read_session
+from app.services.turn_rollups import aggregates, first_full_minute, int_div, minute_expr, minute_start, snapshot
 from datetime import datetime, timedelta, timezone
-from sqlalchemy import select, func, or_, case, String
+from sqlalchemy import select, func, case, literal, literal_column, true, union_all
 from typing import Optional, Dict, Any, List
 
-def _counts_by_emotion(db, session_id, cutoff_dt):
-    def _with_filters(stmt):
+# Windows are answered from turn_rollups (one row per session and minute) for
+# every whole minute, plus the raw turns of the partial minute the window
+# starts in, so the cost follows the window length rather than its turn count.
+
+def _window(session_id, cutoff_dt: Optional[datetime]):
+    """(rollup filter, raw partial-first-minute filter or None) for a window."""
+    def rolled(stmt):
         if session_id:
-            stmt = stmt.where(Turn.session_id == session_id)
+            stmt = stmt.where(TurnRollup.session_id == session_id)
         if cutoff_dt is not None:
-            stmt = stmt.where(Turn.created_at >= cutoff_dt)
+            stmt = stmt.where(TurnRollup.minute >= first_full_minute(cutoff_dt))
         return stmt
 
-    def Q(label):  # count where emotion.label == label
-        stmt = select(func.count(Turn.id)).where(Turn.emotion["label"].as_string() == label)
-        return db.scalar(_with_filters(stmt)) or 0
-
-    return {
-        "frustrated": Q("frustrated"),
-        "engaged":    Q("engaged"),
-        "calm":       Q("calm"),
-        "bored":      Q("bored"),
-    }
+    if cutoff_dt is None:
+        return rolled, None
 
-def _action_distribution(db, session_id, cutoff_dt):
-    def _with_filters(stmt):
+    def edge(stmt, dialect):
+        first = first_full_minute(cutoff_dt)
         if session_id:
             stmt = stmt.where(Turn.session_id == session_id)
-        if cutoff_dt is not None:
-            stmt = stmt.where(Turn.created_at >= cutoff_dt)
-        return stmt
-
-    def S(key, value):
-        stmt = select(func.count(Turn.id)).where(Turn.mcp[key].as_string() == value)
-        return db.scalar(_with_filters(stmt)) or 0
-
-    return {
-        "tone":       {t: S("tone", t) for t in ["warm","encouraging","neutral","concise"]},
-        "pacing":     {p: S("pacing", p) for p in ["slow","medium","fast"]},
-        "difficulty": {d: S("difficulty", d) for d in ["down","hold","up"]},
-        "next_step":  {n: S("next_step", n) for n in ["example","prompt","explain","quiz","review"]},
-    }
+        # the created_at range keeps it an index range scan (a minute of slack for
+        # text timestamps on SQLite); minute_expr is the exact bucket boundary
+        return (stmt.where(Turn.created_at >= cutoff_dt)
+                    .where(Turn.created_at < minute_start(first + 1))
+                    .where(minute_expr(dialect) < first))
+    return rolled, edge
 
 def _series_basic(db, session_id: Optional[str], cutoff_dt: Optional[datetime], bucket: str = "minute") -> List[Dict[str, Any]]:
     """
@@ -53,47 +43,39 @@ def _series_basic(db, session_id: Optional[str], cutoff_dt: Optional[datetime],
     Buckets: 'minute' or 'hour'
     """
     assert bucket in ("minute", "hour")
-    bucket_fn = func.date_trunc(bucket, Turn.created_at).label("ts")
-
-    def _with_filters(stmt):
-        if session_id:
-            stmt = stmt.where(Turn.session_id == session_id)
-        if cutoff_dt is not None:
-            stmt = stmt.where(Turn.created_at >= cutoff_dt)
-        return stmt
-
-    # base aggregates
-    base_stmt = (
-        select(
-            bucket_fn,
-            func.count(Turn.id).label("turns"),
-            func.avg(Turn.reward).label("avg_reward"),
-            func.sum(
-                case(
-                    (
-                        Turn.emotion["label"].as_string() == "frustrated",
-                        1
-                    ),
-                    else_=0
-                )
-            ).label("frustrated")
-        )
-        .group_by(bucket_fn)
-        .order_by(bucket_fn.asc())
+    dialect = db.get_bind().dialect.name
+    rolled, edge = _window(session_id, cutoff_dt)
+
+    def _bucket(minute):
+        return minute if bucket == "minute" else int_div(minute, 60) * literal_column("60")
+
+    parts = [rolled(select(
+        _bucket(TurnRollup.minute).label("b"),
+        TurnRollup.turns.label("turns"),
+        TurnRollup.reward_sum.label("reward_sum"),
+        TurnRollup.emotion_frustrated.label("frustrated"),
+    ))]
+    if edge is not None:
+        parts.append(edge(select(
+            _bucket(minute_expr(dialect)).label("b"),
+            literal(1).label("turns"),
+            Turn.reward.label("reward_sum"),
+            case((Turn.emotion_label == "frustrated", 1), else_=0).label("frustrated"),
+        ), dialect))
+    u = union_all(*parts).subquery()
+    stmt = (
+        select(u.c.b, func.sum(u.c.turns), func.sum(u.c.reward_sum), func.sum(u.c.frustrated))
+        .group_by(u.c.b)
+        .order_by(u.c.b.asc())
     )
 
-    rows = db.execute(_with_filters(base_stmt)).all()
     series = []
-    for ts, turns, avg_reward, frustrated in rows:
-        # Ensure UTC 'Z' formatting
-        if getattr(ts, 'tzinfo', None) is not None:
-            ts_str = ts.astimezone(timezone.utc).isoformat().replace("+00:00", "Z")
-        else:
-            ts_str = ts.isoformat() + "Z"
+    for minute, turns, reward_sum, frustrated in db.execute(stmt).all():
+        turns = int(turns or 0)
         series.append({
-            "ts": ts_str,
-            "turns": int(turns or 0),
-            "avg_reward": float(avg_reward or 0.0),
+            "ts": minute_start(int(minute)).isoformat().replace("+00:00", "Z"),
+            "turns": turns,
+            "avg_reward": float(reward_sum or 0.0) / turns if turns else 0.0,
             "frustrated": int(frustrated or 0),
         })
     return series
@@ -126,122 +108,24 @@ def compute_metrics(session_id: Optional[int] = None,
             stmt = stmt.where(Turn.created_at >= cutoff_dt)
         return stmt
 
-    # Helper: Postgres JSONB text extractor (portable across SA/pg versions)
-    def J(col, key: str):
-        # col ->> 'key'
-        return col.op('->>')(key)
-
-    with SessionLocal() as db:
-        # ---- Totals ----
-        turns_total = db.scalar(_with_filters(select(func.count(Turn.id)))) or 0
-
-        # ---- Average reward ---- (of all filtered turns)
-        avg_reward = db.scalar(_with_filters(select(func.avg(Turn.reward)))) or 0.0
-
-        # ---- Frustration adaptation rate ----
-        # denominator: # frustrated turns
-        frustrated_total = db.scalar(
-            _with_filters(
-                select(func.count(Turn.id)).where(J(Turn.emotion, 'label') == 'frustrated')
-            )
-        ) or 0
-
-        # numerator: among frustrated, how many adapted (pacing slow OR difficulty down)
-        adapted_frustrated = db.scalar(
-            _with_filters(
-                select(func.count(Turn.id))
-                .where(J(Turn.emotion, 'label') == 'frustrated')
-                .where(
-                    or_(
-                        J(Turn.mcp, 'pacing') == 'slow',
-                        J(Turn.mcp, 'difficulty') == 'down'
-                    )
-                )
-            )
-        ) or 0
-
-        frustration_adaptation_rate = (adapted_frustrated / frustrated_total) if frustrated_total else 0.0
-
-        # ---- Tone alignment (heuristic proxy) ----
-        # frustrated -> warm/encouraging
-        frustrated_aligned = db.scalar(
-            _with_filters(
-                select(func.count(Turn.id))
-                .where(J(Turn.emotion, 'label') == 'frustrated')
-                .where(J(Turn.mcp, 'tone').in_(['warm', 'encouraging']))
-            )
-        ) or 0
-
-        # engaged -> encouraging
-        engaged_aligned = db.scalar(
-            _with_filters(
-                select(func.count(Turn.id))
-                .where(J(Turn.emotion, 'label') == 'engaged')
-                .where(J(Turn.mcp, 'tone') == 'encouraging')
-            )
-        ) or 0
-
-        # calm -> neutral
-        calm_aligned = db.scalar(
-            _with_filters(
-                select(func.count(Turn.id))
-                .where(J(Turn.emotion, 'label') == 'calm')
-                .where(J(Turn.mcp, 'tone') == 'neutral')
-            )
-        ) or 0
-
-        # bored -> concise
-        bored_aligned = db.scalar(
-            _with_filters(
-                select(func.count(Turn.id))
-                .where(J(Turn.emotion, 'label') == 'bored')
-                .where(J(Turn.mcp, 'tone') == 'concise')
-            )
-        ) or 0
-
-        tone_aligned = frustrated_aligned + engaged_aligned + calm_aligned + bored_aligned
-
-        tone_labeled_total = db.scalar(
-            _with_filters(
-                select(func.count(Turn.id)).where(
-                    J(Turn.emotion, 'label').in_(['frustrated', 'engaged', 'calm', 'bored'])
-                )
-            )
-        ) or 0
-
-        tone_alignment_rate = (tone_aligned / tone_labeled_total) if tone_labeled_total else 0.0
-
-        # ---- Last 10 reward Moving Average (subquery pattern for PG) ----
-        subq = _with_filters(
-            select(Turn.reward).order_by(Turn.id.desc()).limit(10)
-        ).subquery()
-        last_10_reward_avg = db.scalar(select(func.avg(subq.c.reward))) or 0.0
-
-        # ---- Emotion counts ----
-        def count_emotion(lbl: str) -> int:
-            return db.scalar(
-                _with_filters(select(func.count(Turn.id)).where(J(Turn.emotion, 'label') == lbl))
-            ) or 0
-
-        by_emotion = {
-            "frustrated": count_emotion("frustrated"),
-            "engaged":    count_emotion("engaged"),
-            "calm":       count_emotion("calm"),
-            "bored":      count_emotion("bored"),
-        }
-
-        # ---- Action distribution ----
-        def count_mcp(field: str, value: str) -> int:
-            return db.scalar(
-                _with_filters(select(func.count(Turn.id)).where(J(Turn.mcp, field) == value))
-            ) or 0
-
-        action_distribution = {
-            "tone":       {t: count_mcp("tone", t) for t in ["warm","encouraging","neutral","concise"]},
-            "pacing":     {p: count_mcp("pacing", p) for p in ["slow","medium","fast"]},
-            "difficulty": {d: count_mcp("difficulty", d) for d in ["down","hold","up"]},
-            "next_step":  {n: count_mcp("next_step", n) for n in ["example","prompt","explain","quiz","review"]},
-        }
+    with read_session() as db:
+        # One statement: summed rollups of the whole minutes, the same aggregates
+        # over the raw turns of the partial first minute, and the last-10 average
+        # (newest turns by id) as a scalar subquery
+        dialect = db.get_bind().dialect.name
+        cols = aggregates(dialect)
+        rolled, edge = _window(session_id, cutoff_dt)
+        parts = [rolled(select(*(func.sum(TurnRollup.__table__.c[k]).label(k) for k in cols))).subquery()]
+        if edge is not None:
+            parts.append(edge(select(*(c.label(k) for k, c in cols.items())), dialect).subquery())
+        last_10 = _with_filters(select(Turn.reward).order_by(Turn.id.desc()).limit(10)).subquery()
+        stmt = select(
+            *(sum(func.coalesce(p.c[k], 0) for p in parts).label(k) for k in cols),
+            select(func.avg(last_10.c.reward)).scalar_subquery().label("last_10_reward_avg"),
+        ).select_from(parts[0])
+        for p in parts[1:]:
+            stmt = stmt.join(p, true())
+        row = db.execute(stmt).one()._mapping
 
         filters = {}
         if session_id is not None:
@@ -251,16 +135,7 @@ def compute_metrics(session_id: Optional[int] = None,
             ws = datetime.now(timezone.utc) - timedelta(minutes=since_minutes)
             filters["window_start_utc"] = ws.isoformat().replace("+00:00", "Z")
 
-        return {
-            "turns_total": turns_total,
-            "avg_reward": float(round(avg_reward, 4)),
-            "frustration_adaptation_rate": float(round(frustration_adaptation_rate, 4)),
-            "tone_alignment_rate": float(round(tone_alignment_rate, 4)),
-            "last_10_reward_avg": float(round(last_10_reward_avg, 4)),
-            "by_emotion": by_emotion,
-            "action_distribution": action_distribution,
-            "filters": filters,
-        }
+        return snapshot(row, row["last_10_reward_avg"], filters)
 
 def compute_series(session_id: Optional[str] = None,
                    since_minutes: Optional[int] = 240,
@@ -272,7 +147,7 @@ def compute_series(session_id: Optional[str] = None,
     if since_minutes and since_minutes > 0:
         cutoff_dt = datetime.now(timezone.utc) - timedelta(minutes=since_minutes)
 
-    with SessionLocal() as db:
+    with read_session() as db:
         series = _series_basic(db, session_id=session_id, cutoff_dt=cutoff_dt, bucket=bucket)
 
     return {
@@ -0,0 +1,132 @@
+# app/services/prompt.py
+# Prompt compilation ordered for provider-side prompt caching:
+#   [static system block] [rolling summary] [history...] [per-turn controls] [user]
+# The static block (template rules + JSON instructions + objectives) is byte-identical
+# across turns of a session, and history only grows at the end, so the cached
+# prefix keeps extending instead of being invalidated by per-turn MCP values.
+import string
+import threading
+from typing import Optional
+
+from app.services.objectives import format_for_prompt
+
+# Bump when the compiled layout changes so memoized blocks are rebuilt
+PROMPT_VERSION = "1"
+
+JSON_INSTRUCTIONS = (
+    "Return JSON with keys: support (string, optional), question (string, required), "
+    "next_step (one of: explain, example, prompt, quiz, review)."
+)
+# Joint mode: the same completion also reads the learner's emotion
+JOINT_EMOTION_INSTRUCTIONS = (
+    "Also include emotion (the learner's emotional tone in their latest message, one of: "
+    "frustrated, engaged, bored, calm) and sentiment (number from -1.0 to 1.0). "
+    "Let that emotion guide the reply even if the per-turn settings disagree."
+)
+
+_static_cache: dict[tuple, str] = {}
+_split_cache: dict[str, tuple[str, str]] = {}
+_STATIC_CACHE_MAX = 512
+
+def _has_fields(line: str) -> bool:
+    try:
+        return any(field is not None for _, field, _, _ in string.Formatter().parse(line))
+    except ValueError:
+        return False
+
+def split_template(tmpl: str) -> tuple[str, str]:
+    """
+    Split a system template into (static, volatile): lines with format
+    placeholders like {tone} are per-turn controls, everything else is static.
+    """
+    hit = _split_cache.get(tmpl)
+    if hit is not None:
+        return hit
+    static_lines, volatile_lines = [], []
+    for line in tmpl.splitlines():
+        (volatile_lines if _has_fields(line) else static_lines).append(line)
+    static = "\n".join(static_lines).strip()
+    volatile = "\n".join(volatile_lines).strip()
+    if len(_split_cache) < _STATIC_CACHE_MAX:
+        _split_cache[tmpl] = (static, volatile)
+    return static, volatile
+
+def _objectives_key(objectives: Optional[list[dict]]) -> tuple:
+    return tuple((o.get("objective_code") or "").strip() for o in (objectives or []))
+
+def static_block(tmpl: str, objectives: Optional[list[dict]] = None, json_mode: bool = True, with_emotion: bool = False) -> str:
+    """Template rules + JSON instructions + objective block, memoized per
+    (prompt version, template, objective codes, mode)."""
+    with_emotion = with_emotion and json_mode
+    key = (PROMPT_VERSION, tmpl, _objectives_key(objectives), json_mode, with_emotion)
+    hit = _static_cache.get(key)
+    if hit is not None:
+        return hit
+    static, _ = split_template(tmpl)
+    parts = [static]
+    if json_mode:
+        parts.append(JSON_INSTRUCTIONS)
+    if with_emotion:
+        parts.append(JOINT_EMOTION_INSTRUCTIONS)
+    if objectives:
+        parts.append(format_for_prompt(objectives).strip())
+    block = "\n\n".join(p for p in parts if p)
+    if len(_static_cache) >= _STATIC_CACHE_MAX:
+        _static_cache.clear()
+    _static_cache[key] = block
+    return block
+
+def controls_block(tmpl: str, values: dict) -> str:
+    """Per-turn MCP controls rendered from the template's placeholder lines."""
+    _, volatile = split_template(tmpl)
+    if not volatile:
+        return ""
+    try:
+        rendered = volatile.format(**values)
+    except Exception:
+        rendered = volatile
+    return "Settings for this turn:\n" + rendered
+
+def compile_messages(
+    tmpl: str,
+    mcp_values: dict,
+    user_text: str,
+    history: Optional[list[dict]] = None,
+    objectives: Optional[list[dict]] = None,
+    summary_text: str = "",
+    json_mode: bool = True,
+    with_emotion: bool = False,
+) -> list[dict]:
+    """Chat messages with stable content first and volatile content last."""
+    messages = [{"role": "system", "content": static_block(tmpl, objectives, json_mode, with_emotion)}]
+    if summary_text:
+        messages.append({"role": "system", "content": summary_text})
+    messages.extend(history or [])
+    controls = controls_block(tmpl, mcp_values)
+    if controls:
+        messages.append({"role": "system", "content": controls})
+    messages.append({"role": "user", "content": user_text})
+    return messages
+
+# ---- provider cache accounting ---------------------------------------------------
+_usage = {"calls": 0, "prompt_tokens": 0, "cached_tokens": 0}
+_usage_lock = threading.Lock()
+
+def record_usage(usage) -> None:
+    """Accumulate prompt/cached token counts from a completion's usage field."""
+    if usage is None:
+        return
+    prompt_tokens = int(getattr(usage, "prompt_tokens", 0) or 0)
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached = int(getattr(details, "cached_tokens", 0) or 0) if details is not None else 0
+    with _usage_lock:
+        _usage["calls"] += 1
+        _usage["prompt_tokens"] += prompt_tokens
+        _usage["cached_tokens"] += cached
+
+def cache_stats() -> dict:
+    with _usage_lock:
+        out = dict(_usage)
+    out["cached_ratio"] = round(out["cached_tokens"] / out["prompt_tokens"], 4) if out["prompt_tokens"] else 0.0
+    out["prompt_version"] = PROMPT_VERSION
+    return out
@@ -0,0 +1,82 @@
+# app/services/speculation.py
+# Speculative tutor replies for /ws/voice: start generating from a partial
+# transcript once it has stopped changing, reuse the result if the final
+# transcript matches it.
+import asyncio
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from difflib import SequenceMatcher
+
+ENABLED = os.getenv("STREAM_SPECULATE", "0").strip().lower() in ("1", "true", "yes", "on")
+# Partial must be unchanged for this long before speculating
+STABLE_SECONDS = float(os.getenv("STREAM_SPECULATE_STABLE_SECONDS", "1.0"))
+# Normalized similarity needed between speculated and final transcript to reuse
+MIN_SIMILARITY = float(os.getenv("STREAM_SPECULATE_MIN_SIMILARITY", "0.95"))
+# Speculations get their own threads so they never queue ahead of transcription
+WORKERS = int(os.getenv("STREAM_SPECULATE_WORKERS", "4"))
+
+_stats = {"started": 0, "hits": 0, "misses": 0, "discarded": 0, "cancelled": 0}
+_lock = threading.Lock()
+_pool = ThreadPoolExecutor(max_workers=max(1, WORKERS), thread_name_prefix="speculate")
+
+class Cancelled(Exception):
+    """Raised inside a speculative plan whose result is no longer wanted."""
+
+class Speculation:
+    """
+    A speculative plan running on the speculation pool. fn(cancel) must call
+    check(cancel) before each expensive step (LLM calls); cancel() makes the
+    next check raise, so an abandoned speculation stops before its LLM call
+    rather than running to completion in the background.
+    """
+
+    def __init__(self, text: str, fn) -> None:
+        self.text = text
+        self._cancel = threading.Event()
+        self.future = asyncio.get_running_loop().run_in_executor(_pool, self._run, fn)
+
+    def _run(self, fn):
+        try:
+            return fn(self._cancel)
+        except Cancelled:
+            record("cancelled")
+            raise
+
+    def cancel(self) -> None:
+        self._cancel.set()
+        self.future.cancel()
+
+def check(cancel: threading.Event | None) -> None:
+    if cancel is not None and cancel.is_set():
+        raise Cancelled()
+
+def normalize(text: str) -> str:
+    """Case/punctuation/whitespace-insensitive form for comparing transcripts."""
+    t = re.sub(r"[^\w\s']", " ", (text or "").lower())
+    return re.sub(r"\s+", " ", t).strip()
+
+def matches(speculated: str, final: str) -> bool:
+    a, b = normalize(speculated), normalize(final)
+    if not a or not b:
+        return False
+    if a == b:
+        return True
+    return SequenceMatcher(None, a, b).ratio() >= MIN_SIMILARITY
+
+def record(outcome: str) -> None:
+    with _lock:
+        _stats[outcome] = _stats.get(outcome, 0) + 1
+
+def stats() -> dict:
+    with _lock:
+        counts = dict(_stats)
+    decided = counts["hits"] + counts["misses"]
+    return {
+        "enabled": ENABLED,
+        "stable_seconds": STABLE_SECONDS,
+        "min_similarity": MIN_SIMILARITY,
+        **counts,
+        "hit_rate": round(counts["hits"] / decided, 4) if decided else 0.0,
+    }
@@ -0,0 +1,192 @@
+# app/services/storage_async.py
+# Async variants of the hot-path storage helpers for async handlers
+# (/session, /ws/voice). The sync versions in storage.py stay for scripts,
+# routers and worker threads.
+#
+# Uses SQLAlchemy asyncio on DATABASE_URL with the async driver swapped in
+# (postgresql -> asyncpg, sqlite -> aiosqlite), or DATABASE_ASYNC_URL if set.
+# When no async driver is available (or DB_ASYNC=0) each helper runs its sync
+# counterpart in a worker thread, so the event loop is never blocked.
+import asyncio
+import os
+
+from sqlalchemy import insert, select
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import IntegrityError
+
+from app.db.schema import Session as SessionModel, Setting, Turn, User
+from app.models import MCP, EmotionSignals, PerformanceSignals, TurnRequest
+from app.services import storage, turn_queue, turn_rollups
+
+ENABLED = os.getenv("DB_ASYNC", "1").strip().lower() not in ("0", "false", "no", "off")
+
+_engine = None
+_sessionmaker = None
+_unavailable = False
+
+def async_url(url: str) -> str | None:
+    """DATABASE_URL with its async driver, or None for unsupported dialects."""
+    u = make_url(url)
+    backend = u.get_backend_name()
+    if backend == "postgresql":
+        query = dict(u.query)
+        # psycopg2's sslmode maps to asyncpg's ssl
+        if "sslmode" in query:
+            query["ssl"] = query.pop("sslmode")
+        return u.set(drivername="postgresql+asyncpg", query=query).render_as_string(hide_password=False)
+    if backend == "sqlite":
+        return u.set(drivername="sqlite+aiosqlite").render_as_string(hide_password=False)
+    return None
+
+def get_sessionmaker():
+    """async_sessionmaker bound to the async engine, or None (thread fallback)."""
+    global _engine, _sessionmaker, _unavailable
+    if _sessionmaker is not None or _unavailable or not ENABLED:
+        return _sessionmaker
+    try:
+        from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+        url = os.getenv("DATABASE_ASYNC_URL") or async_url(storage.DATABASE_URL)
+        if not url:
+            raise RuntimeError(f"no async driver for {make_url(storage.DATABASE_URL).drivername}")
+        from app.services import db_pool
+        if make_url(url).get_backend_name() == "sqlite":
+            # aiosqlite runs one thread per connection; don't keep them pooled
+            from sqlalchemy.pool import NullPool
+            _engine = create_async_engine(url, future=True, poolclass=NullPool)
+        else:
+            _engine = create_async_engine(url, future=True, **db_pool.engine_kwargs(url, pool="async"))
+        db_pool.configure(_engine.sync_engine)
+        _sessionmaker = async_sessionmaker(_engine, expire_on_commit=False, autoflush=False)
+    except Exception as e:
+        _unavailable = True
+        print(f"[storage_async] async engine unavailable ({e}); using worker threads")
+    return _sessionmaker
+
+async def dispose() -> None:
+    """Close pooled async connections (app shutdown)."""
+    if _engine is not None:
+        await _engine.dispose()
+
+def pool_stats() -> dict | None:
+    """Checkout stats of the async engine's pool (None until it is created)."""
+    if _engine is None:
+        return None
+    from app.services import db_pool
+    return db_pool.pool_stats(_engine.sync_engine.pool, "async")
+
+def mode() -> str:
+    """'async' when the async engine is in use, else 'thread'."""
+    return "async" if get_sessionmaker() is not None else "thread"
+
+
+# ---- hot-path helpers ----------------------------------------------------------
+async def get_user_for_session(session_id: int) -> User | None:
+    sid = int(session_id)
+    hit, user = storage.session_user_cache.get(sid)
+    if hit:
+        return user
+    sm = get_sessionmaker()
+    if sm is None:
+        return await asyncio.to_thread(storage.get_user_for_session, sid)
+    async with sm() as db:
+        user = (await db.execute(storage._session_user_stmt(sid))).scalar_one_or_none()
+    storage.session_user_cache.put(sid, user)
+    return user
+
+async def get_setting(key: str) -> str | None:
+    sm = get_sessionmaker()
+    if sm is None:
+        return await asyncio.to_thread(storage.get_setting, key)
+    async with sm() as db:
+        row = await db.get(Setting, key)
+        return row.value if row else None
+
+async def get_system_prompt() -> str | None:
+    return await get_setting("system_prompt")
+
+async def get_session_summary(session_id: int) -> tuple[str | None, int | None]:
+    sm = get_sessionmaker()
+    if sm is None:
+        return await asyncio.to_thread(storage.get_session_summary, session_id)
+    async with sm() as db:
+        row = (await db.execute(
+            select(SessionModel.summary, SessionModel.summary_through_turn_id)
+            .where(SessionModel.id == storage._as_int(session_id, "session_id"))
+        )).first()
+    if not row:
+        return None, None
+    return row[0], (int(row[1]) if row[1] is not None else None)
+
+async def dialogue_messages(session_id: int, limit: int = 8, token_budget: int | None = None, after_id: int | None = None) -> list[dict]:
+    """Async storage.dialogue_messages (same arguments and result)."""
+    sm = get_sessionmaker()
+    if sm is None:
+        return await asyncio.to_thread(storage.dialogue_messages, session_id, limit, token_budget, after_id)
+    sid = storage._as_int(session_id, "session_id")
+    fut = turn_queue.pending(sid)
+    if fut is not None:
+        # write-behind: let this session's queued turns commit first
+        try:
+            # shield: a timeout must not cancel the writer's Future
+            await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(fut)), turn_queue.READ_WAIT_SECONDS)
+        except Exception:
+            pass
+    cache = storage.dialogue_cache.cache
+    if cache.enabled:
+        lim = storage._dialogue_limit(limit, token_budget)
+        rows = cache.get(sid, lim, after_id)
+        if rows is None:
+            epoch = cache.epoch()
+            async with sm() as db:
+                fill = (await db.execute(storage._dialogue_fill_stmt(sid))).all()
+            rows = cache.load(sid, fill, epoch, lim, after_id)
+        if rows is not None:
+            return storage._dialogue_from_rows(rows, token_budget)
+    stmt = storage._dialogue_stmt(session_id, limit, token_budget, after_id)
+    async with sm() as db:
+        rows = (await db.execute(stmt)).all()
+    return storage._dialogue_from_rows(rows, token_budget)
+
+async def log_turn_full(
+    req: TurnRequest,
+    em: EmotionSignals,
+    perf: PerformanceSignals,
+    mcp: MCP,
+    reply_text: str,
+    reward: float = 0.0,
+    objective_code: str | None = None,
+):
+    """Async storage.log_turn_full (same session resolution and errors).
+
+    With TURN_WRITE_MODE=behind/ack and a numeric session id the row goes to
+    the write-behind queue instead (ack waits for its batch to commit); an
+    unknown session then surfaces only in ack mode.
+    """
+    sid = req.session_id
+    if isinstance(sid, str) and sid.isdigit():
+        sid = int(sid)
+    if turn_queue.enabled() and isinstance(sid, int):
+        fut = turn_queue.enqueue(storage._turn_values(sid, req, em, perf, mcp, reply_text, reward, objective_code))
+        if turn_queue.MODE == "ack":
+            await asyncio.shield(asyncio.wrap_future(fut))
+        return
+    sm = get_sessionmaker()
+    if sm is None:
+        return await asyncio.to_thread(
+            storage.log_turn_full, req, em, perf, mcp, reply_text, reward, objective_code
+        )
+    # same statements as storage.log_turn_full: one INSERT ... RETURNING for a numeric id
+    async with _engine.begin() as c:
+        if not isinstance(sid, int):
+            sid = int((await c.execute(storage._new_session_stmt(sid, _engine.dialect.name))).scalar_one())
+        values = storage._turn_values(sid, req, em, perf, mcp, reply_text, reward, objective_code)
+        try:
+            tid = int((await c.execute(insert(Turn).values(**values).returning(Turn.id))).scalar_one())
+        except IntegrityError as e:
+            if storage._is_fk_violation(e):
+                raise ValueError(f"Session {sid} does not exist") from None
+            raise
+        await c.run_sync(turn_rollups.add, [tid])
+    storage._turns_written([{**values, "id": tid}])
+    return tid
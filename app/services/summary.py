@@ -0,0 +1,97 @@
+# app/services/summary.py
+# Rolling per-session summary, folded incrementally off the request path
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.services import llm, storage
+
+# Fold once this many turns have accumulated beyond the raw tail
+SUMMARY_EVERY_TURNS = int(os.getenv("SUMMARY_EVERY_TURNS", "6"))
+# Most recent turns always kept raw (never folded) for short-term fidelity
+SUMMARY_KEEP_RAW_TURNS = int(os.getenv("SUMMARY_KEEP_RAW_TURNS", "4"))
+SUMMARY_MAX_TOKENS = int(os.getenv("SUMMARY_MAX_TOKENS", "220"))
+SUMMARY_DEADLINE_SECONDS = float(os.getenv("SUMMARY_DEADLINE_SECONDS", "20"))
+
+SUMMARY_PROMPT = """You maintain a running summary of a tutoring session for the tutor's memory.
+Merge the previous summary with the new turns into one updated summary (at most ~150 words).
+Keep: what the learner is working on, what they got right or wrong, misconceptions, how they feel, and what was planned next.
+Write plain prose in third person; no greetings, no lists of every turn."""
+
+_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="summary")
+# own breaker: failing background refreshes must not open the tutor's circuit
+_breaker = llm.CircuitBreaker()
+_inflight: set[int] = set()
+_lock = threading.Lock()
+
+def _render_turns(turns) -> str:
+    lines = []
+    for t in turns:
+        ut = (t.user_text or "").strip()
+        rt = (t.reply_text or "").strip()
+        if ut:
+            lines.append(f"Learner: {ut}")
+        if rt:
+            lines.append(f"Tutor: {rt}")
+    return "\n".join(lines)
+
+def update_now(session_id: int) -> bool:
+    """
+    Fold older unsummarized turns into the session summary if at least
+    SUMMARY_EVERY_TURNS of them sit beyond the SUMMARY_KEEP_RAW_TURNS tail.
+    Returns True when the summary was updated.
+    """
+    prev, through = storage.get_session_summary(session_id)
+    pending = storage.turns_after(session_id, through, limit=SUMMARY_EVERY_TURNS + SUMMARY_KEEP_RAW_TURNS + 50)
+    fold = pending[: max(0, len(pending) - SUMMARY_KEEP_RAW_TURNS)]
+    if len(fold) < SUMMARY_EVERY_TURNS:
+        return False
+    user = (
+        f"Previous summary:\n{prev.strip() if prev else '(none yet)'}\n\n"
+        f"New turns:\n{_render_turns(fold)}"
+    )
+    resp = llm.complete(
+        deadline=time.monotonic() + SUMMARY_DEADLINE_SECONDS,
+        hedge=False,
+        circuit=_breaker,
+        model="gpt-4o-mini",
+        messages=[
+            {"role": "system", "content": SUMMARY_PROMPT},
+            {"role": "user", "content": user},
+        ],
+        temperature=0.2,
+        max_tokens=SUMMARY_MAX_TOKENS,
+    )
+    text = (resp.choices[0].message.content or "").strip()
+    if not text:
+        return False
+    storage.set_session_summary(session_id, text, int(fold[-1].id))
+    return True
+
+def _run(session_id: int) -> None:
+    try:
+        update_now(session_id)
+    except Exception as e:
+        print(f"[summary] update failed for session {session_id}: {e}")
+    finally:
+        with _lock:
+            _inflight.discard(session_id)
+
+def schedule_update(session_id) -> None:
+    """Queue a background summary refresh (at most one in flight per session)."""
+    try:
+        sid = int(session_id)
+    except (TypeError, ValueError):
+        return
+    with _lock:
+        if sid in _inflight:
+            return
+        _inflight.add(sid)
+    _pool.submit(_run, sid)
+
+def prompt_block(summary: str | None) -> str:
+    """System-message text for the summary, or '' when there is none."""
+    if not summary or not summary.strip():
+        return ""
+    return "Summary of earlier conversation in this session:\n" + summary.strip()
@@ -0,0 +1,66 @@
+# app/services/tokens.py
+# Token counting for prompt budgeting (tiktoken, with an offline-safe estimate)
+import os
+from typing import Optional
+
+TOKEN_ENCODING = os.getenv("TOKEN_ENCODING", "o200k_base")  # gpt-4o / gpt-4o-mini
+
+# Per-message overhead the chat format adds around each message's content
+MESSAGE_OVERHEAD_TOKENS = 4
+
+_encoder = None
+_encoder_failed = False
+
+def _get_encoder():
+    """Load the tiktoken encoder once. If the BPE file cannot be fetched
+    (e.g. no network on first run), fall back to a character estimate."""
+    global _encoder, _encoder_failed
+    if _encoder is None and not _encoder_failed:
+        try:
+            import tiktoken
+            _encoder = tiktoken.get_encoding(TOKEN_ENCODING)
+        except Exception as e:
+            print(f"[tokens] tiktoken unavailable ({e}); using length estimate")
+            _encoder_failed = True
+    return _encoder
+
+def count_tokens(text: Optional[str]) -> int:
+    """Number of tokens in text (0 for empty)."""
+    if not text:
+        return 0
+    enc = _get_encoder()
+    if enc is not None:
+        try:
+            return len(enc.encode(text, disallowed_special=()))
+        except Exception:
+            pass
+    # ~4 characters per token for English text
+    return max(1, (len(text) + 3) // 4)
+
+def message_tokens(content: Optional[str]) -> int:
+    """Tokens a chat message with this content costs, including overhead."""
+    return count_tokens(content) + MESSAGE_OVERHEAD_TOKENS
+
+def fit_to_budget(messages: list[dict], budget: int) -> list[dict]:
+    """
+    Keep the newest messages whose token total fits within budget, oldest→newest.
+    Uses a precomputed "tokens" key when present (set at write time), otherwise
+    counts on the fly. Whole messages are dropped; nothing is cut mid-thought.
+    """
+    if budget <= 0 or not messages:
+        return []
+    kept: list[dict] = []
+    used = 0
+    for m in reversed(messages):
+        n = m.get("tokens")
+        if not isinstance(n, int):
+            n = message_tokens(str(m.get("content", "")))
+        if used + n > budget:
+            break
+        used += n
+        kept.append(m)
+    kept.reverse()
+    # Don't open the window on a dangling assistant reply
+    while kept and kept[0].get("role") == "assistant":
+        kept.pop(0)
+    return kept
@@ -0,0 +1,230 @@
+# app/services/turn_archive.py
+# Retention for the monthly turns partitions (app/db/partitions.py): months
+# older than TURN_RETENTION_MONTHS are detached, written to a zstd-compressed
+# Parquet file (TURN_ARCHIVE_DIR/turns_YYYY-MM.parquet) and dropped.
+# fetch_turns / iter_turn_batches read the archives back when a query window
+# reaches past the live partitions, merged with the live rows by id: bulk
+# imports with a historical created_at give old months new, high ids, so id
+# ranges of months (files) overlap. Imports into archived months are refused
+# (live_floor). The per-minute turn_rollups of archived months are kept, so
+# metrics still cover them.
+#
+#   python -m app.services.turn_archive run [--keep-months N]   # e.g. nightly from cron
+#   python -m app.services.turn_archive list
+import heapq
+import json
+import os
+import re
+from datetime import datetime
+from itertools import islice
+from pathlib import Path
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from app.db import partitions
+
+ARCHIVE_DIR = Path(os.getenv("TURN_ARCHIVE_DIR", "data/turn_archive"))
+RETENTION_MONTHS = int(os.getenv("TURN_RETENTION_MONTHS", "12"))
+WRITE_BATCH = 5000
+
+_FILE_RE = re.compile(r"^turns_(\d{4})-(\d{2})\.parquet$")
+_JSON_COLUMNS = ("emotion", "performance", "mcp")
+
+
+def _schema():
+    import pyarrow as pa
+    s = pa.string()
+    return pa.schema([
+        ("id", pa.int64()), ("session_id", pa.int64()), ("created_at", pa.timestamp("us")),
+        ("user_text", s), ("reply_text", s), ("reward", pa.float64()),
+        ("emotion_label", s), ("tone", s), ("pacing", s), ("difficulty", s), ("next_step", s),
+        ("correct", pa.bool_()), ("objective_code", s),
+        ("user_tokens", pa.int32()), ("reply_tokens", pa.int32()),
+        # JSON payloads are stored as text so the file schema never drifts
+        ("emotion", s), ("performance", s), ("mcp", s),
+    ])
+
+def archive_path(month: datetime) -> Path:
+    return ARCHIVE_DIR / f"turns_{month:%Y-%m}.parquet"
+
+def archives() -> list[tuple[datetime, Path]]:
+    """(month, path) of every archive file, oldest first."""
+    if not ARCHIVE_DIR.is_dir():
+        return []
+    out = []
+    for p in ARCHIVE_DIR.iterdir():
+        m = _FILE_RE.match(p.name)
+        if m:
+            out.append((datetime(int(m.group(1)), int(m.group(2)), 1), p))
+    return sorted(out)
+
+def files_for(since: datetime | None) -> list[Path]:
+    """Archive files holding turns at or after `since` (all of them for None)."""
+    return [p for month, p in archives() if since is None or partitions.add_months(month, 1) > since]
+
+def live_floor() -> datetime | None:
+    """Start of the month after the newest archive: earlier months have no
+    live rows left (None without archives)."""
+    done = archives()
+    return partitions.add_months(done[-1][0], 1) if done else None
+
+
+# ---- write (retention job) ---------------------------------------------------
+def _write_parquet(engine: Engine, table: str, dest: Path) -> int:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _schema()
+    cols = ", ".join(schema.names)
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dest.with_suffix(".parquet.tmp")
+    n = 0
+    with engine.connect() as c, pq.ParquetWriter(tmp, schema, compression="zstd") as w:
+        result = c.execution_options(stream_results=True, yield_per=WRITE_BATCH).execute(
+            text(f"SELECT {cols} FROM {table} ORDER BY id")
+        )
+        for part in result.mappings().partitions(WRITE_BATCH):
+            rows = [
+                {k: (json.dumps(v) if k in _JSON_COLUMNS and not isinstance(v, str) else v) for k, v in r.items()}
+                for r in part
+            ]
+            w.write_batch(pa.RecordBatch.from_pylist(rows, schema=schema))
+            n += len(rows)
+    os.replace(tmp, dest)  # readers never see a half-written file
+    return n
+
+def run_retention(engine: Engine, keep_months: int | None = None) -> list[dict]:
+    """Archive and drop monthly partitions older than keep_months full months
+    before the current one. Safe to re-run after an interruption."""
+    keep = RETENTION_MONTHS if keep_months is None else keep_months
+    with engine.begin() as c:
+        if not partitions.is_partitioned(c):
+            return []
+        # months of turns_default rows (e.g. imports older than the first
+        # partition) get their partition, so they are archived like the rest
+        start = partitions.oldest_default(c)
+        floor = live_floor()
+        if start is not None and floor is not None and start < floor:
+            print(f"[turn_archive] turns_default has turns before {floor:%Y-%m}, which is already archived")
+            start = floor
+        partitions.ensure_partitions(c, start=start)
+        tables = partitions.monthly_tables(c)
+    cutoff = partitions.add_months(partitions.month_floor(datetime.utcnow()), -keep)
+    done = []
+    for name, month, is_attached in tables:
+        if month >= cutoff:
+            continue
+        if is_attached:
+            with engine.begin() as c:
+                c.execute(text(f"ALTER TABLE turns DETACH PARTITION {name}"))
+        rows = _write_parquet(engine, name, archive_path(month))
+        with engine.begin() as c:
+            # its turn_rollups rows stay: metrics keep covering archived months
+            c.execute(text(f"DROP TABLE {name}"))
+        print(f"[turn_archive] {name}: {rows} turns -> {archive_path(month)}")
+        done.append({"partition": name, "rows": rows, "path": str(archive_path(month))})
+    return done
+
+
+# ---- read --------------------------------------------------------------------
+def _filter(session_id: int | None, since: datetime | None, order_desc: bool, after_id: int | None):
+    import pyarrow.dataset as ds
+    f = None
+    def _and(a, b):
+        return b if a is None else a & b
+    if session_id is not None:
+        f = _and(f, ds.field("session_id") == session_id)
+    if since is not None:
+        f = _and(f, ds.field("created_at") >= since)
+    if after_id is not None:
+        f = _and(f, ds.field("id") < after_id if order_desc else ds.field("id") > after_id)
+    return f
+
+def _decode(rows: list[dict]) -> list[dict]:
+    for r in rows:
+        for k in _JSON_COLUMNS:
+            if isinstance(r.get(k), str):
+                r[k] = json.loads(r[k])
+    return rows
+
+def _file_rows(path: Path, read: list[str], filt, order_desc: bool, after_id: int | None):
+    """Filtered rows of one archive file in id order, one Parquet row group
+    at a time (files are written in id order, 5000-row groups)."""
+    import pyarrow.parquet as pq
+
+    pf = pq.ParquetFile(str(path))
+    id_col = pf.schema_arrow.get_field_index("id")
+    groups = range(pf.num_row_groups)
+    for g in (reversed(groups) if order_desc else groups):
+        stats = pf.metadata.row_group(g).column(id_col).statistics
+        if after_id is not None and stats is not None and stats.has_min_max:
+            # keyset pages skip the groups before the cursor without reading them
+            if (stats.min >= after_id) if order_desc else (stats.max <= after_id):
+                continue
+        t = pf.read_row_group(g, columns=read)
+        if filt is not None:
+            t = t.filter(filt)
+        if t.num_rows:
+            yield from t.sort_by([("id", "descending" if order_desc else "ascending")]).to_pylist()
+
+def _scan(files: list[Path], columns, filt, order_desc: bool, after_id: int | None):
+    """Archived rows (dicts of `columns`, which must include id) in id order
+    across all files. Months' id ranges can overlap (historical imports), so
+    the files are merged by id; memory stays at one row group per file."""
+    read = list(dict.fromkeys([*columns, "id", "session_id", "created_at"]))
+    keep = list(columns)
+    rows = heapq.merge(*(_file_rows(p, read, filt, order_desc, after_id) for p in files),
+                       key=lambda r: r["id"], reverse=order_desc)
+    for r in rows:
+        yield {k: r[k] for k in keep}
+
+def read_turns(
+    files: list[Path],
+    session_id: int | None = None,
+    since: datetime | None = None,
+    order_desc: bool = True,
+    after_id: int | None = None,
+    limit: int = 200,
+) -> list[dict]:
+    """Up to `limit` archived turns (column dicts) in id order; stops reading
+    once `limit` rows are collected."""
+    if not files or limit <= 0:
+        return []
+    filt = _filter(session_id, since, order_desc, after_id)
+    return _decode(list(islice(_scan(files, _schema().names, filt, order_desc, after_id), limit)))
+
+def iter_batches(
+    files: list[Path],
+    columns: tuple[str, ...],
+    session_id: int | None = None,
+    since: datetime | None = None,
+    order_desc: bool = False,
+    batch_size: int = 1000,
+):
+    """Yield lists of archived turns (dicts of `columns`) in id order, at most
+    one row group per file in memory."""
+    rows = _scan(files, columns, _filter(session_id, since, order_desc, None), order_desc, None)
+    while batch := list(islice(rows, batch_size)):
+        yield _decode(batch)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Archive old turns partitions to Parquet")
+    parser.add_argument("command", nargs="?", default="run", choices=["run", "list"])
+    parser.add_argument("--keep-months", type=int, default=None, help=f"Months kept live (default {RETENTION_MONTHS})")
+    args = parser.parse_args()
+
+    from app.services.storage import engine
+
+    if args.command == "list":
+        with engine.connect() as c:
+            for name, month, is_attached in (partitions.monthly_tables(c) if partitions.is_partitioned(c) else []):
+                print(f"{name:<16} {'attached' if is_attached else 'DETACHED'}")
+        for month, p in archives():
+            print(f"{month:%Y-%m}          archived  {p}")
+    else:
+        done = run_retention(engine, args.keep_months)
+        print(f"[turn_archive] {len(done)} partitions archived" if done else "[turn_archive] nothing to archive")
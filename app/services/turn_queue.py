@@ -0,0 +1,224 @@
+# app/services/turn_queue.py
+# Write-behind queue for tutor turns: the request path enqueues the row and a
+# single writer thread flushes batches with one multi-row INSERT each.
+#
+# Modes (env TURN_WRITE_MODE):
+#   sync    write inline, one INSERT per turn (default; no queue)
+#   behind  enqueue and return immediately; the turn is durable after the next flush
+#   ack     enqueue and wait until the batch holding the turn has committed
+#
+# History reads (dialogue_messages, turns_after) of a session with queued
+# turns first wait for them to commit, so the next turn still sees the last.
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+
+from app.db.schema import Turn
+from app.services import turn_rollups
+
+MODE = os.getenv("TURN_WRITE_MODE", "sync").strip().lower()
+BATCH_SIZE = int(os.getenv("TURN_QUEUE_BATCH", "200"))
+# Flush a partial batch once its oldest turn has waited this long
+FLUSH_MS = float(os.getenv("TURN_QUEUE_FLUSH_MS", "50"))
+MAX_DEPTH = int(os.getenv("TURN_QUEUE_MAX", "10000"))
+# Longest a history read waits for its session's queued turns
+READ_WAIT_SECONDS = float(os.getenv("TURN_QUEUE_READ_WAIT_SECONDS", "2"))
+
+_STOP = object()
+
+_q: "queue.Queue" = queue.Queue(maxsize=MAX_DEPTH)
+_thread: threading.Thread | None = None
+_start_lock = threading.Lock()
+_stats = {"enqueued": 0, "written": 0, "batches": 0, "failed": 0, "overflow": 0, "max_batch": 0}
+_flush_ms: deque = deque(maxlen=500)
+_batch_sizes: deque = deque(maxlen=500)
+_stats_lock = threading.Lock()
+# session_id -> Future of its newest queued turn (flushes commit in queue order)
+_last: dict = {}
+_last_lock = threading.Lock()
+
+def enabled() -> bool:
+    return MODE in ("behind", "ack")
+
+def _engine():
+    from app.services.storage import engine
+    return engine
+
+def _insert_rows(rows: list[dict]) -> list[int]:
+    # executemany of one INSERT: psycopg2 sends multi-row VALUES pages;
+    # RETURNING gives the new ids in row order
+    with _engine().begin() as c:
+        ids = [int(i) for i in c.execute(
+            insert(Turn.__table__).returning(Turn.id, sort_by_parameter_order=True), rows
+        ).scalars()]
+        turn_rollups.add(c, ids)
+        return ids
+
+def _written(rows: list[dict], ids) -> None:
+    # post-commit hooks (dialogue ring buffer) before the turn is acked
+    if not ids:
+        return
+    from app.services.storage import _turns_written
+    try:
+        _turns_written([{**row, "id": tid} for row, tid in zip(rows, ids)])
+    except Exception as e:
+        print(f"[turn_queue] post-write hook failed: {e}")
+
+def _flush(items: list[tuple[dict, Future]]) -> None:
+    t0 = time.perf_counter()
+    rows = [row for row, _ in items]
+    try:
+        _written(rows, _insert_rows(rows))
+        for _, fut in items:
+            fut.set_result(True)
+        ok = len(items)
+    except IntegrityError:
+        # one bad row (e.g. unknown session_id) must not sink the batch
+        ok = 0
+        for row, fut in items:
+            try:
+                _written([row], _insert_rows([row]))
+                fut.set_result(True)
+                ok += 1
+            except Exception as e:
+                fut.set_exception(e)
+    except Exception as e:
+        ok = 0
+        for _, fut in items:
+            fut.set_exception(e)
+        print(f"[turn_queue] flush of {len(items)} turns failed: {e}")
+    ms = (time.perf_counter() - t0) * 1000
+    with _stats_lock:
+        _stats["batches"] += 1
+        _stats["written"] += ok
+        _stats["failed"] += len(items) - ok
+        _stats["max_batch"] = max(_stats["max_batch"], len(items))
+        _flush_ms.append(ms)
+        _batch_sizes.append(len(items))
+
+def _run() -> None:
+    while True:
+        first = _q.get()
+        if first is _STOP:
+            return
+        batch = [first]
+        deadline = time.monotonic() + FLUSH_MS / 1000.0
+        stop = False
+        while len(batch) < BATCH_SIZE:
+            timeout = deadline - time.monotonic()
+            try:
+                item = _q.get(timeout=timeout) if timeout > 0 else _q.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                stop = True
+                break
+            batch.append(item)
+        _flush(batch)
+        if stop:
+            # drain whatever was queued ahead of the stop marker's arrival
+            rest = []
+            while True:
+                try:
+                    item = _q.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not _STOP:
+                    rest.append(item)
+            for i in range(0, len(rest), BATCH_SIZE):
+                _flush(rest[i:i + BATCH_SIZE])
+            return
+
+def _ensure_started() -> None:
+    global _thread
+    if _thread is not None and _thread.is_alive():
+        return
+    with _start_lock:
+        if _thread is None or not _thread.is_alive():
+            _thread = threading.Thread(target=_run, name="turn-writer", daemon=True)
+            _thread.start()
+
+def _track(sid, fut: Future) -> None:
+    with _last_lock:
+        _last[sid] = fut
+    def _done(f: Future) -> None:
+        with _last_lock:
+            if _last.get(sid) is f:
+                del _last[sid]
+    fut.add_done_callback(_done)
+
+def pending(session_id) -> Future | None:
+    """Future of the session's newest queued turn, or None if none is queued."""
+    with _last_lock:
+        return _last.get(session_id)
+
+def wait_for_session(session_id, timeout: float | None = None) -> None:
+    """Block until the session's queued turns have committed (read-your-writes
+    for history); gives up after READ_WAIT_SECONDS."""
+    fut = pending(session_id)
+    if fut is None:
+        return
+    try:
+        fut.result(timeout=READ_WAIT_SECONDS if timeout is None else timeout)
+    except Exception:
+        pass  # a failed or slow write: read what is committed
+
+def enqueue(row: dict) -> Future:
+    """
+    Queue a turns row (column -> value) for the writer thread. The Future
+    resolves once the row is committed (or fails with the insert error).
+    When the queue is full the row is written inline (backpressure).
+    """
+    fut: Future = Future()
+    _track(row.get("session_id"), fut)
+    _ensure_started()
+    try:
+        _q.put_nowait((row, fut))
+        with _stats_lock:
+            _stats["enqueued"] += 1
+    except queue.Full:
+        with _stats_lock:
+            _stats["overflow"] += 1
+        _flush([(row, fut)])
+    return fut
+
+def drain(timeout: float = 10.0) -> bool:
+    """Flush everything queued and stop the writer (app shutdown).
+    Returns False if the writer did not finish within timeout."""
+    global _thread
+    t = _thread
+    if t is None or not t.is_alive():
+        return True
+    _q.put(_STOP)
+    t.join(timeout)
+    done = not t.is_alive()
+    if done:
+        _thread = None
+    return done
+
+def _pct(values: list[float], p: float) -> float | None:
+    if not values:
+        return None
+    s = sorted(values)
+    return round(s[min(len(s) - 1, int(len(s) * p))], 2)
+
+def stats() -> dict:
+    with _stats_lock:
+        out = dict(_stats)
+        flush_ms = list(_flush_ms)
+        sizes = list(_batch_sizes)
+    out.update({
+        "mode": MODE,
+        "queue_depth": _q.qsize(),
+        "batch_size": BATCH_SIZE,
+        "flush_ms": FLUSH_MS,
+        "avg_batch": round(sum(sizes) / len(sizes), 2) if sizes else None,
+        "flush_latency_ms": {"p50": _pct(flush_ms, 0.5), "p95": _pct(flush_ms, 0.95), "max": round(max(flush_ms), 2) if flush_ms else None},
+    })
+    return out
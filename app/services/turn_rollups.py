@@ -0,0 +1,207 @@
+# app/services/turn_rollups.py
+# Per-minute rollups of turns (table turn_rollups, one row per session and
+# minute) so the dashboard metrics (/api/v1/metrics, /metrics/series) cost
+# grows with the window length in minutes, not with the turns inside it.
+#
+# - every turns insert path calls add(conn, ids) inside its own transaction,
+#   so rollups commit or roll back together with the turns
+# - rebuild() recomputes them from raw turns (migration 9, or the CLI:
+#   python -m app.services.turn_rollups rebuild [--session N])
+# - rollups outlive the raw turns: turn_archive.run_retention keeps those of
+#   the months it archives, and rebuild() leaves them alone
+#
+# The aggregates are defined once (aggregates(), mirrored for a single row by
+# row_counts() for the in-memory live_metrics); metrics.py applies the same
+# expressions to the raw turns of a window's partial first minute, and
+# snapshot() turns summed counts into the compute_metrics response.
+import calendar
+from datetime import datetime, timezone
+
+from sqlalchemy import BigInteger, Integer, and_, case, cast, delete, extract, func, literal_column, or_, select, text
+from sqlalchemy.engine import Connection
+
+from app.db.schema import Turn, TurnRollup
+
+EMOTIONS = ("frustrated", "engaged", "calm", "bored")
+ACTIONS = {
+    "tone":       ("warm", "encouraging", "neutral", "concise"),
+    "pacing":     ("slow", "medium", "fast"),
+    "difficulty": ("down", "hold", "up"),
+    "next_step":  ("example", "prompt", "explain", "quiz", "review"),
+}
+# heuristic proxy: tones considered aligned with each emotion
+TONE_ALIGNMENT = {
+    "frustrated": ("warm", "encouraging"),
+    "engaged":    ("encouraging",),
+    "calm":       ("neutral",),
+    "bored":      ("concise",),
+}
+
+# ids per upsert statement (SQLite binds at most 32766 parameters)
+_ID_CHUNK = 5000
+
+
+def _count_if(dialect: str, cond):
+    """COUNT(*) FILTER (WHERE cond) where supported, else SUM(CASE ...)."""
+    if dialect in ("postgresql", "sqlite"):
+        return func.count().filter(cond)
+    return func.coalesce(func.sum(case((cond, 1), else_=0)), 0)
+
+def aggregates(dialect: str) -> dict:
+    """Rollup column -> aggregate over raw turns (every value column of TurnRollup)."""
+    cols = {
+        "turns": func.count(),
+        "reward_sum": func.sum(Turn.reward),
+        "adapted_frustrated": _count_if(dialect, and_(
+            Turn.emotion_label == "frustrated",
+            or_(Turn.pacing == "slow", Turn.difficulty == "down"),
+        )),
+        "tone_aligned": _count_if(dialect, or_(*(
+            and_(Turn.emotion_label == e, Turn.tone.in_(tones)) for e, tones in TONE_ALIGNMENT.items()
+        ))),
+    }
+    for e in EMOTIONS:
+        cols[f"emotion_{e}"] = _count_if(dialect, Turn.emotion_label == e)
+    for field, values in ACTIONS.items():
+        for v in values:
+            cols[f"{field}_{v}"] = _count_if(dialect, getattr(Turn, field) == v)
+    return cols
+
+COLUMNS = tuple(aggregates("postgresql"))
+
+def row_counts(row) -> list:
+    """aggregates() for a single turn (a dict of turns column values), in COLUMNS order."""
+    em, tone = row.get("emotion_label"), row.get("tone")
+    out = [
+        1,
+        float(row.get("reward") or 0.0),
+        int(em == "frustrated" and (row.get("pacing") == "slow" or row.get("difficulty") == "down")),
+        int(tone is not None and tone in TONE_ALIGNMENT.get(em, ())),
+    ]
+    out += [int(em == e) for e in EMOTIONS]
+    out += [int(row.get(field) == v) for field, values in ACTIONS.items() for v in values]
+    return out
+
+def snapshot(counts, last_10_reward_avg, filters: dict) -> dict:
+    """compute_metrics response from summed COLUMNS counts (a mapping by name)."""
+    turns_total = int(counts["turns"] or 0)
+    avg_reward = (float(counts["reward_sum"] or 0.0) / turns_total) if turns_total else 0.0
+    by_emotion = {e: int(counts[f"emotion_{e}"] or 0) for e in EMOTIONS}
+    action_distribution = {
+        field: {v: int(counts[f"{field}_{v}"] or 0) for v in values} for field, values in ACTIONS.items()
+    }
+    # among frustrated turns, how many adapted (pacing slow OR difficulty down)
+    frustrated_total = by_emotion["frustrated"]
+    adapted = int(counts["adapted_frustrated"] or 0)
+    frustration_adaptation_rate = (adapted / frustrated_total) if frustrated_total else 0.0
+    # heuristic proxy, see TONE_ALIGNMENT
+    labeled_total = sum(by_emotion.values())
+    aligned = int(counts["tone_aligned"] or 0)
+    tone_alignment_rate = (aligned / labeled_total) if labeled_total else 0.0
+    return {
+        "turns_total": turns_total,
+        "avg_reward": float(round(avg_reward, 4)),
+        "frustration_adaptation_rate": float(round(frustration_adaptation_rate, 4)),
+        "tone_alignment_rate": float(round(tone_alignment_rate, 4)),
+        "last_10_reward_avg": float(round(last_10_reward_avg or 0.0, 4)),
+        "by_emotion": by_emotion,
+        "action_distribution": action_distribution,
+        "filters": filters,
+    }
+
+
+# ---- minute buckets ------------------------------------------------------------
+def int_div(x, n: int):
+    """SQL integer division x / n of an integer expression (n inlined: a bound
+    parameter would make a GROUP BY copy a different expression under
+    server-side binding, e.g. asyncpg)."""
+    return x.op("/", return_type=BigInteger)(literal_column(str(int(n))))
+
+def minute_expr(dialect: str):
+    """SQL: turns.created_at as whole minutes since the epoch (UTC), the rollup key."""
+    if dialect == "sqlite":
+        return int_div(cast(func.strftime("%s", Turn.created_at), Integer), 60)
+    return cast(func.floor(extract("epoch", Turn.created_at) / literal_column("60")), BigInteger)
+
+def minute_of(dt: datetime) -> int:
+    """Minute bucket holding dt (naive datetimes are UTC, like created_at)."""
+    return calendar.timegm(dt.utctimetuple()) // 60
+
+def first_full_minute(dt: datetime) -> int:
+    """First bucket starting at or after dt; turns between dt and it form a partial minute."""
+    m = minute_of(dt)
+    return m if (dt.second, dt.microsecond) == (0, 0) else m + 1
+
+def minute_start(minute: int) -> datetime:
+    return datetime.fromtimestamp(minute * 60, timezone.utc)
+
+
+# ---- write -------------------------------------------------------------------
+def _upsert(dialect: str, where, accumulate: bool):
+    """INSERT INTO turn_rollups SELECT <aggregates> FROM turns WHERE ... GROUP BY
+    session, minute; with accumulate, existing rows are incremented."""
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as upsert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as upsert
+    minute = minute_expr(dialect).label("minute")
+    cols = aggregates(dialect)
+    src = (
+        select(Turn.session_id, minute, *(c.label(k) for k, c in cols.items()))
+        .where(where)
+        .group_by(Turn.session_id, minute)
+        # rows are locked in key order, so concurrent upserts can't deadlock
+        .order_by(Turn.session_id, minute)
+    )
+    stmt = upsert(TurnRollup).from_select(["session_id", "minute", *cols], src)
+    if accumulate:
+        t = TurnRollup.__table__
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[t.c.session_id, t.c.minute],
+            set_={k: t.c[k] + stmt.excluded[k] for k in cols},
+        )
+    return stmt
+
+def add(conn: Connection, turn_ids) -> None:
+    """Fold just-inserted turns into their rollup rows. Call on the inserting
+    connection before commit, so both commit (or roll back) together."""
+    ids = [int(i) for i in turn_ids]
+    for i in range(0, len(ids), _ID_CHUNK):
+        conn.execute(_upsert(conn.dialect.name, Turn.id.in_(ids[i:i + _ID_CHUNK]), accumulate=True))
+
+def rebuild(conn: Connection, session_id: int | None = None) -> int:
+    """Recompute rollups from raw turns (all sessions, or one), keeping those
+    of archived months; returns rollup rows of the scope."""
+    if conn.dialect.name == "postgresql":
+        # writers wait for the rebuild to commit, so no turn is missed or counted twice
+        conn.execute(text("LOCK TABLE turns IN SHARE MODE"))
+    # rows without created_at (hand-made legacy data) belong to no minute
+    d, where = delete(TurnRollup), Turn.created_at.isnot(None)
+    # earlier minutes have no raw turns left to rebuild from
+    from app.services import turn_archive
+    floor = turn_archive.live_floor()
+    if floor is not None:
+        d, where = d.where(TurnRollup.minute >= minute_of(floor)), and_(where, Turn.created_at >= floor)
+    if session_id is not None:
+        d, where = d.where(TurnRollup.session_id == session_id), and_(where, Turn.session_id == session_id)
+    conn.execute(d)
+    conn.execute(_upsert(conn.dialect.name, where, accumulate=False))
+    q = select(func.count()).select_from(TurnRollup)
+    if session_id is not None:
+        q = q.where(TurnRollup.session_id == session_id)
+    return int(conn.scalar(q))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Rebuild per-minute turn rollups from raw turns")
+    parser.add_argument("command", nargs="?", default="rebuild", choices=["rebuild"])
+    parser.add_argument("--session", type=int, default=None, help="Only this session (default: all)")
+    args = parser.parse_args()
+
+    from app.services.storage import engine
+
+    with engine.begin() as c:
+        n = rebuild(c, args.session)
+    print(f"[turn_rollups] {n} rollup rows")
@@ -1,10 +1,18 @@
 # app/services/tutor.py
 import os
-from openai import OpenAI
-import json as _json
-from app.models import MCP  # Pydantic model
+import time
+from app.models import MCP, EmotionSignals  # Pydantic models
 from app.services.storage import get_system_prompt
-from app.services.objectives import format_for_prompt
+from app.services.prompt import compile_messages, record_usage
+from app.services.tokens import fit_to_budget
+from app.services.json_repair import parse_envelope
+from app.services import llm
+from app.services.summary import prompt_block as summary_block
+
+# Token budget for prior dialogue included in the prompt (env: CHAT_HISTORY_TOKENS)
+HISTORY_TOKEN_BUDGET = int(os.getenv("CHAT_HISTORY_TOKENS", "1200"))
+# One completion returns the learner's emotion together with the reply (env: TUTOR_JOINT_EMOTION)
+JOINT_EMOTION = os.getenv("TUTOR_JOINT_EMOTION", "0").strip().lower() in ("1", "true", "yes", "on")
 
 SYSTEM_TMPL = """You are an emotionally-aware tutor.
 - Tone: {tone}
@@ -20,6 +28,18 @@ Rules for this turn:
 - Keep it clear and supportive (about 3–5 sentences total).
 """
 
+# How JSON envelopes were handled; "fallback" = second plain-text call was needed
+_ENVELOPE_STATS = {"ok": 0, "repaired": 0, "salvaged": 0, "fallback": 0, "truncated": 0}
+
+def envelope_stats() -> dict:
+    """Counts and rates of envelope parsing outcomes since process start."""
+    total = sum(_ENVELOPE_STATS[k] for k in ("ok", "repaired", "salvaged", "fallback"))
+    out = dict(_ENVELOPE_STATS)
+    out["total"] = total
+    out["repair_rate"] = round((_ENVELOPE_STATS["repaired"] + _ENVELOPE_STATS["salvaged"]) / total, 4) if total else 0.0
+    out["fallback_rate"] = round(_ENVELOPE_STATS["fallback"] / total, 4) if total else 0.0
+    return out
+
 def _compose_text_from_json(j: dict) -> str:
     support = str(j.get("support", "")).strip()
     question = str(j.get("question", "")).strip()
@@ -37,66 +57,105 @@ def _compose_text_from_json(j: dict) -> str:
     return (support or question or "").strip()
 
 
-def generate(user_text: str, mcp: MCP, history: list[dict] | None = None, objectives: list[dict] | None = None) -> str:
-    """Return a non-empty tutor reply; never None."""
+def _emotion_from_json(j: dict) -> EmotionSignals | None:
+    """EmotionSignals from a joint envelope, or None if the model left it out."""
+    raw = str(j.get("emotion") or "").strip().lower()
+    if not raw:
+        return None
+    from app.services.emotion_cascade import SENTIMENT, to_label
+    label = to_label(raw)
+    try:
+        sentiment = max(-1.0, min(1.0, float(j["sentiment"])))
+    except (KeyError, TypeError, ValueError):
+        sentiment = SENTIMENT[label]
+    return EmotionSignals(label=label, sentiment=sentiment)
+
+
+def generate(user_text: str, mcp: MCP, history: list[dict] | None = None, objectives: list[dict] | None = None, summary: str | None = None) -> str:
+    """Return a non-empty tutor reply; never None.
+
+    `summary` is the session's rolling summary of turns older than `history`.
+    Bounded by a per-turn deadline (TUTOR_DEADLINE_SECONDS); while the LLM
+    circuit breaker is open the canned reply is returned without a provider call.
+    """
+    text, _ = _generate(user_text, mcp, history, objectives, summary, with_emotion=False)
+    return text
+
+
+def generate_joint(user_text: str, mcp: MCP, history: list[dict] | None = None, objectives: list[dict] | None = None, summary: str | None = None) -> tuple[str, EmotionSignals | None]:
+    """Like generate(), but the same completion also labels the learner's emotion.
+
+    Returns (reply, emotion); emotion is None when the envelope had no usable
+    label (plain-text fallback, canned reply), so callers keep their local one.
+    """
+    return _generate(user_text, mcp, history, objectives, summary, with_emotion=True)
+
+
+def _generate(user_text, mcp, history, objectives, summary, with_emotion: bool) -> tuple[str, EmotionSignals | None]:
+    deadline = time.monotonic() + llm.DEADLINE_SECONDS
     try:
         # Load DB override (if any); fall back to code template
         tmpl = get_system_prompt() or SYSTEM_TMPL
-        try:
-            system = tmpl.format(**mcp.model_dump())
-        except Exception:
-            # If formatting fails due to placeholders, use as-is
-            system = tmpl
-        if objectives:
-            system += "\n" + format_for_prompt(objectives)
-
-        # New OpenAI SDK (v1.x) usage
-        client = OpenAI()  # reads OPENAI_API_KEY from env
-
-        # Prefer JSON envelope for predictable rendering
-        messages = [
-            {"role": "system", "content": system + "\nReturn JSON with keys: support (string, optional), question (string, required), next_step (one of: explain, example, prompt, quiz, review)."},
-        ]
+        mcp_values = mcp.model_dump()
+
         # include recent dialogue to preserve short-term memory
-        if history:
-            # Clamp to a reasonable window so we don't blow the context
-            for m in history[-16:]:
-                if isinstance(m, dict) and m.get("role") in ("user", "assistant"):
-                    content = str(m.get("content", ""))[:1200]
-                    if content:
-                        messages.append({"role": m["role"], "content": content})
-        # Current user turn last
-        messages.append({"role": "user", "content": user_text})
-
-        resp = client.chat.completions.create(
+        hist_msgs = [
+            m for m in (history or [])
+            if isinstance(m, dict) and m.get("role") in ("user", "assistant") and m.get("content")
+        ]
+        # Newest whole turns that fit the token budget (counts precomputed at write time)
+        hist_msgs = [
+            {"role": m["role"], "content": str(m["content"])}
+            for m in fit_to_budget(hist_msgs, HISTORY_TOKEN_BUDGET)
+        ]
+
+        # Static rules/JSON instructions/objectives first, per-turn MCP controls last,
+        # so the provider can cache the prefix; rolling summary stands in for older turns
+        def _compile(json_mode: bool) -> list[dict]:
+            return compile_messages(
+                tmpl, mcp_values, user_text,
+                history=hist_msgs,
+                objectives=objectives,
+                summary_text=summary_block(summary),
+                json_mode=json_mode,
+                with_emotion=with_emotion,
+            )
+
+        messages = _compile(json_mode=True)
+
+        # OpenAI SDK (v1.x) via llm.complete: deadline, optional hedge, breaker
+        resp = llm.complete(
+            deadline=deadline,
             model="gpt-4o-mini",
             messages=messages,
             temperature=0.2,
-            max_tokens=260,
+            max_tokens=280 if with_emotion else 260,
             response_format={"type": "json_object"},
         )
+        record_usage(getattr(resp, "usage", None))
         content = resp.choices[0].message.content or ""
-        try:
-            j = _json.loads(content)
+        if getattr(resp.choices[0], "finish_reason", None) == "length":
+            _ENVELOPE_STATS["truncated"] += 1
+        # Tolerant parse: repairs fences/trailing commas/truncation before giving up
+        j, status = parse_envelope(content)
+        if j is not None:
             txt = _compose_text_from_json(j)
             if txt:
-                return txt
-        except Exception:
-            pass
-        # Fallback: plain text generation
-        resp2 = client.chat.completions.create(
+                _ENVELOPE_STATS[status] += 1
+                return txt, (_emotion_from_json(j) if with_emotion else None)
+        _ENVELOPE_STATS["fallback"] += 1
+        # Fallback: plain text generation (nothing salvageable)
+        resp2 = llm.complete(
+            deadline=deadline,
             model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": system},
-                *([m for m in (history or []) if m.get("role") in ("user","assistant")] if history else []),
-                {"role": "user", "content": user_text}
-            ],
+            messages=_compile(json_mode=False),
             temperature=0.3,
             max_tokens=220,
         )
+        record_usage(getattr(resp2, "usage", None))
         text = resp2.choices[0].message.content or ""
-        return text.strip() or "[Tutor] Let’s try a smaller step together."
+        return text.strip() or "[Tutor] Let’s try a smaller step together.", None
     except Exception as e:
         # Log and return fallback so DB insert never breaks
         print(f"[tutor.generate] ERROR: {e}")
-        return "[Tutor] I hit a snag generating a reply. Try a smaller step: combine like terms on one side, then simplify."
+        return "[Tutor] I hit a snag generating a reply. Try a smaller step: combine like terms on one side, then simplify.", None
@@ -0,0 +1,93 @@
+# scripts/bench_emotion_modes.py
+# Compare per-turn cost of the emotion + reply paths:
+#   keyword  keyword emotion, one tutor call (default deployment)
+#   two-call LLM emotion call, then the tutor call (what rich emotion costs without joint mode)
+#   joint    one tutor call that also returns the emotion (TUTOR_JOINT_EMOTION=1)
+#
+# Runs the real services in-process; use the offline backend for repeatable numbers:
+#   LLM_BACKEND=fake FAKE_LLM_LATENCY=lognormal:600:0.3 python scripts/bench_emotion_modes.py --n 40
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parents[1]))
+
+from app.models import EmotionSignals
+from app.services import emotion, emotion_cascade, llm, mcp, policy, prompt, reward, tutor
+
+TEXTS = [
+    "I'm stuck on this one",
+    "ok",
+    "I think the answer is 12 but I'm not totally sure why",
+    "this makes sense now, got it",
+    "can we do something else, this is taking forever",
+    "I tried moving the x over but then the numbers got weird",
+    "yes",
+    "why do we even need fractions",
+]
+
+
+def _turn(text: str, mode: str):
+    perf = emotion.estimate_perf(text)
+    if mode == "two-call":
+        res = emotion_cascade.run(text, emotion_cascade._llm_emotion, threshold=1.01)  # always escalate
+        em = EmotionSignals(label=res["label"], sentiment=res["sentiment"])
+    else:
+        em = emotion.classify(text)
+    r = reward.compute(em, perf)
+    mcp_pre = policy.update(mcp.build(em, perf, text), r)
+    if mode == "joint":
+        reply, em_llm = tutor.generate_joint(text, mcp_pre)
+        if em_llm is not None:
+            em = em_llm
+            r = reward.compute(em, perf)
+            mcp_pre = policy.update(mcp.build(em, perf, text), r)
+    else:
+        reply = tutor.generate(text, mcp_pre)
+    reward.shape_with_reply(r, mcp_pre, reply)
+    return em.label
+
+
+def bench(mode: str, n: int) -> dict:
+    calls0 = llm._stats["calls"]
+    tokens0 = prompt.cache_stats()["prompt_tokens"]
+    lat = []
+    labels = {}
+    for i in range(n):
+        t0 = time.perf_counter()
+        label = _turn(TEXTS[i % len(TEXTS)], mode)
+        lat.append((time.perf_counter() - t0) * 1000)
+        labels[label] = labels.get(label, 0) + 1
+    lat.sort()
+    return {
+        "mode": mode,
+        "turns": n,
+        "llm_calls_per_turn": round((llm._stats["calls"] - calls0) / n, 2),
+        "tutor_prompt_tokens_per_turn": round((prompt.cache_stats()["prompt_tokens"] - tokens0) / n, 1),
+        "mean_ms": round(statistics.mean(lat), 1),
+        "p50_ms": round(lat[len(lat) // 2], 1),
+        "p95_ms": round(lat[min(len(lat) - 1, int(len(lat) * 0.95))], 1),
+        "labels": labels,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark keyword vs two-call vs joint emotion paths")
+    parser.add_argument("--n", type=int, default=24, help="Turns per mode")
+    parser.add_argument("--modes", default="keyword,two-call,joint")
+    args = parser.parse_args()
+
+    print(f"[bench] backend={llm.backend()} turns/mode={args.n}")
+    for mode in [m.strip() for m in args.modes.split(",") if m.strip()]:
+        res = bench(mode, args.n)
+        print(
+            f"  {res['mode']:<9} calls/turn={res['llm_calls_per_turn']:<5} "
+            f"prompt_tokens/turn={res['tutor_prompt_tokens_per_turn']:<7} "
+            f"mean={res['mean_ms']}ms p50={res['p50_ms']}ms p95={res['p95_ms']}ms labels={res['labels']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
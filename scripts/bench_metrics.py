@@ -0,0 +1,107 @@
+# scripts/bench_metrics.py
+# Cost of the dashboard polls (compute_metrics for /api/v1/metrics, compute_series
+# for /metrics/series) on a large seeded turns table: statements issued and
+# latency per filter.
+#   DATABASE_URL=sqlite:///data/bench_metrics.db python scripts/bench_metrics.py --turns 200000
+#
+# Seeds --turns rows across --sessions sessions, spread over the last --hours,
+# unless the table already holds that many (re-runs reuse the data). Rollups are
+# maintained as by the API write paths. Use a scratch database.
+import argparse
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parents[1]))
+os.environ.setdefault("MIGRATE_ON_STARTUP", "1")
+
+from datetime import datetime, timedelta, timezone  # noqa: E402
+
+from sqlalchemy import event, func, insert, select  # noqa: E402
+
+from app.db.schema import Turn  # noqa: E402
+from app.models import MCP, EmotionSignals, LearningStyle, PerformanceSignals, TurnRequest  # noqa: E402
+from app.services import metrics, storage, turn_rollups  # noqa: E402
+
+EMOTIONS = ["frustrated", "engaged", "calm", "bored"]
+TONES = ["warm", "encouraging", "neutral", "concise"]
+PACING = ["slow", "medium", "fast"]
+DIFFICULTY = ["down", "hold", "up"]
+NEXT_STEPS = ["example", "prompt", "explain", "quiz", "review"]
+
+
+def seed(n: int, sessions: int, hours: float, batch: int = 5000) -> None:
+    with storage.SessionLocal() as db:
+        have = db.scalar(select(func.count(Turn.id))) or 0
+        sids = [storage.resolve_session_id(db, None) for _ in range(sessions)] if have < n else []
+    if have >= n:
+        print(f"[bench] reusing {have} turns")
+        return
+    rng = random.Random(7)
+    perf = PerformanceSignals(correct=True)
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    t0 = time.perf_counter()
+    for start in range(have, n, batch):
+        rows = []
+        for _ in range(min(batch, n - start)):
+            em = EmotionSignals(label=rng.choice(EMOTIONS), sentiment=0.0)
+            mcp = MCP(emotion=em, performance=perf, learning_style=LearningStyle(), tone=rng.choice(TONES),
+                      pacing=rng.choice(PACING), difficulty=rng.choice(DIFFICULTY), style="mixed",
+                      next_step=rng.choice(NEXT_STEPS))
+            sid = rng.choice(sids)
+            row = storage._turn_values(sid, TurnRequest(user_text="seed", session_id=sid), em, perf, mcp,
+                                       "ok", round(rng.uniform(-1, 1), 2), None)
+            rows.append({**row, "created_at": now - timedelta(seconds=rng.uniform(0, hours * 3600))})
+        with storage.engine.begin() as c:
+            ids = c.execute(insert(Turn).returning(Turn.id, sort_by_parameter_order=True), rows).scalars().all()
+            turn_rollups.add(c, ids)
+    print(f"[bench] seeded {n - have} turns in {time.perf_counter() - t0:.1f}s")
+
+
+def bench(label: str, runs: int, fn=metrics.compute_metrics, **kwargs) -> None:
+    statements = []
+    def count(conn, cursor, statement, params, context, executemany):
+        statements.append(statement)
+    engines = {storage.engine, storage.read_engine}
+    for e in engines:
+        event.listen(e, "before_cursor_execute", count)
+    try:
+        fn(**kwargs)  # warm the page cache
+        statements.clear()
+        lat = []
+        for _ in range(runs):
+            t0 = time.perf_counter()
+            fn(**kwargs)
+            lat.append((time.perf_counter() - t0) * 1000)
+    finally:
+        for e in engines:
+            event.remove(e, "before_cursor_execute", count)
+    lat.sort()
+    print(f"  {label:<14} queries/call={len(statements) // runs:<3} p50={lat[len(lat) // 2]:.1f}ms "
+          f"max={lat[-1]:.1f}ms (n={runs})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark compute_metrics on a seeded turns table")
+    parser.add_argument("--turns", type=int, default=200000)
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--hours", type=float, default=24, help="Seeded turns are spread over this many hours")
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    storage.init_db()
+    seed(args.turns, args.sessions, args.hours)
+    with storage.SessionLocal() as db:
+        sid = db.scalar(select(Turn.session_id).order_by(Turn.id.desc()).limit(1))
+    print(f"[bench] {storage.engine.url.render_as_string(hide_password=True)}")
+    bench("all", args.runs)
+    bench("since 15 min", args.runs, since_minutes=15)
+    bench("since 60 min", args.runs, since_minutes=60)
+    bench("one session", args.runs, session_id=sid)
+    bench("series 4h/min", args.runs, metrics.compute_series, since_minutes=240)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,12 +3,14 @@
 # ---------------------------------------------------------------
 # Seeds a session with randomized turns so the metrics dashboard lights up.
 # - If --session is omitted, a new session row is created (committed).
-# - Posts turns to /api/v1/turn/log with varied emotions, pacing, difficulty, and rewards.
+# - Posts turns to /api/v1/turn/log/bulk (one request per --batch turns) with varied
+#   emotions, pacing, difficulty, and rewards; --one-by-one uses /api/v1/turn/log.
 # - Prints a summary and the session id used.
 #
 # Usage examples:
 #   python scripts/seed_turns.py --session 6 --n 20
 #   python scripts/seed_turns.py --host http://127.0.0.1:8000 --n 12
+#   python scripts/seed_turns.py --n 200000 --batch 20000
 #
 # Error handling included. Have fun, test safely.
 
@@ -50,6 +52,15 @@ def post_turn(host: str, payload: Dict[str, Any], reward: float) -> Dict[str, An
     return r.json()
 
 
+def post_bulk(host: str, turns: List[Dict[str, Any]]) -> Dict[str, Any]:
+    # NDJSON: one turn per line, "reward" carried inside each turn
+    url = f"{host.rstrip('/')}/api/v1/turn/log/bulk"
+    body = "\n".join(json.dumps(t) for t in turns)
+    r = requests.post(url, headers={"Content-Type": "application/x-ndjson"}, data=body.encode("utf-8"), timeout=300)
+    r.raise_for_status()
+    return r.json()
+
+
 def sample_turn(session_id: int) -> Tuple[Dict[str, Any], float]:
     # Emotions, mapped to preferred tutoring adjustments
     cases = [
@@ -97,7 +108,9 @@ def main():
     parser.add_argument("--host", default="http://127.0.0.1:8000", help="FastAPI base URL")
     parser.add_argument("--session", type=int, help="Existing session id. If omitted, a new session will be created via DB")
     parser.add_argument("--n", type=int, default=12, help="Number of turns to seed")
-    parser.add_argument("--sleep", type=float, default=0.1, help="Pause between posts (seconds)")
+    parser.add_argument("--sleep", type=float, default=0.1, help="Pause between posts (seconds, --one-by-one only)")
+    parser.add_argument("--batch", type=int, default=5000, help="Turns per bulk request")
+    parser.add_argument("--one-by-one", action="store_true", help="Post each turn to /api/v1/turn/log instead of the bulk endpoint")
     args = parser.parse_args()
 
     try:
@@ -109,7 +122,24 @@ def main():
             print(f"[seed] Using existing session: {session_id}")
 
         successes: List[int] = []
-        for i in range(args.n):
+        if not args.one_by_one:
+            t0 = time.time()
+            for start in range(0, args.n, args.batch):
+                size = min(args.batch, args.n - start)
+                turns = []
+                for _ in range(size):
+                    payload, reward = sample_turn(session_id)
+                    turns.append({**payload, "reward": reward})
+                try:
+                    resp = post_bulk(args.host, turns)
+                    successes.extend(resp.get("turn_ids", []))
+                    print(f"[seed] {start + size}/{args.n} ok (+{resp.get('count', 0)})")
+                except requests.RequestException as re:
+                    detail = getattr(getattr(re, "response", None), "text", "")
+                    print(f"[seed] batch at {start} HTTP error: {re} {detail[:300]}")
+            dt = max(time.time() - t0, 1e-6)
+            print(f"[seed] {len(successes)} turns in {dt:.2f}s ({len(successes) / dt:.0f}/s)")
+        for i in range(args.n if args.one_by_one else 0):
             payload, reward = sample_turn(session_id)
             try:
                 resp = post_turn(args.host, payload, reward)
@@ -9,14 +9,10 @@ import argparse
 import re
 from datetime import datetime
 from dotenv import load_dotenv
-from openai import OpenAI
 
 # Load environment variables from .env
 load_dotenv()
 
-# Initialize OpenAI client with API key
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-
 
 def load_transcript(transcript_path: str) -> dict:
     """
@@ -50,7 +46,10 @@ def analyze_emotion(transcript_data: dict) -> dict:
     prompt = build_prompt(transcript_data.get("text", ""))
 
     print("🧠 Sending to GPT-4o...")
-    response = client.chat.completions.create(
+    # shared OpenAI client (LLM_BACKEND=fake uses the offline stand-in server)
+    from app.services.llm import get_client
+
+    response = get_client().chat.completions.create(
         model="gpt-4o",
         messages=[{"role": "user", "content": prompt}],
         temperature=0.3,
@@ -87,6 +86,29 @@ def analyze_emotion(transcript_data: dict) -> dict:
     }
 
 
+def analyze_emotion_cascade(transcript_data: dict, threshold: float | None = None) -> dict:
+    """
+    Local keyword classifier first; only low-confidence transcripts are sent
+    to the LLM (see app.services.emotion_cascade). Same output shape as
+    analyze_emotion(), plus "source" ("local" or "llm") in emotion_analysis.
+    """
+    from app.services import emotion_cascade
+
+    text = transcript_data.get("text", "")
+    res = emotion_cascade.analyze(text, threshold)
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "input_file": transcript_data.get("audio_file", ""),
+        "transcript": text,
+        "emotion_analysis": {
+            "emotion": res["label"],
+            "confidence": res["confidence"],
+            "source": res["source"],
+            "explanation": (res.get("raw") or {}).get("explanation", "keyword classifier"),
+        },
+    }
+
+
 def save_output(data: dict, out_path: str = "outputs/emotion_results.json"):  
     """
     Save the emotion analysis result to a JSON file.
@@ -108,10 +130,24 @@ if __name__ == "__main__":
         "--output", default="outputs/emotion_results.json",
         help="Path to save emotion result JSON"
     )
+    parser.add_argument(
+        "--cascade", action="store_true",
+        help="Try the local keyword classifier first; call the LLM only when it is unsure"
+    )
+    parser.add_argument(
+        "--threshold", type=float, default=None,
+        help="Cascade confidence threshold (default EMOTION_CASCADE_THRESHOLD or 0.6)"
+    )
     args = parser.parse_args()
 
     data = load_transcript(args.transcript_path)
-    result = analyze_emotion(data)
+    if args.cascade:
+        result = analyze_emotion_cascade(data, args.threshold)
+        from app.services import emotion_cascade
+        st = emotion_cascade.stats()
+        print(f"🔀 Cascade → source: {result['emotion_analysis']['source']}, escalation rate: {st['escalation_rate']:.0%}")
+    else:
+        result = analyze_emotion(data)
     save_output(result, args.output)
 
 # -------------------------------------------------------------
@@ -1,6 +1,21 @@
-import sys, pathlib, warnings
+import os, sys, pathlib, tempfile, warnings
+import pytest
 sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
 
+# Without a DATABASE_URL the suite runs against a throwaway embedded SQLite
+# database (see README_DB.md "Embedded mode"); set it to test against Postgres.
+_EMBEDDED_DB = None
+if not os.getenv("DATABASE_URL"):
+    _EMBEDDED_DB = pathlib.Path(tempfile.mkdtemp(prefix="eqilevel-test-")) / "eqilevel.db"
+    os.environ["DATABASE_URL"] = f"sqlite:///{_EMBEDDED_DB.as_posix()}"
+
+@pytest.fixture(scope="session", autouse=True)
+def _embedded_schema():
+    if _EMBEDDED_DB is not None:
+        from app.services.storage import init_db
+        init_db()
+    yield
+
 # Silence noisy deprecation warnings from SWIG-wrapped deps that we don't control
 warnings.filterwarnings(
     'ignore',
@@ -0,0 +1,40 @@
+# tests/test_db_pool.py
+import pytest
+from sqlalchemy import create_engine, exc, text
+
+from app.services import db_pool
+
+def test_engine_kwargs_postgres_statement_timeout(monkeypatch):
+    monkeypatch.setattr(db_pool, "STATEMENT_TIMEOUT_MS", 5000)
+    kw = db_pool.engine_kwargs("postgresql+psycopg2://u:p@localhost/db")
+    assert kw["poolclass"] is db_pool.InstrumentedQueuePool
+    assert kw["connect_args"] == {"options": "-c timezone=UTC -c statement_timeout=5000"}
+    kw = db_pool.engine_kwargs("postgresql+asyncpg://u:p@localhost/db", pool="async")
+    assert kw["poolclass"] is db_pool.InstrumentedAsyncQueuePool
+    assert kw["connect_args"] == {"server_settings": {"timezone": "UTC", "statement_timeout": "5000"}}
+
+def test_postgres_sessions_run_in_utc(monkeypatch):
+    monkeypatch.setattr(db_pool, "STATEMENT_TIMEOUT_MS", 0)
+    assert db_pool.connect_args("postgresql+psycopg2://u:p@localhost/db") == {"options": "-c timezone=UTC"}
+    assert db_pool.connect_args("postgresql+asyncpg://u:p@localhost/db") == {"server_settings": {"timezone": "UTC"}}
+    assert db_pool.connect_args("sqlite:///data/x.db") == {}
+
+def test_in_memory_sqlite_keeps_default_pool():
+    assert "poolclass" not in db_pool.engine_kwargs("sqlite://")
+
+def test_checkout_waits_and_timeouts_are_recorded(tmp_path):
+    db_pool._waits["sync"].reset()
+    eng = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}",
+        poolclass=db_pool.InstrumentedQueuePool, pool_size=1, max_overflow=0, pool_timeout=0.05,
+    )
+    held = eng.connect()
+    held.execute(text("SELECT 1"))
+    with pytest.raises(exc.TimeoutError):
+        eng.connect()
+    held.close()
+    s = db_pool.pool_stats(eng.pool, "sync")
+    assert s["checkouts"] == 1 and s["timeouts"] == 1
+    assert s["active"] == 0 and s["idle"] == 1
+    assert sum(s["wait_histogram"].values()) == 2
+    eng.dispose()
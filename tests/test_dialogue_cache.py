@@ -0,0 +1,59 @@
+# tests/test_dialogue_cache.py
+from app.models import MCP, EmotionSignals, LearningStyle, PerformanceSignals, TurnRequest
+from app.services import storage
+from app.services.dialogue_cache import DialogueCache
+
+def _rows(ids):
+    # DB fill rows, newest first
+    return [(i, f"u{i}", f"r{i}", 1, 1) for i in sorted(ids, reverse=True)]
+
+def test_fill_then_hits_and_write_through():
+    c = DialogueCache(turns_per_session=4, max_bytes=1 << 20, idle_seconds=60)
+    assert c.get(1, 2, None) is None
+    assert [r[0] for r in c.load(1, _rows([10, 11]), c.epoch(), 2, None)] == ["u11", "u10"]
+    c.append(1, 12, "u12", "r12", 1, 1)
+    assert [r[0] for r in c.get(1, 8, None)] == ["u12", "u11", "u10"]  # whole session cached
+    assert [r[0] for r in c.get(1, 8, 11)] == ["u12"]
+    assert c.stats()["hits"] == 2
+
+def test_evicted_history_is_a_miss_unless_limit_is_met():
+    c = DialogueCache(turns_per_session=3, max_bytes=1 << 20, idle_seconds=60)
+    c.load(1, _rows([1, 2, 3]), c.epoch(), 3, None)
+    c.append(1, 4, "u4", "r4", 1, 1)  # drops turn 1
+    assert len(c.get(1, 3, None)) == 3
+    assert c.get(1, 5, None) is None  # turn 1 no longer buffered
+    assert [r[0] for r in c.get(1, 5, 2)] == ["u4", "u3"]
+
+def test_fill_racing_a_write_is_not_installed():
+    c = DialogueCache(turns_per_session=4, max_bytes=1 << 20, idle_seconds=60)
+    epoch = c.epoch()
+    c.append(1, 5, "u5", "r5", 1, 1)  # committed after the fill's query ran
+    c.load(1, _rows([3, 4]), epoch, 2, None)
+    assert c.get(1, 2, None) is None
+
+def test_memory_cap_evicts_lru_sessions():
+    c = DialogueCache(turns_per_session=4, max_bytes=400, idle_seconds=60)
+    for sid in (1, 2, 3):
+        c.load(sid, _rows([sid * 10]), c.epoch(), 1, None)
+        c.get(sid, 1, None)
+    assert c.get(1, 1, None) is None and c.get(3, 1, None) is not None
+    assert c.stats()["bytes"] <= 400
+
+def test_dialogue_messages_match_db_with_cache(monkeypatch):
+    monkeypatch.setattr(storage.dialogue_cache, "cache", DialogueCache(turns_per_session=50, max_bytes=1 << 20, idle_seconds=60))
+    with storage.SessionLocal() as db:
+        sid = storage.resolve_session_id(db, None)
+    em = EmotionSignals(label="calm", sentiment=0.0)
+    perf = PerformanceSignals()
+    mcp = MCP(emotion=em, performance=perf, learning_style=LearningStyle(), tone="warm", pacing="medium",
+              difficulty="hold", style="mixed", next_step="prompt")
+    storage.log_turn_full(TurnRequest(user_text="first", session_id=sid), em, perf, mcp, "one")
+    assert [m["content"] for m in storage.dialogue_messages(sid)] == ["first", "one"]  # fills the buffer
+    storage.log_turn_full(TurnRequest(user_text="second", session_id=sid), em, perf, mcp, "two")
+    hits = storage.dialogue_cache.cache.hits
+    cached = storage.dialogue_messages(sid, limit=8)
+    assert storage.dialogue_cache.cache.hits == hits + 1
+    with storage.SessionLocal() as db:
+        rows = db.execute(storage._dialogue_stmt(sid, 8, None, None)).all()
+    assert cached == storage._dialogue_from_rows(rows, None)
+    assert [m["content"] for m in cached] == ["first", "one", "second", "two"]
@@ -0,0 +1,47 @@
+# tests/test_emotion_cascade.py
+from app.services import emotion, emotion_cascade, llm
+from app.services.fake_llm import FakeLLMConfig
+
+def test_classify_scored_confident_on_clear_cue():
+    em, conf = emotion.classify_scored("I'm stuck and confused")
+    assert em.label == "frustrated"
+    assert conf >= 0.7
+
+def test_classify_scored_unsure_on_long_neutral_text():
+    em, conf = emotion.classify_scored("well I tried to do the second one but then my brother came in and I forgot")
+    assert em.label == "calm"
+    assert conf < emotion_cascade.THRESHOLD
+
+def test_confident_local_answer_skips_llm():
+    calls = []
+    res = emotion_cascade.run("this is easy, got it", lambda t: calls.append(t) or {}, threshold=0.6)
+    assert res["source"] == "local" and res["label"] == "engaged"
+    assert calls == []
+
+def test_low_confidence_escalates_and_maps_label():
+    res = emotion_cascade.run(
+        "hmm I am not really sure what the teacher wanted us to write here",
+        lambda t: {"emotion": "Anxious", "confidence": 0.8},
+        threshold=0.6,
+    )
+    assert res["source"] == "llm"
+    assert res["label"] == "frustrated"
+    assert res["sentiment"] < 0
+
+def test_escalation_failure_keeps_local_label():
+    def boom(_):
+        raise RuntimeError("down")
+    before = emotion_cascade.stats()["llm_failures"]
+    res = emotion_cascade.run("whatever, can we do something else today maybe later", boom, threshold=0.99)
+    assert res["source"] == "local"
+    assert emotion_cascade.stats()["llm_failures"] == before + 1
+    assert 0 < emotion_cascade.stats()["escalation_rate"] <= 1
+
+def test_failed_escalations_leave_tutor_breaker_closed(monkeypatch):
+    monkeypatch.setattr(llm, "get_client", lambda: llm.make_fake_client(FakeLLMConfig(error_rate=1.0)))
+    monkeypatch.setattr(llm, "breaker", llm.CircuitBreaker(failures=1))
+    monkeypatch.setattr(emotion_cascade, "_breaker", llm.CircuitBreaker(failures=1))
+    res = emotion_cascade.analyze("well I tried to do the second one but then my brother came in", threshold=0.99)
+    assert res["source"] == "local"
+    assert emotion_cascade.stats()["breaker"]["state"] == "open"
+    assert llm.breaker.snapshot()["state"] == "closed"
@@ -0,0 +1,45 @@
+# tests/test_fake_llm.py
+import json
+import pytest
+from openai import APIStatusError
+
+from app.services.fake_llm import FakeLLMConfig
+from app.services.json_repair import parse_envelope
+from app.services.llm import make_fake_client
+
+def test_fake_returns_schema_valid_tutor_envelope():
+    client = make_fake_client(FakeLLMConfig(seed=1))
+    resp = client.chat.completions.create(
+        model="gpt-4o-mini",
+        messages=[{"role": "system", "content": "tutor"}, {"role": "user", "content": "hi"}],
+        response_format={"type": "json_object"},
+    )
+    j, status = parse_envelope(resp.choices[0].message.content)
+    assert status == "ok"
+    assert j["question"] and j["next_step"] in ("explain", "example", "prompt", "quiz", "review")
+    assert resp.usage.prompt_tokens > 0
+
+def test_fake_emotion_prompt_shape():
+    client = make_fake_client(FakeLLMConfig(seed=2))
+    resp = client.chat.completions.create(
+        model="gpt-4o",
+        messages=[{"role": "user", "content": 'JSON format: { "emotion": "<emotion>", "confidence": 0.00 }'}],
+    )
+    j = json.loads(resp.choices[0].message.content)
+    assert "emotion" in j and "confidence" in j
+
+def test_fake_streaming_reassembles():
+    client = make_fake_client(FakeLLMConfig(seed=3, chunk_ms=0))
+    stream = client.chat.completions.create(
+        model="gpt-4o-mini",
+        messages=[{"role": "user", "content": "hi"}],
+        response_format={"type": "json_object"},
+        stream=True,
+    )
+    text = "".join((c.choices[0].delta.content or "") for c in stream if c.choices)
+    assert json.loads(text)["question"]
+
+def test_fake_error_rate():
+    client = make_fake_client(FakeLLMConfig(error_rate=1.0)).with_options(max_retries=0)
+    with pytest.raises(APIStatusError):
+        client.chat.completions.create(model="gpt-4o-mini", messages=[{"role": "user", "content": "hi"}])
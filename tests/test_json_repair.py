@@ -0,0 +1,37 @@
+# tests/test_json_repair.py
+from app.services.json_repair import parse_envelope, repair_json, salvage_fields
+
+def test_strict_json_ok():
+    j, status = parse_envelope('{"support": "Nice.", "question": "What is 3+4?"}')
+    assert status == "ok"
+    assert j["question"] == "What is 3+4?"
+
+def test_fenced_json_with_trailing_comma_repaired():
+    raw = '```json\n{"support": "Nice.", "question": "What is 3+4?",}\n```'
+    j, status = parse_envelope(raw)
+    assert status == "repaired"
+    assert j["support"] == "Nice."
+
+def test_truncated_string_repaired():
+    raw = '{"support": "Let\'s slow down.", "question": "Can you add the ones'
+    j, status = parse_envelope(raw)
+    assert status == "repaired"
+    assert j["question"].startswith("Can you add")
+
+def test_truncated_after_key_drops_dangling_key():
+    j = repair_json('{"support": "Good try.", "question":')
+    assert j == {"support": "Good try."}
+
+def test_salvage_from_garbage_prefix():
+    raw = 'Sure! "support": "Try an example first.", "question": "Ready?" oops'
+    assert salvage_fields(raw) == {"support": "Try an example first.", "question": "Ready?"}
+
+def test_nothing_salvageable():
+    j, status = parse_envelope("I cannot help with that")
+    assert j is None and status == "failed"
+
+def test_trailing_comma_inside_string_is_kept():
+    raw = '{"support": "Lists look like [1, 2, ] or {a, }", "question": "Ready?",}'
+    j, status = parse_envelope(raw)
+    assert status == "repaired"
+    assert j["support"] == "Lists look like [1, 2, ] or {a, }"
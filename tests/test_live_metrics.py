@@ -0,0 +1,88 @@
+# tests/test_live_metrics.py
+from datetime import datetime, timedelta, timezone
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event, insert
+
+from app.db.schema import Turn
+from app.main import app
+from app.models import MCP, EmotionSignals, LearningStyle, PerformanceSignals, TurnRequest
+from app.services import live_metrics, metrics, storage, turn_rollups
+
+client = TestClient(app)
+T0 = 1_800_000_000.0  # bucket-aligned for 10s buckets
+
+def _row(sid, label="calm", tone="neutral", reward=0.5, **kw):
+    return {"id": None, "session_id": sid, "emotion_label": label, "tone": tone, "pacing": "medium",
+            "difficulty": "hold", "next_step": "prompt", "reward": reward, **kw}
+
+def test_windows_slide_and_scopes_are_separate():
+    live = live_metrics.LiveMetrics((1, 5), bucket_seconds=10, max_sessions=100)
+    live.record([_row(1, reward=1.0)], now=T0)
+    live.record([_row(2, label="frustrated", tone="warm", reward=0.0)], now=T0 + 90)
+
+    one_min = live.snapshot(since_minutes=1, now=T0 + 100)
+    assert one_min["turns_total"] == 1 and one_min["by_emotion"]["frustrated"] == 1
+    five_min = live.snapshot(since_minutes=5, now=T0 + 100)
+    assert five_min["turns_total"] == 2 and five_min["avg_reward"] == 0.5
+    assert five_min["tone_alignment_rate"] == 1.0
+    assert live.snapshot(session_id=1, now=T0 + 100)["turns_total"] == 1
+    assert live.snapshot(session_id=1, since_minutes=1, now=T0 + 100)["turns_total"] == 0
+    assert live.snapshot(since_minutes=5, now=T0 + 400)["turns_total"] == 0
+
+def test_last_10_ring_is_limited_to_the_window():
+    live = live_metrics.LiveMetrics((1, 60), bucket_seconds=10, max_sessions=100)
+    live.record([_row(1, reward=0.0) for _ in range(10)], now=T0)
+    live.record([_row(1, reward=1.0) for _ in range(5)], now=T0 + 120)
+    assert live.snapshot(since_minutes=60, now=T0 + 130)["last_10_reward_avg"] == 0.5
+    assert live.snapshot(since_minutes=1, now=T0 + 130)["last_10_reward_avg"] == 1.0
+
+def test_rebuild_matches_compute_metrics_and_skips_loaded_turns():
+    with storage.SessionLocal() as db:
+        sid = storage.resolve_session_id(db, None)
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    rows = [dict(_row(sid, label=("frustrated", "engaged", "bored")[i % 3], tone=("warm", "concise")[i % 2],
+                      reward=i / 10), user_text="u", reply_text="r", emotion={}, performance={}, mcp={},
+                 created_at=now - timedelta(seconds=30 * (60 - i) + 7))
+            for i in range(60)]
+    for r in rows:
+        del r["id"]
+    with storage.engine.begin() as c:
+        ids = c.execute(insert(Turn).returning(Turn.id, sort_by_parameter_order=True), rows).scalars().all()
+        turn_rollups.add(c, ids)
+
+    live = live_metrics.LiveMetrics((60,), bucket_seconds=15, max_sessions=100)
+    def load(since):
+        for i, r in enumerate(live_metrics._load_from_db(since)):
+            if i == 0:  # a write hook firing mid-load for a turn the load also returns
+                live.record([{**rows[0], "id": ids[0]}])
+            yield r
+    assert live.rebuild(load) >= 60
+    got = live.snapshot(session_id=sid, since_minutes=60)
+    want = metrics.compute_metrics(session_id=sid, since_minutes=60)
+    for d in (got, want):
+        d.pop("filters")
+    assert got == want
+
+def test_live_endpoint_follows_writes_without_queries():
+    with storage.SessionLocal() as db:
+        sid = storage.resolve_session_id(db, None)
+    em = EmotionSignals(label="bored", sentiment=0.0)
+    perf = PerformanceSignals()
+    mcp = MCP(emotion=em, performance=perf, learning_style=LearningStyle(), tone="concise", pacing="fast",
+              difficulty="up", style="mixed", next_step="quiz")
+    storage.log_turn_full(TurnRequest(user_text="q", session_id=sid), em, perf, mcp, "a", 0.4)
+
+    statements = []
+    def before(conn, cursor, statement, params, context, executemany):
+        statements.append(statement)
+    event.listen(storage.engine, "before_cursor_execute", before)
+    try:
+        r = client.get(f"/api/v1/metrics/live?session_id={sid}&since_minutes=5")
+    finally:
+        event.remove(storage.engine, "before_cursor_execute", before)
+    assert r.status_code == 200 and statements == []
+    body = r.json()
+    assert body["turns_total"] == 1 and body["by_emotion"]["bored"] == 1
+    assert body["tone_alignment_rate"] == 1.0 and body["filters"]["since_minutes"] == 5
+    assert client.get("/api/v1/metrics/live?since_minutes=7").status_code == 400
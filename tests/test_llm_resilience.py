@@ -0,0 +1,79 @@
+# tests/test_llm_resilience.py
+import time
+import httpx
+import openai
+import pytest
+
+from app.services import llm
+from app.services.fake_llm import FakeLLMConfig
+
+MSGS = [{"role": "user", "content": "hi"}]
+
+def test_breaker_opens_after_failures_and_half_opens():
+    b = llm.CircuitBreaker(failures=2, cooldown_s=0.05)
+    assert b.allow()
+    b.record_failure()
+    assert b.snapshot()["state"] == "closed"
+    b.record_failure()
+    assert b.snapshot()["state"] == "open"
+    assert b.allow() is False
+    time.sleep(0.06)
+    assert b.allow() is True          # single half-open probe
+    assert b.allow() is False
+    b.record_success()
+    assert b.snapshot()["state"] == "closed"
+
+def test_complete_respects_deadline():
+    client = llm.make_fake_client(FakeLLMConfig(latency="fixed:500"))
+    t0 = time.monotonic()
+    with pytest.raises(llm.LLMTimeout):
+        llm.complete(deadline=time.monotonic() + 0.1, hedge=False, client=client, model="m", messages=MSGS)
+    assert time.monotonic() - t0 < 0.4
+    llm.breaker.record_success()
+
+def test_complete_hedges_slow_primary(monkeypatch):
+    # first request slow, hedged duplicate fast
+    calls = {"n": 0}
+    class Cfg(FakeLLMConfig):
+        def sample_latency_s(self):
+            calls["n"] += 1
+            return 0.5 if calls["n"] == 1 else 0.0
+    monkeypatch.setattr(llm, "HEDGE_MIN_MS", 50)
+    client = llm.make_fake_client(Cfg())
+    before = llm._stats["hedge_wins"]
+    resp = llm.complete(deadline=time.monotonic() + 2, hedge=True, client=client, model="m", messages=MSGS)
+    assert resp.choices[0].message.content
+    assert llm._stats["hedge_wins"] == before + 1
+
+def test_open_breaker_skips_provider(monkeypatch):
+    b = llm.CircuitBreaker(failures=1, cooldown_s=60)
+    b.record_failure()
+    monkeypatch.setattr(llm, "breaker", b)
+    with pytest.raises(llm.LLMUnavailable):
+        llm.complete(model="m", messages=MSGS)
+
+class _FailingClient:
+    """Stands in for the SDK client; every create() raises a provider error."""
+    def __init__(self, status: int):
+        self.status = status
+        self.chat = self
+        self.completions = self
+
+    def with_options(self, **_):
+        return self
+
+    def create(self, **_):
+        resp = httpx.Response(self.status, request=httpx.Request("POST", "http://llm.local/v1/chat/completions"))
+        cls = openai.BadRequestError if self.status == 400 else openai.InternalServerError
+        raise cls("provider said no", response=resp, body=None)
+
+def test_client_errors_do_not_open_breaker():
+    b = llm.CircuitBreaker(failures=2, cooldown_s=60)
+    for _ in range(3):
+        with pytest.raises(openai.BadRequestError):
+            llm.complete(hedge=False, client=_FailingClient(400), circuit=b, model="m", messages=MSGS)
+    assert b.snapshot()["state"] == "closed" and b.snapshot()["consecutive_failures"] == 0
+    for _ in range(2):
+        with pytest.raises(openai.InternalServerError):
+            llm.complete(hedge=False, client=_FailingClient(503), circuit=b, model="m", messages=MSGS)
+    assert b.snapshot()["state"] == "open"
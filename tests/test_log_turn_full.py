@@ -0,0 +1,44 @@
+# tests/test_log_turn_full.py
+import pytest
+from sqlalchemy import event, select
+
+from app.db.schema import Turn
+from app.models import MCP, EmotionSignals, LearningStyle, PerformanceSignals, TurnRequest
+from app.services import storage
+
+EM = EmotionSignals(label="engaged", sentiment=0.2)
+PERF = PerformanceSignals(correct=True)
+MCP_ = MCP(emotion=EM, performance=PERF, learning_style=LearningStyle(), tone="warm", pacing="medium",
+           difficulty="hold", style="mixed", next_step="prompt")
+
+@pytest.fixture
+def statements():
+    seen = []
+    def before(conn, cursor, statement, params, context, executemany):
+        seen.append(" ".join(statement.split()[:3]).upper())
+    event.listen(storage.engine, "before_cursor_execute", before)
+    yield seen
+    event.remove(storage.engine, "before_cursor_execute", before)
+
+def test_numeric_session_is_one_insert_plus_rollup(statements):
+    with storage.SessionLocal() as db:
+        sid = storage.resolve_session_id(db, None)
+    statements.clear()
+    tid = storage.log_turn_full(TurnRequest(user_text="hi", session_id=str(sid)), EM, PERF, MCP_, "hello", 0.5, "A1")
+    assert statements == ["INSERT INTO TURNS", "INSERT INTO TURN_ROLLUPS"]
+    with storage.SessionLocal() as db:
+        t = db.get(Turn, tid)
+    assert t.session_id == sid and t.objective_code == "A1"
+
+def test_unknown_session_maps_foreign_key_error():
+    with pytest.raises(ValueError, match="Session 987654321 does not exist"):
+        storage.log_turn_full(TurnRequest(user_text="hi", session_id=987654321), EM, PERF, MCP_, "x")
+
+def test_client_key_reuses_its_session():
+    a = storage.log_turn_full(TurnRequest(user_text="1", session_id="kiosk-7"), EM, PERF, MCP_, "x")
+    b = storage.log_turn_full(TurnRequest(user_text="2", session_id="kiosk-7"), EM, PERF, MCP_, "y")
+    with storage.SessionLocal() as db:
+        sids = db.execute(select(Turn.session_id).where(Turn.id.in_([a, b]))).scalars().all()
+        assert len(set(sids)) == 1
+        assert storage.resolve_session_id(db, "kiosk-7") == sids[0]
+        assert storage.resolve_session_id(db, "kiosk-8") != sids[0]
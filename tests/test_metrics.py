@@ -5,3 +5,34 @@ def test_compute_metrics_runs_smoke():
     data = compute_metrics()
     assert "turns_total" in data
     assert "avg_reward" in data
+
+def test_compute_metrics_is_one_statement():
+    from sqlalchemy import event
+    from app.models import MCP, EmotionSignals, LearningStyle, PerformanceSignals, TurnRequest
+    from app.services import storage
+
+    with storage.SessionLocal() as db:
+        sid = storage.resolve_session_id(db, None)
+    perf = PerformanceSignals()
+    for label, tone, pacing, reward in [("frustrated", "warm", "slow", 1.0), ("frustrated", "concise", "fast", 0.0),
+                                        ("calm", "neutral", "medium", 0.5)]:
+        em = EmotionSignals(label=label, sentiment=0.0)
+        mcp = MCP(emotion=em, performance=perf, learning_style=LearningStyle(), tone=tone, pacing=pacing,
+                  difficulty="hold", style="mixed", next_step="quiz")
+        storage.log_turn_full(TurnRequest(user_text="q", session_id=sid), em, perf, mcp, "a", reward)
+
+    statements = []
+    def before(conn, cursor, statement, params, context, executemany):
+        statements.append(statement)
+    event.listen(storage.read_engine, "before_cursor_execute", before)
+    try:
+        data = compute_metrics(session_id=sid)
+    finally:
+        event.remove(storage.read_engine, "before_cursor_execute", before)
+    assert len(statements) == 1
+    assert data["turns_total"] == 3 and data["avg_reward"] == 0.5 and data["last_10_reward_avg"] == 0.5
+    assert data["by_emotion"] == {"frustrated": 2, "engaged": 0, "calm": 1, "bored": 0}
+    assert data["frustration_adaptation_rate"] == 0.5
+    assert data["tone_alignment_rate"] == round(2 / 3, 4)
+    assert data["action_distribution"]["pacing"] == {"slow": 1, "medium": 1, "fast": 1}
+    assert data["action_distribution"]["next_step"]["quiz"] == 3
@@ -0,0 +1,77 @@
+# tests/test_migrations.py
+from sqlalchemy import create_engine, inspect, text
+
+from app.db import migrations
+
+def _old_schema_engine(tmp_path):
+    # tables as they looked before migrations existed (no token/summary columns, no indexes)
+    eng = create_engine(f"sqlite:///{tmp_path / 'old.db'}", future=True)
+    with eng.begin() as c:
+        c.execute(text("CREATE TABLE sessions (id INTEGER PRIMARY KEY, created_at TIMESTAMP)"))
+        c.execute(text("CREATE TABLE users (id INTEGER PRIMARY KEY, name VARCHAR)"))
+        c.execute(text("CREATE TABLE session_users (session_id INTEGER PRIMARY KEY, user_id INTEGER, created_at TIMESTAMP)"))
+        c.execute(text(
+            "CREATE TABLE turns (id INTEGER PRIMARY KEY, session_id INTEGER, user_text VARCHAR, reply_text VARCHAR,"
+            " emotion JSON, performance JSON, mcp JSON, reward FLOAT, created_at TIMESTAMP)"
+        ))
+    return eng
+
+def test_upgrade_adds_columns_and_indexes(tmp_path):
+    eng = _old_schema_engine(tmp_path)
+    applied = migrations.upgrade(eng)
+    assert applied == [m.version for m in migrations.MIGRATIONS]
+    insp = inspect(eng)
+    assert {"user_tokens", "reply_tokens"} <= {c["name"] for c in insp.get_columns("turns")}
+    idx = {i["name"]: i["column_names"] for i in insp.get_indexes("turns")}
+    assert idx["ix_turns_session_id_id"] == ["session_id", "id"]
+    assert "ix_turns_created_at" in idx
+    assert "ix_session_users_user_id" in {i["name"] for i in insp.get_indexes("session_users")}
+
+def test_upgrade_is_idempotent(tmp_path):
+    eng = _old_schema_engine(tmp_path)
+    migrations.upgrade(eng)
+    assert migrations.upgrade(eng) == []
+    assert all(row["applied"] for row in migrations.status(eng))
+
+def test_backfill_fills_typed_columns_from_json(tmp_path):
+    eng = _old_schema_engine(tmp_path)
+    with eng.begin() as c:
+        c.execute(text(
+            "INSERT INTO turns (session_id, user_text, reply_text, emotion, performance, mcp, reward) VALUES"
+            " (1, 'u', 'r', '{\"label\": \"frustrated\"}', '{\"correct\": true, \"objective_code\": \"B1\"}',"
+            " '{\"tone\": \"warm\", \"pacing\": \"slow\", \"difficulty\": \"down\", \"next_step\": \"example\"}', 0.1)"
+        ))
+    migrations.upgrade(eng)
+    with eng.connect() as c:  # startup migrations only add the columns
+        assert c.execute(text("SELECT emotion_label FROM turns")).scalar() is None
+    assert migrations.backfill_projections(eng) == 1
+    with eng.connect() as c:
+        row = c.execute(text("SELECT emotion_label, tone, pacing, difficulty, next_step, correct, objective_code FROM turns")).one()
+    assert tuple(row) == ("frustrated", "warm", "slow", "down", "example", 1, "B1")
+    assert migrations.backfill_projections(eng) == 0  # nothing left to fill
+
+def test_create_index_rebuilds_invalid_postgres_index():
+    # what Postgres reports after an interrupted CREATE INDEX CONCURRENTLY
+    class Conn:
+        dialect = type("D", (), {"name": "postgresql"})()
+        def __init__(self):
+            self.sql = []
+        def execute(self, stmt, params=None):
+            self.sql.append(str(stmt))
+            return type("R", (), {"scalar": lambda _self: True})()
+    conn = Conn()
+    migrations._create_index(conn, "ix_turns_created_at", "turns", "created_at")
+    assert "pg_index" in conn.sql[0]
+    assert conn.sql[1] == "DROP INDEX CONCURRENTLY IF EXISTS ix_turns_created_at"
+    assert conn.sql[2] == "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_turns_created_at ON turns (created_at)"
+
+def test_manual_step_waits_for_cli_on_a_populated_database(tmp_path):
+    eng = _old_schema_engine(tmp_path)
+    with eng.begin() as c:
+        c.execute(text("INSERT INTO turns (session_id, user_text, reply_text, emotion, performance, mcp, reward)"
+                       " VALUES (1, 'u', 'r', '{}', '{}', '{}', 0)"))
+    manual = [m.version for m in migrations.MIGRATIONS if m.manual]
+    assert manual == [6, 10, 11]
+    assert not set(manual) & set(migrations.upgrade(eng))
+    assert [r["version"] for r in migrations.status(eng) if not r["applied"]] == manual
+    assert migrations.upgrade(eng, manual=True) == manual
@@ -0,0 +1,37 @@
+# tests/test_prompt.py
+from app.services.prompt import compile_messages, split_template, static_block, record_usage, cache_stats
+from types import SimpleNamespace
+
+TMPL = """You are a tutor.
+- Tone: {tone}
+- Pacing: {pacing}
+
+Rules:
+- Ask one question."""
+
+OBJ = [{"objective_code": "B1", "description": "Compose numbers within 10"}]
+
+def test_split_template_separates_placeholder_lines():
+    static, volatile = split_template(TMPL)
+    assert "{" not in static and "Rules:" in static
+    assert "{tone}" in volatile and "{pacing}" in volatile
+
+def test_prefix_is_identical_across_turns():
+    a = compile_messages(TMPL, {"tone": "warm", "pacing": "slow"}, "hi", objectives=OBJ)
+    b = compile_messages(TMPL, {"tone": "concise", "pacing": "fast"}, "next",
+                         history=[{"role": "user", "content": "hi"}, {"role": "assistant", "content": "hello"}],
+                         objectives=OBJ)
+    assert a[0] == b[0]
+    assert "B1" in a[0]["content"] and "Return JSON" in a[0]["content"]
+    # volatile controls sit right before the user message
+    assert "Tone: concise" in b[-2]["content"]
+    assert b[-1] == {"role": "user", "content": "next"}
+    assert b[1]["content"] == "hi"
+
+def test_static_block_memoized():
+    assert static_block(TMPL, OBJ) is static_block(TMPL, OBJ)
+
+def test_record_usage_counts_cached_tokens():
+    before = cache_stats()["cached_tokens"]
+    record_usage(SimpleNamespace(prompt_tokens=1200, prompt_tokens_details=SimpleNamespace(cached_tokens=1024)))
+    assert cache_stats()["cached_tokens"] == before + 1024
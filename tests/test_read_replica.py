@@ -0,0 +1,71 @@
+# tests/test_read_replica.py
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from app.services import storage
+
+_replica_lag = storage.replica_lag
+
+@pytest.fixture
+def replica(monkeypatch):
+    # a distinct factory stands in for the replica; the lag probe is faked
+    replica_factory = sessionmaker(bind=storage.engine)
+    lag = {"s": 0.0}
+    def fake_lag():
+        if lag["s"] is None:
+            raise RuntimeError("replica down")
+        return lag["s"]
+    monkeypatch.setattr(storage, "ReadSessionLocal", replica_factory)
+    monkeypatch.setattr(storage, "replica_lag", fake_lag)
+    monkeypatch.setattr(storage, "READ_MAX_LAG_SECONDS", 10.0)
+    monkeypatch.setattr(storage, "READ_LAG_CHECK_SECONDS", 0.0)
+    monkeypatch.setitem(storage._read_state, "checked_at", 0.0)
+    return replica_factory, lag
+
+def test_without_replica_reads_go_to_primary():
+    if storage.ReadSessionLocal is not storage.SessionLocal:
+        pytest.skip("DATABASE_READ_URL is set")
+    with storage.read_session() as db:
+        assert db.bind is storage.engine
+    assert storage.read_routing_stats()["replica_configured"] is False
+
+def test_stale_or_unreachable_replica_falls_back(replica):
+    factory, lag = replica
+    with storage.read_session() as db:
+        assert isinstance(db, factory.class_) and db.bind is storage.engine
+    lag["s"] = 60.0
+    with storage.read_session() as db:
+        assert not isinstance(db, factory.class_)
+    lag["s"] = None
+    storage.read_session().close()
+    st = storage.read_routing_stats()
+    assert st["fresh"] is False and st["error"] == "replica down"
+    assert st["primary_fallback"] >= 2
+
+def test_replica_without_wal_receiver_is_stale(replica, monkeypatch):
+    # receive LSN == replay LSN also holds once the WAL receiver has gone away;
+    # the probe then returns NULL and reads go to the primary
+    class _Conn:
+        sql = None
+        def __enter__(self):
+            return self
+        def __exit__(self, *exc):
+            return False
+        def execute(self, stmt):
+            _Conn.sql = str(stmt)
+            return self
+        def scalar(self):
+            return None
+    class _Engine:
+        class dialect:
+            name = "postgresql"
+        def connect(self):
+            return _Conn()
+    factory, _ = replica
+    monkeypatch.setattr(storage, "read_engine", _Engine())
+    monkeypatch.setattr(storage, "replica_lag", _replica_lag)
+    with storage.read_session() as db:
+        assert not isinstance(db, factory.class_)
+    assert "pg_stat_wal_receiver" in _Conn.sql
+    st = storage.read_routing_stats()
+    assert st["fresh"] is False and st["lag_s"] is None and st["error"] == "replica is not streaming WAL"
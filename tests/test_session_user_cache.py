@@ -0,0 +1,22 @@
+# tests/test_session_user_cache.py
+import time
+
+from app.db.schema import User
+from app.services.storage import _SessionUserCache
+
+def test_positive_entries_stick_and_evict_lru():
+    c = _SessionUserCache(maxsize=2, negative_ttl=60)
+    u1, u2, u3 = User(id=1, name="a"), User(id=2, name="b"), User(id=3, name="c")
+    c.put(1, u1); c.put(2, u2)
+    assert c.get(1) == (True, u1)  # 1 is now most recent
+    c.put(3, u3)
+    assert c.get(2) == (False, None)
+    assert c.get(1)[0] and c.get(3)[0]
+
+def test_negative_entries_expire():
+    c = _SessionUserCache(maxsize=10, negative_ttl=0.05)
+    c.put(7, None)
+    assert c.get(7) == (True, None)
+    time.sleep(0.06)
+    assert c.get(7) == (False, None)
+    assert c.stats()["misses"] == 1
@@ -0,0 +1,116 @@
+# tests/test_speculation.py
+import json
+import os
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main
+from app.services import llm, speculation, storage, tutor
+from app.services.fake_llm import FakeLLMConfig
+
+def test_matches_ignores_case_and_punctuation():
+    assert speculation.matches("what is three plus four", "What is three plus four?")
+
+def test_matches_rejects_different_question():
+    assert not speculation.matches("what is three plus four", "what is nine minus two")
+
+def test_matches_empty_never_reuses():
+    assert not speculation.matches("", "")
+
+# ---- through /ws/voice with the fake LLM ------------------------------------
+
+PARTIAL = "what is three plus four"
+
+def _wait_for(cond, timeout=5.0):
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        if cond():
+            return True
+        time.sleep(0.02)
+    return False
+
+@pytest.fixture
+def voice(monkeypatch):
+    with storage.SessionLocal() as db:
+        sid = storage.resolve_session_id(db, None)
+    storage.bind_user_to_session(sid, storage.get_or_create_user("speculation-test"))
+    final = {"text": PARTIAL}
+    generated, gate = [], threading.Event()
+    gate.set()
+
+    def fake_transcribe(path, output_dir, language="en"):
+        with open(os.path.join(output_dir, "x_transcript.json"), "w", encoding="utf-8") as f:
+            json.dump({"text": final["text"]}, f)
+
+    real_generate, real_summary = tutor.generate, storage.get_session_summary
+    def generate(transcript, *a, **kw):
+        generated.append(transcript)
+        return real_generate(transcript, *a, **kw)
+    def get_session_summary(session_id):
+        # hold speculative plans (not the final one) before their LLM call
+        if threading.current_thread().name.startswith("speculate"):
+            gate.wait(5)
+        return real_summary(session_id)
+
+    monkeypatch.setattr(speculation, "ENABLED", True)
+    monkeypatch.setattr(speculation, "STABLE_SECONDS", 0.0)
+    monkeypatch.setattr(main, "PARTIAL_INTERVAL_SECONDS", 0.0)
+    monkeypatch.setattr(main, "_quick_transcribe_text", lambda path, language="en": PARTIAL)
+    monkeypatch.setattr(main, "transcribe_audio", fake_transcribe)
+    monkeypatch.setattr(tutor, "JOINT_EMOTION", False)
+    monkeypatch.setattr(tutor, "generate", generate)
+    monkeypatch.setattr(storage, "get_session_summary", get_session_summary)
+    monkeypatch.setattr(llm, "get_client", lambda: llm.make_fake_client(FakeLLMConfig(seed=0)))
+    yield sid, final, generated, gate
+    gate.set()
+
+def _stream_until_speculating(ws):
+    assert ws.receive_json()["type"] == "ready"
+    started = speculation.stats()["started"]
+    for _ in range(50):  # two identical partials start a speculation
+        ws.send_bytes(b"\x00" * 32)
+        if _wait_for(lambda: speculation.stats()["started"] > started, 0.1):
+            return
+    raise AssertionError("no speculation started")
+
+def _final(ws):
+    while True:
+        m = ws.receive_json()
+        if m["type"] == "final":
+            return m
+
+def test_ws_voice_reuses_matching_speculation(voice):
+    sid, final, generated, _ = voice
+    hits = speculation.stats()["hits"]
+    with TestClient(main.app).websocket_connect(f"/ws/voice?session_id={sid}&objective_code=A1") as ws:
+        _stream_until_speculating(ws)
+        ws.send_text(json.dumps({"event": "stop"}))
+        assert _final(ws)["reply"]["text"]
+    assert speculation.stats()["hits"] == hits + 1
+    assert generated == [PARTIAL]
+
+def test_ws_voice_cancels_missed_speculation_before_llm(voice):
+    sid, final, generated, gate = voice
+    final["text"] = "what is nine minus two"
+    gate.clear()
+    cancelled = speculation.stats()["cancelled"]
+    with TestClient(main.app).websocket_connect(f"/ws/voice?session_id={sid}&objective_code=A1") as ws:
+        _stream_until_speculating(ws)
+        ws.send_text(json.dumps({"event": "stop"}))
+        assert _final(ws)["transcript"] == "what is nine minus two"
+    gate.set()
+    assert _wait_for(lambda: speculation.stats()["cancelled"] == cancelled + 1)
+    assert generated == ["what is nine minus two"]
+
+def test_ws_voice_cancels_speculation_on_disconnect(voice):
+    sid, _, generated, gate = voice
+    gate.clear()
+    cancelled = speculation.stats()["cancelled"]
+    with TestClient(main.app).websocket_connect(f"/ws/voice?session_id={sid}&objective_code=A1") as ws:
+        _stream_until_speculating(ws)
+    gate.set()
+    assert _wait_for(lambda: speculation.stats()["cancelled"] == cancelled + 1)
+    assert generated == []
@@ -0,0 +1,34 @@
+# tests/test_storage_async.py
+import asyncio
+
+from app.models import MCP, EmotionSignals, PerformanceSignals, LearningStyle, TurnRequest
+from app.services import storage, storage_async
+from app.db.schema import Session as SessionModel
+
+def test_async_url_swaps_driver():
+    assert storage_async.async_url("postgresql+psycopg2://u:p@h:5432/db").startswith("postgresql+asyncpg://u:p@h:5432/db")
+    assert "ssl=require" in storage_async.async_url("postgresql://u:p@h/db?sslmode=require")
+    assert storage_async.async_url("sqlite:///x.db") == "sqlite+aiosqlite:///x.db"
+
+def test_async_helpers_match_sync():
+    storage.init_db()
+    with storage.SessionLocal() as db:
+        s = SessionModel()
+        db.add(s); db.commit(); db.refresh(s)
+        sid = s.id
+    em = EmotionSignals(label="calm", sentiment=0.0)
+    perf = PerformanceSignals()
+    mcp = MCP(emotion=em, performance=perf, learning_style=LearningStyle(),
+              tone="neutral", pacing="medium", difficulty="hold", style="mixed", next_step="prompt")
+
+    async def run():
+        await storage_async.log_turn_full(TurnRequest(user_text="2+2?", session_id=str(sid)), em, perf, mcp, "It's 4.", reward=0.1)
+        msgs = await storage_async.dialogue_messages(sid, limit=4)
+        user = await storage_async.get_user_for_session(sid)
+        await storage_async.dispose()
+        return msgs, user
+
+    msgs, user = asyncio.run(run())
+    assert msgs == storage.dialogue_messages(sid, limit=4)
+    assert [m["content"] for m in msgs] == ["2+2?", "It's 4."]
+    assert user is None
@@ -0,0 +1,44 @@
+# tests/test_summary.py
+from types import SimpleNamespace
+
+from app.services import llm, summary
+from app.services.fake_llm import FakeLLMConfig
+
+def _turns(n):
+    return [SimpleNamespace(id=i + 1, user_text=f"q{i}", reply_text=f"a{i}") for i in range(n)]
+
+def test_update_folds_older_turns_and_keeps_raw_tail(monkeypatch):
+    saved = {}
+    monkeypatch.setattr(summary.storage, "get_session_summary", lambda sid: ("old summary", None))
+    monkeypatch.setattr(summary.storage, "turns_after", lambda sid, after, limit=200: _turns(12))
+    monkeypatch.setattr(summary.storage, "set_session_summary", lambda sid, text, through: saved.update(text=text, through=through))
+    monkeypatch.setattr(llm, "get_client", lambda: llm.make_fake_client(FakeLLMConfig(seed=0)))
+    monkeypatch.setattr(summary, "SUMMARY_EVERY_TURNS", 6)
+    monkeypatch.setattr(summary, "SUMMARY_KEEP_RAW_TURNS", 4)
+    assert summary.update_now(1) is True
+    assert saved["text"]
+    assert saved["through"] == 8  # last 4 turns stay raw
+
+def test_update_waits_for_enough_turns(monkeypatch):
+    monkeypatch.setattr(summary.storage, "get_session_summary", lambda sid: (None, None))
+    monkeypatch.setattr(summary.storage, "turns_after", lambda sid, after, limit=200: _turns(5))
+    monkeypatch.setattr(summary, "SUMMARY_EVERY_TURNS", 6)
+    monkeypatch.setattr(summary, "SUMMARY_KEEP_RAW_TURNS", 4)
+    assert summary.update_now(1) is False
+
+def test_prompt_block_empty_when_no_summary():
+    assert summary.prompt_block(None) == ""
+    assert "earlier conversation" in summary.prompt_block("Learner is adding fractions.")
+
+def test_failing_refresh_does_not_open_tutor_breaker(monkeypatch):
+    monkeypatch.setattr(summary.storage, "get_session_summary", lambda sid: (None, None))
+    monkeypatch.setattr(summary.storage, "turns_after", lambda sid, after, limit=200: _turns(12))
+    monkeypatch.setattr(llm, "get_client", lambda: llm.make_fake_client(FakeLLMConfig(error_rate=1.0)))
+    monkeypatch.setattr(llm, "breaker", llm.CircuitBreaker(failures=1))
+    monkeypatch.setattr(summary, "_breaker", llm.CircuitBreaker(failures=1))
+    try:
+        summary.update_now(1)
+    except Exception:
+        pass
+    assert summary._breaker.snapshot()["state"] == "open"
+    assert llm.breaker.snapshot()["state"] == "closed"
@@ -0,0 +1,31 @@
+# tests/test_tokens.py
+from app.services.tokens import count_tokens, fit_to_budget
+
+def test_count_tokens_empty_and_nonempty():
+    assert count_tokens("") == 0
+    assert count_tokens(None) == 0
+    assert count_tokens("What is 2+2?") > 0
+
+def test_fit_to_budget_keeps_newest_whole_messages():
+    msgs = [
+        {"role": "user", "content": "old question", "tokens": 50},
+        {"role": "assistant", "content": "old answer", "tokens": 50},
+        {"role": "user", "content": "new question", "tokens": 10},
+        {"role": "assistant", "content": "new answer", "tokens": 10},
+    ]
+    kept = fit_to_budget(msgs, 40)
+    assert [m["content"] for m in kept] == ["new question", "new answer"]
+    # content is never truncated
+    assert all(m["content"] in ("new question", "new answer") for m in kept)
+
+def test_fit_to_budget_does_not_start_on_assistant():
+    msgs = [
+        {"role": "user", "content": "q1", "tokens": 30},
+        {"role": "assistant", "content": "a1", "tokens": 5},
+        {"role": "user", "content": "q2", "tokens": 5},
+    ]
+    kept = fit_to_budget(msgs, 12)
+    assert [m["content"] for m in kept] == ["q2"]
+
+def test_fit_to_budget_zero_budget():
+    assert fit_to_budget([{"role": "user", "content": "hi"}], 0) == []
@@ -0,0 +1,103 @@
+# tests/test_turn_archive.py
+from datetime import datetime
+
+import pytest
+
+from app.db.partitions import add_months, partition_month, partition_name
+from app.services import turn_archive
+
+def test_month_helpers():
+    assert add_months(datetime(2025, 11, 15), 3) == datetime(2026, 2, 1)
+    assert add_months(datetime(2025, 1, 1), -1) == datetime(2024, 12, 1)
+    assert partition_month(partition_name(datetime(2025, 3, 1))) == datetime(2025, 3, 1)
+    assert partition_month("turns_default") is None
+
+@pytest.fixture
+def archive_dir(tmp_path, monkeypatch):
+    pa = pytest.importorskip("pyarrow")
+    import pyarrow.parquet as pq
+    monkeypatch.setattr(turn_archive, "ARCHIVE_DIR", tmp_path)
+    for month, first_id in ((datetime(2025, 1, 1), 1), (datetime(2025, 2, 1), 101)):
+        rows = [{
+            "id": first_id + i, "session_id": 1 + i % 2, "created_at": month.replace(day=1 + i),
+            "user_text": f"u{first_id + i}", "reply_text": "r", "reward": 0.5,
+            "emotion": '{"label": "calm"}', "performance": "{}", "mcp": '{"tone": "warm"}',
+        } for i in range(10)]
+        pq.write_table(pa.Table.from_pylist(rows, schema=turn_archive._schema()), turn_archive.archive_path(month))
+    return tmp_path
+
+def test_files_for_window(archive_dir):
+    assert len(turn_archive.files_for(None)) == 2
+    assert [p.name for p in turn_archive.files_for(datetime(2025, 2, 5))] == ["turns_2025-02.parquet"]
+    assert turn_archive.files_for(datetime(2025, 3, 1)) == []
+
+def test_read_turns_filters_and_keyset(archive_dir):
+    files = turn_archive.files_for(None)
+    rows = turn_archive.read_turns(files, session_id=1, order_desc=True, limit=3)
+    assert [r["id"] for r in rows] == [109, 107, 105]
+    assert rows[0]["emotion"] == {"label": "calm"}
+    rows = turn_archive.read_turns(files, order_desc=False, after_id=8, limit=4)
+    assert [r["id"] for r in rows] == [9, 10, 101, 102]
+
+def test_iter_batches_in_order(archive_dir):
+    files = turn_archive.files_for(None)
+    ids = [r["id"] for b in turn_archive.iter_batches(files, ("id", "mcp"), order_desc=True, batch_size=4) for r in b]
+    assert ids == sorted(ids, reverse=True) and len(ids) == 20
+
+def test_read_turns_stops_after_limit(tmp_path, monkeypatch):
+    pa = pytest.importorskip("pyarrow")
+    import pyarrow.parquet as pq
+    monkeypatch.setattr(turn_archive, "ARCHIVE_DIR", tmp_path)
+    month = datetime(2025, 3, 1)
+    rows = [{"id": i, "session_id": 1, "created_at": month, "user_text": "u", "reply_text": "r", "reward": 0.0,
+             "emotion": "{}", "performance": "{}", "mcp": "{}"} for i in range(1, 1001)]
+    pq.write_table(pa.Table.from_pylist(rows, schema=turn_archive._schema()),
+                   turn_archive.archive_path(month), row_group_size=100)
+    read = []
+    real = pq.ParquetFile.read_row_group
+    monkeypatch.setattr(pq.ParquetFile, "read_row_group", lambda self, i, **kw: read.append(i) or real(self, i, **kw))
+    files = turn_archive.files_for(None)
+    assert [r["id"] for r in turn_archive.read_turns(files, limit=3)] == [1000, 999, 998]
+    assert read == [9]  # newest group only
+    read.clear()
+    assert [r["id"] for r in turn_archive.read_turns(files, after_id=351, limit=2)] == [350, 349]
+    assert read == [3]  # groups above the cursor skipped by their id statistics
+
+def test_imported_turns_page_in_id_order_across_archives_and_live(tmp_path, monkeypatch):
+    # a historical import gave January a turn with a higher id than February's
+    # and the live rows; pages must still come back in id order, none skipped
+    pa = pytest.importorskip("pyarrow")
+    import pyarrow.parquet as pq
+    from fastapi.testclient import TestClient
+    from app.main import app
+    from app.services import storage
+
+    client = TestClient(app)
+    turn = {"user_text": "hi", "reply_text": "yo", "emotion": {}, "performance": {}, "mcp": {}}
+    with storage.SessionLocal() as db:
+        other, sid = storage.resolve_session_id(db, None), storage.resolve_session_id(db, None)
+    # ids of the archived turns: taken before the live ones, like the months they stand for
+    old = client.post("/api/v1/turn/log/bulk", json=[{**turn, "session_id": other}] * 4).json()["turn_ids"]
+    live = client.post("/api/v1/turn/log/bulk", json=[{**turn, "session_id": sid}] * 3).json()["turn_ids"]
+    imported = max(live) + 1000
+    monkeypatch.setattr(turn_archive, "ARCHIVE_DIR", tmp_path)
+    for month, ids in ((datetime(2025, 1, 1), [*old[:2], imported]), (datetime(2025, 2, 1), old[2:])):
+        rows = [{"id": i, "session_id": sid, "created_at": month, "user_text": "u", "reply_text": "r",
+                 "reward": 0.0, "emotion": "{}", "performance": "{}", "mcp": "{}"} for i in ids]
+        pq.write_table(pa.Table.from_pylist(rows, schema=turn_archive._schema()), turn_archive.archive_path(month))
+    everything = sorted([*old, imported, *live])
+
+    for order_desc in (True, False):
+        expected = sorted(everything, reverse=order_desc)
+        got, after = [], None
+        while page := storage.fetch_turns(session_id=sid, limit=3, order="desc" if order_desc else "asc", after_id=after):
+            got += [t.id for t in page]
+            after = page[-1].id
+        assert got == expected
+        batches = storage.iter_turn_batches(session_id=sid, order="desc" if order_desc else "asc", batch_size=3)
+        assert [r["id"] for b in batches for r in b] == expected
+    assert [t.id for t in storage.fetch_turns(session_id=sid, limit=2, offset=1)] == expected[::-1][1:3]
+
+    # archived months take no more imports
+    r = client.post("/api/v1/turn/log/bulk", json=[{**turn, "session_id": sid, "created_at": "2025-01-20T00:00:00Z"}])
+    assert r.status_code == 422 and r.json()["detail"][0]["index"] == 0
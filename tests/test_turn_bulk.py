@@ -0,0 +1,41 @@
+# tests/test_turn_bulk.py
+from app.main import app
+from app.api.v1.turn_logger_router import _parse_bulk
+from fastapi.testclient import TestClient
+
+client = TestClient(app)
+
+TURN = {"session_id": 1, "user_text": "hi", "reply_text": "yo", "emotion": {"label": "calm"}, "performance": {}, "mcp": {}}
+
+def test_parse_bulk_accepts_array_and_ndjson():
+    assert len(_parse_bulk(b'[{"a": 1}, {"a": 2}]', "application/json")) == 2
+    assert len(_parse_bulk(b'{"a": 1}\n\n{"a": 2}\n', "application/x-ndjson")) == 2
+
+def test_bulk_rejects_whole_request_on_invalid_item():
+    r = client.post("/api/v1/turn/log/bulk", json=[TURN, {**TURN, "session_id": "abc"}, {**TURN, "mcp": None}])
+    assert r.status_code == 422
+    assert [e["index"] for e in r.json()["detail"]] == [1, 2]
+
+def test_bulk_reports_bad_ndjson_line():
+    r = client.post("/api/v1/turn/log/bulk", content=b'{"session_id": 1}\n{oops', headers={"content-type": "application/x-ndjson"})
+    assert r.status_code == 400
+    assert "line 2" in r.json()["detail"]
+
+def test_bulk_import_keeps_created_at_for_metrics():
+    from datetime import datetime, timedelta, timezone
+    from app.services import metrics, storage
+    with storage.SessionLocal() as db:
+        sid = storage.resolve_session_id(db, None)
+    then = datetime.now(timezone.utc) - timedelta(days=3)
+    old = {**TURN, "session_id": sid, "created_at": then.isoformat()}
+    new = {**TURN, "session_id": sid}
+    r = client.post("/api/v1/turn/log/bulk", json=[old, new])
+    assert r.status_code == 200
+    assert metrics.compute_metrics(session_id=sid, since_minutes=60)["turns_total"] == 1
+    assert metrics.compute_metrics(session_id=sid, since_minutes=60 * 24 * 4)["turns_total"] == 2
+    turns = storage.turns_after(sid, None)
+    assert abs((turns[0].created_at - then.replace(tzinfo=None)).total_seconds()) < 1
+
+def test_bulk_rejects_future_created_at():
+    r = client.post("/api/v1/turn/log/bulk", json=[{**TURN, "created_at": "2999-01-01T00:00:00Z"}])
+    assert r.status_code == 422
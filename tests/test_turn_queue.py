@@ -0,0 +1,59 @@
+# tests/test_turn_queue.py
+import threading
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from app.services import turn_queue
+
+@pytest.fixture
+def captured(monkeypatch):
+    batches = []
+    lock = threading.Lock()
+    def fake_insert(rows):
+        if any(r.get("session_id") == -1 for r in rows):
+            raise IntegrityError("INSERT", {}, Exception("fk violation"))
+        with lock:
+            batches.append([r["user_text"] for r in rows])
+    monkeypatch.setattr(turn_queue, "_insert_rows", fake_insert)
+    monkeypatch.setattr(turn_queue, "FLUSH_MS", 30.0)
+    yield batches
+    turn_queue.drain()
+
+def test_rows_are_batched_and_acked(captured):
+    futs = [turn_queue.enqueue({"session_id": 1, "user_text": f"t{i}"}) for i in range(25)]
+    assert all(f.result(timeout=5) for f in futs)
+    assert sum(len(b) for b in captured) == 25
+    assert len(captured) < 25  # several rows per INSERT
+
+def test_bad_row_fails_alone(captured):
+    good = turn_queue.enqueue({"session_id": 1, "user_text": "ok"})
+    bad = turn_queue.enqueue({"session_id": -1, "user_text": "orphan"})
+    assert good.result(timeout=5) is True
+    with pytest.raises(IntegrityError):
+        bad.result(timeout=5)
+
+def test_drain_flushes_pending(captured):
+    futs = [turn_queue.enqueue({"session_id": 1, "user_text": f"d{i}"}) for i in range(5)]
+    assert turn_queue.drain(timeout=5)
+    assert all(f.done() for f in futs)
+    st = turn_queue.stats()
+    assert st["queue_depth"] == 0 and st["batches"] >= 1
+
+def test_history_read_waits_for_queued_turns_of_its_session(monkeypatch):
+    release = threading.Event()
+    written = []
+    def slow_insert(rows):
+        release.wait(5)
+        written.extend(r["user_text"] for r in rows)
+    monkeypatch.setattr(turn_queue, "_insert_rows", slow_insert)
+    fut = turn_queue.enqueue({"session_id": 7, "user_text": "last turn"})
+    assert turn_queue.pending(7) is fut and turn_queue.pending(8) is None
+    reader = threading.Thread(target=turn_queue.wait_for_session, args=(7,))
+    reader.start()
+    reader.join(0.1)
+    assert reader.is_alive()  # blocked until the turn commits
+    release.set()
+    reader.join(5)
+    assert written == ["last turn"] and turn_queue.pending(7) is None
+    turn_queue.drain()
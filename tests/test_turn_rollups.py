@@ -0,0 +1,83 @@
+# tests/test_turn_rollups.py
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import insert, select
+
+from app.db.schema import Turn, TurnRollup
+from app.models import MCP, EmotionSignals, LearningStyle, PerformanceSignals, TurnRequest
+from app.services import metrics, storage, turn_rollups
+
+def _session() -> int:
+    with storage.SessionLocal() as db:
+        return storage.resolve_session_id(db, None)
+
+def _rollups(sid: int) -> list:
+    with storage.SessionLocal() as db:
+        stmt = select(*TurnRollup.__table__.c).where(TurnRollup.session_id == sid).order_by(TurnRollup.minute)
+        return db.execute(stmt).all()
+
+def test_first_full_minute():
+    t = datetime(2026, 10, 19, 12, 4, 0, tzinfo=timezone.utc)
+    assert turn_rollups.first_full_minute(t) == turn_rollups.minute_of(t)
+    assert turn_rollups.first_full_minute(t + timedelta(seconds=1)) == turn_rollups.minute_of(t) + 1
+    assert turn_rollups.minute_start(turn_rollups.minute_of(t)) == t
+
+def test_write_paths_keep_rollups_equal_to_a_rebuild():
+    sid = _session()
+    em = EmotionSignals(label="frustrated", sentiment=-0.5)
+    perf = PerformanceSignals()
+    mcp = MCP(emotion=em, performance=perf, learning_style=LearningStyle(), tone="warm", pacing="slow",
+              difficulty="down", style="mixed", next_step="example")
+    for _ in range(3):
+        storage.log_turn_full(TurnRequest(user_text="q", session_id=sid), em, perf, mcp, "a", 0.25)
+    storage.bulk_insert_turns([
+        storage._turn_values(sid, TurnRequest(user_text="b", session_id=sid), em, perf, mcp, "a", 1.0, None)
+        for _ in range(4)
+    ])
+    incremental = _rollups(sid)
+    assert sum(r.turns for r in incremental) == 7
+    assert sum(r.adapted_frustrated for r in incremental) == 7
+    assert abs(sum(r.reward_sum for r in incremental) - 4.75) < 1e-9
+    with storage.engine.begin() as c:
+        turn_rollups.rebuild(c, sid)
+    assert _rollups(sid) == incremental
+
+def test_window_combines_rollups_with_partial_first_minute():
+    sid = _session()
+    now = datetime.now(timezone.utc).replace(microsecond=0, tzinfo=None)
+    rows = []
+    # one turn per 20s over the last 30 minutes, alternating emotions
+    for i in range(90):
+        rows.append(dict(session_id=sid, user_text="u", reply_text="r", emotion={}, performance={}, mcp={},
+                         reward=float(i % 3), emotion_label="calm" if i % 2 else "bored", tone="neutral",
+                         pacing="medium", difficulty="hold", next_step="prompt",
+                         created_at=now - timedelta(seconds=20 * i + 5)))
+    with storage.engine.begin() as c:
+        ids = c.execute(insert(Turn).returning(Turn.id, sort_by_parameter_order=True), rows).scalars().all()
+        turn_rollups.add(c, ids)
+
+    for minutes in (1, 7, 13, 60):
+        data = metrics.compute_metrics(session_id=sid, since_minutes=minutes)
+        cutoff = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(minutes=minutes)
+        inside = [r for r in rows if r["created_at"] >= cutoff]
+        assert data["turns_total"] == len(inside)
+        assert data["by_emotion"]["calm"] == sum(r["emotion_label"] == "calm" for r in inside)
+        assert data["avg_reward"] == round(sum(r["reward"] for r in inside) / len(inside), 4)
+        assert data["tone_alignment_rate"] == round(sum(r["emotion_label"] == "calm" for r in inside) / len(inside), 4)
+
+    series = metrics.compute_series(session_id=sid, since_minutes=60, bucket="minute")
+    assert sum(p["turns"] for p in series["points"]) == 90
+    assert all(p["ts"].endswith(":00Z") for p in series["points"])
+
+def test_rebuild_keeps_rollups_of_archived_months(tmp_path, monkeypatch):
+    from app.services import turn_archive
+    sid = _session()
+    archived = turn_rollups.minute_of(datetime(2025, 1, 15, 10, 0))
+    with storage.engine.begin() as c:
+        c.execute(TurnRollup.__table__.insert().values(
+            session_id=sid, minute=archived, **{k: 0 for k in turn_rollups.COLUMNS if k != "turns"}, turns=3))
+    (tmp_path / "turns_2025-01.parquet").write_bytes(b"")
+    monkeypatch.setattr(turn_archive, "ARCHIVE_DIR", tmp_path)
+    with storage.engine.begin() as c:
+        turn_rollups.rebuild(c, sid)
+    assert [r.minute for r in _rollups(sid)] == [archived]
@@ -0,0 +1,32 @@
+# tests/test_tutor_joint.py
+from app.models import MCP, EmotionSignals, PerformanceSignals, LearningStyle
+from app.services import llm, prompt, tutor
+from app.services.fake_llm import FakeLLMConfig
+
+def test_joint_instructions_only_in_joint_prompt():
+    plain = prompt.static_block(tutor.SYSTEM_TMPL, None, json_mode=True)
+    joint = prompt.static_block(tutor.SYSTEM_TMPL, None, json_mode=True, with_emotion=True)
+    assert prompt.JOINT_EMOTION_INSTRUCTIONS not in plain
+    assert joint.startswith(plain) and prompt.JOINT_EMOTION_INSTRUCTIONS in joint
+
+def test_emotion_from_json_normalizes_label_and_sentiment():
+    em = tutor._emotion_from_json({"emotion": "Engaged", "sentiment": 3})
+    assert em.label == "engaged" and em.sentiment == 1.0
+    em = tutor._emotion_from_json({"emotion": "calm"})
+    assert em.sentiment == 0.0
+    assert tutor._emotion_from_json({"support": "hi"}) is None
+
+def test_generate_joint_returns_reply_and_emotion_in_one_call(monkeypatch):
+    monkeypatch.setattr(llm, "get_client", lambda: llm.make_fake_client(FakeLLMConfig(seed=1)))
+    monkeypatch.setattr(tutor, "get_system_prompt", lambda: None)
+    calls = llm._stats["calls"]
+    mcp = MCP(
+        emotion=EmotionSignals(label="calm", sentiment=0.0),
+        performance=PerformanceSignals(),
+        learning_style=LearningStyle(),
+        tone="neutral", pacing="medium", difficulty="hold", style="mixed", next_step="prompt",
+    )
+    text, em = tutor.generate_joint("I keep getting this wrong", mcp)
+    assert text and em is not None
+    assert em.label in ("frustrated", "engaged", "bored", "calm")
+    assert llm._stats["calls"] == calls + 1